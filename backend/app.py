@@ -12,7 +12,9 @@ import os
 
 import datetime
 import json
+import multiprocessing
 
+load_dotenv()    # before route imports: some modules read settings at import time
 
 # Import route modules
 from routes.authenticationRoute.auth_routes import register_routes as auth_routes
@@ -21,8 +23,11 @@ from routes.therapistRoute.therapist_routes import register_routes as therapist_
 from routes.parentRoute.parent_routes import register_routes as parent_routes
 from routes.studentRoute.student_routes import register_routes as student_routes
 from routes.chatBotRoute.chatbot_routes import register_routes as chatbot_routes
+from utils.db_pool import ConnectionPool
+from utils.db_context import init_request_db
+from utils.nlu import warm_up_nlp
+from utils.open_slot_index import open_slot_index
 
-load_dotenv()    
 app = Flask(__name__)
 CORS(app)
 
@@ -37,8 +42,15 @@ db_config = {
     'port': 3306
 }
 
-def get_db_connection():
-    return mysql.connector.connect(**db_config)
+# Pooled connections: size and checkout timeout are tunable from .env
+db_pool = ConnectionPool(
+    db_config,
+    pool_size        = int(os.getenv("DB_POOL_SIZE", 10)),
+    checkout_timeout = float(os.getenv("DB_POOL_TIMEOUT", 5)),
+)
+
+# One connection per request, shared by auth helpers and handlers
+get_db_connection = init_request_db(app, db_pool.get_connection)
 
 # Configure JWT and Bcrypt
 app.config["JWT_SECRET_KEY"] = "your-secret-key"
@@ -52,18 +64,32 @@ app.config.update(
     MAIL_USE_TLS      = True,
     MAIL_USERNAME     = os.getenv("EMAIL_USER"),   # e.g. donotreply.clinic@gmail.com
     MAIL_PASSWORD     = os.getenv("EMAIL_PASS"),   # 16‑char App Password
-    MAIL_DEFAULT_SENDER = ("Therapy‑Bot", os.getenv("EMAIL_USER"))
+    MAIL_DEFAULT_SENDER = ("Therapy‑Bot", os.getenv("EMAIL_USER")),
+    MAIL_MAX_EMAILS   = int(os.getenv("MAIL_MAX_EMAILS", 100)),   # messages per SMTP session
 )
 mail = Mail(app)
 
-# Register route modules
-auth_routes(app, get_db_connection, bcrypt, create_access_token, mail)
-admin_routes(app, get_db_connection, jwt_required, get_jwt_identity)
-therapist_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail)
-parent_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail)
-chatbot_routes(app, get_db_connection, jwt_required, get_jwt_identity)
-student_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail)
-# ... Add other routes here ...
+# NLU worker processes (utils/nlu_pool.py) are spawned, and under `python app.py`
+# each one re-imports this file as __mp_main__. Only the serving process registers
+# routes and starts background threads and pools; a worker just needs the imports.
+if multiprocessing.parent_process() is None:
+    # Register route modules
+    auth_routes(app, get_db_connection, bcrypt, create_access_token, mail)
+    admin_routes(app, get_db_connection, jwt_required, get_jwt_identity)
+    therapist_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail)
+    parent_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail)
+    chatbot_routes(app, get_db_connection, jwt_required, get_jwt_identity)
+    student_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail)
+    # ... Add other routes here ...
+
+    # The available-appointments endpoints read open slots from memory; availability
+    # events keep them current and a background pass reconciles with the database.
+    open_slot_index.start(db_pool.get_connection)
+
+    # The chatbot's spaCy model loads on first use; workers that serve chat can
+    # pay that cost at startup instead of on a user's first message.
+    if os.getenv("NLP_WARMUP") == "1":
+        warm_up_nlp()
 
 # --------------------
 # Run the App
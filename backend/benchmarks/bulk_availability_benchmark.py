@@ -0,0 +1,142 @@
+# bulk_availability_benchmark.py
+"""
+Creating many availability slots: one POST /therapist/availability per slot
+against a single POST /therapist/availability/bulk, through the Flask test
+client and a real database.
+
+Needs a seeded database with at least one therapist; the slots are created in
+2099 and deleted again after each run. From backend/:
+
+    python -m benchmarks.bulk_availability_benchmark --slots 1000 --repeat 3
+
+Reports wall time and slots/s per mode (and per-request latency for the
+single POSTs) and writes JSON to benchmarks/results/.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import date, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from app import app, get_db_connection
+from benchmarks.common import print_table, summarize, write_results
+
+FIRST_DAY = date(2099, 1, 1)
+SLOTS_PER_DAY = 16   # 30-minute slots from 08:00
+
+
+def slot_payloads(count):
+    slots = []
+    for n in range(count):
+        day = FIRST_DAY + timedelta(days=n // SLOTS_PER_DAY)
+        start = timedelta(hours=8, minutes=30 * (n % SLOTS_PER_DAY))
+        slots.append({"date": day.isoformat(), "startTime": str(start)[:-3].zfill(5),
+                      "endTime": str(start + timedelta(minutes=30))[:-3].zfill(5)})
+    return slots
+
+
+def therapist_identity():
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT u.USER_ID, u.username, t.THERAPIST_ID
+            FROM USERS u JOIN THERAPIST t ON t.USER_ID = u.USER_ID
+            ORDER BY t.THERAPIST_ID LIMIT 1
+        """)
+        therapist = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    if therapist is None:
+        raise SystemExit("No therapist accounts – run scripts.generate_clinic_data first")
+    with app.app_context():
+        therapist["token"] = create_access_token(identity=json.dumps({
+            "userId": therapist["USER_ID"], "username": therapist["username"], "role": "therapist"
+        }))
+    return therapist
+
+
+def cleanup(therapist_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM AVAILABILITY WHERE THERAPIST_ID = %s AND Date >= %s",
+                       (therapist_id, FIRST_DAY))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def run_single(client, headers, slots):
+    latencies = []
+    failed = 0
+    started = time.perf_counter()
+    for slot in slots:
+        t0 = time.perf_counter()
+        resp = client.post("/therapist/availability", headers=headers, json=slot)
+        latencies.append(time.perf_counter() - t0)
+        failed += resp.status_code != 201
+    return time.perf_counter() - started, latencies, failed
+
+
+def run_bulk(client, headers, slots):
+    started = time.perf_counter()
+    resp = client.post("/therapist/availability/bulk", headers=headers, json={"slots": slots})
+    elapsed = time.perf_counter() - started
+    body = resp.get_json() or {}
+    return elapsed, len(slots) - body.get("created", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single vs bulk availability creation.")
+    parser.add_argument("--slots", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode")
+    parser.add_argument("--output", help="JSON results path")
+    args = parser.parse_args()
+
+    therapist = therapist_identity()
+    headers = {"Authorization": f"Bearer {therapist['token']}"}
+    slots = slot_payloads(args.slots)
+    client = app.test_client()
+    runs = {"single": [], "bulk": []}
+    single_latencies = []
+    failures = {"single": 0, "bulk": 0}
+
+    cleanup(therapist["THERAPIST_ID"])
+    try:
+        for _ in range(args.repeat):
+            elapsed, latencies, failed = run_single(client, headers, slots)
+            runs["single"].append(elapsed)
+            single_latencies += latencies
+            failures["single"] += failed
+            cleanup(therapist["THERAPIST_ID"])
+
+            elapsed, failed = run_bulk(client, headers, slots)
+            runs["bulk"].append(elapsed)
+            failures["bulk"] += failed
+            cleanup(therapist["THERAPIST_ID"])
+    finally:
+        cleanup(therapist["THERAPIST_ID"])
+
+    rows = []
+    for mode, times in runs.items():
+        best = min(times)
+        rows.append({"mode": mode, "requests": args.slots if mode == "single" else 1,
+                     "best_s": round(best, 3), "mean_s": round(sum(times) / len(times), 3),
+                     "slots_per_s": round(args.slots / best, 1), "failed": failures[mode]})
+    print_table(rows, ["mode", "requests", "best_s", "mean_s", "slots_per_s", "failed"])
+    print(f"\nbulk is {min(runs['single']) / min(runs['bulk']):.1f}x faster for {args.slots} slots")
+    write_results("bulk_availability", {
+        "config": {"slots": args.slots, "repeat": args.repeat},
+        "modes": rows,
+        "single_request": summarize(single_latencies),
+    }, args.output)
+    return 1 if any(failures.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# date_time_benchmark.py
+"""
+Date and time extraction per message: utils/date_time_parser.py against the
+spaCy DATE/TIME entity path it replaced for common phrasings.
+
+From backend/:
+
+    python -m benchmarks.date_time_benchmark --rounds 200
+
+Runs:
+  rules   parse_date_spec() + parse_time() only
+  spacy   NER, then nlu.date_spec() / nlu.time_from_entity() on the entities
+  nlu     nlu.analyze() as shipped (rules, spaCy only for what they miss)
+
+Messages where the rules and spaCy resolve to different values are listed at
+the end; rules returning None there fall back to spaCy in the nlu run.
+"""
+import argparse
+import os
+import sys
+import time
+
+from benchmarks.common import print_table, summarize, write_results
+from benchmarks.nlu_benchmark import load_corpus
+from utils import nlu
+from utils.date_time_parser import parse_date_spec, parse_time
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "date_time_messages.txt")
+
+
+def rules(text_lower):
+    return parse_date_spec(text_lower), parse_time(text_lower)
+
+
+def spacy_only(text_lower):
+    spec = time_value = None
+    for ent_text, label in nlu.extract_entities(text_lower):
+        if label == "DATE":
+            try:
+                spec = nlu.date_spec(ent_text)
+            except (ValueError, OverflowError):
+                pass
+        elif label == "TIME":
+            time_value = nlu.time_from_entity(ent_text) or time_value
+    return spec, time_value
+
+
+def shipped(text_lower):
+    _, _, spec, time_value, _, _ = nlu.analyze(text_lower)
+    return spec, time_value
+
+
+def resolved(spec, time_value):
+    try:
+        return nlu.resolve_date(spec), time_value
+    except (ValueError, OverflowError):
+        return None, time_value
+
+
+def measure(fn, corpus, rounds):
+    latencies, results = [], {}
+    for _ in range(rounds):
+        for text in corpus:
+            started = time.perf_counter()
+            results[text] = fn(text)
+            latencies.append(time.perf_counter() - started)
+    return latencies, {text: resolved(*value) for text, value in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule-based vs spaCy date/time extraction.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="one message per line")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--output", help="JSON results path")
+    args = parser.parse_args()
+
+    corpus = [nlu.normalize_utterance(m) for m in load_corpus(args.corpus)]
+    nlu.NLU_WORKERS = 0   # time the model in this process
+    nlu.warm_up_nlp()
+
+    rows, results = [], {}
+    for name, fn in (("rules", rules), ("spacy", spacy_only), ("nlu", shipped)):
+        latencies, results[name] = measure(fn, corpus, args.rounds)
+        found = sum(1 for d, t in results[name].values() if d or t)
+        rows.append({"run": name, "found": f"{found}/{len(corpus)}", **summarize(latencies)})
+
+    print(f"{len(corpus)} messages x {args.rounds} rounds")
+    print_table(rows, ["run", "found", "mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+
+    differences = [
+        {"message": text, "rules": results["rules"][text], "spacy": results["spacy"][text], "nlu": results["nlu"][text]}
+        for text in corpus if results["rules"][text] != results["spacy"][text]
+    ]
+    if differences:
+        print("\nRules and spaCy disagree:")
+        print_table(differences, ["message", "rules", "spacy", "nlu"])
+    write_results("date_time", {"config": vars(args), "runs": rows, "differences": differences}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
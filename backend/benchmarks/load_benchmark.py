@@ -0,0 +1,230 @@
+# load_benchmark.py
+"""
+End-to-end load benchmark: drives the real Flask routes through the test
+client against a local MySQL/MariaDB seeded with scripts/generate_clinic_data.py.
+
+From backend/:
+
+    python -m benchmarks.load_benchmark --duration 30 --concurrency 8
+    python -m benchmarks.load_benchmark --writes            # add book + cancel
+    python -m benchmarks.load_benchmark --compare old.json new.json
+
+Reports throughput and p50/p95/p99 per endpoint and writes the results as JSON
+(benchmarks/results/ by default) so runs can be compared across commits.
+Outgoing e-mail is suppressed unless --send-mail is given.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from flask_jwt_extended import create_access_token
+
+from app import app, get_db_connection
+from benchmarks.common import print_table, summarize, write_results
+
+# name -> (role, method, path); paths may use {child_id}
+READ_ENDPOINTS = {
+    "GET /students/profile": ("student", "GET", "/students/profile"),
+    "GET /students/appointments": ("student", "GET", "/students/appointments"),
+    "GET /students/available-appointments": ("student", "GET", "/students/available-appointments"),
+    "GET /students/guardians": ("student", "GET", "/students/guardians"),
+    "GET /parents/profile": ("parent", "GET", "/parents/profile"),
+    "GET /parents/children": ("parent", "GET", "/parents/children"),
+    "GET /parents/appointments": ("parent", "GET", "/parents/appointments"),
+    "GET /parents/available-appointments": ("parent", "GET", "/parents/available-appointments"),
+    "GET /parents/child-appointments": ("parent", "GET", "/parents/child-appointments/{child_id}"),
+    "GET /therapist/profile": ("therapist", "GET", "/therapist/profile"),
+    "GET /therapist/availability": ("therapist", "GET", "/therapist/availability"),
+    "GET /therapist/appointments": ("therapist", "GET", "/therapist/appointments"),
+    "GET /admin/dashboard/counts": ("admin", "GET", "/admin/dashboard/counts"),
+    "GET /admin/recent-registrations": ("admin", "GET", "/admin/recent-registrations"),
+    "GET /admin/users": ("admin", "GET", "/admin/users"),
+}
+
+
+def load_identities(per_role):
+    """Sample real accounts per role and mint JWTs for them."""
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    identities = {}
+    try:
+        queries = {
+            "student": "SELECT u.USER_ID, u.username FROM USERS u JOIN STUDENT s ON s.USER_ID = u.USER_ID "
+                       "WHERE u.ROLE = 'student' ORDER BY RAND() LIMIT %s",
+            "parent": "SELECT u.USER_ID, u.username, MIN(g.STUDENT_ID) AS child_id FROM USERS u "
+                      "JOIN PARENT p ON p.USER_ID = u.USER_ID JOIN GUARDIAN g ON g.PARENT_ID = p.PARENT_ID "
+                      "GROUP BY u.USER_ID, u.username ORDER BY RAND() LIMIT %s",
+            "therapist": "SELECT u.USER_ID, u.username FROM USERS u JOIN THERAPIST t ON t.USER_ID = u.USER_ID "
+                         "WHERE t.ADMIN_ID IS NOT NULL ORDER BY RAND() LIMIT %s",
+            "admin": "SELECT u.USER_ID, u.username FROM USERS u JOIN ADMIN a ON a.USER_ID = u.USER_ID LIMIT %s",
+        }
+        for role, sql in queries.items():
+            cursor.execute(sql, (per_role,))
+            identities[role] = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    with app.app_context():
+        for role, users in identities.items():
+            for u in users:
+                u["token"] = create_access_token(identity=json.dumps({
+                    "userId": u["USER_ID"], "username": u["username"], "role": role
+                }))
+    missing = [role for role, users in identities.items() if not users]
+    if missing:
+        raise SystemExit(f"No seeded accounts for: {', '.join(missing)} – run scripts.generate_clinic_data first")
+    return identities
+
+
+def load_open_slots(limit):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT ID FROM AVAILABILITY WHERE Status = 'available' AND Date >= CURDATE() ORDER BY RAND() LIMIT %s",
+            (limit,))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class LoadRun:
+    def __init__(self, args, identities, slots):
+        self.args = args
+        self.identities = identities
+        self.slots = slots
+        self.slot_lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+        self.endpoints = [e for e in READ_ENDPOINTS if not args.only or any(o in e for o in args.only)]
+
+    def timed(self, client, name, method, path, token, body=None):
+        headers = {"Authorization": f"Bearer {token}"}
+        started = time.perf_counter()
+        resp = client.open(path, method=method, headers=headers, json=body)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples[name].append(elapsed)
+            self.statuses[name][resp.status_code] += 1
+        return resp
+
+    def book_and_cancel(self, client, rng):
+        with self.slot_lock:
+            if not self.slots:
+                return
+            slot_id = self.slots.pop()
+        student = rng.choice(self.identities["student"])
+        resp = self.timed(client, "POST /students/appointments", "POST", "/students/appointments",
+                          student["token"], {"slotId": slot_id, "appointment_type": "virtual",
+                                             "reasonForMeeting": "load test"})
+        appt_id = (resp.get_json() or {}).get("appointmentId")
+        if resp.status_code == 200 and appt_id:
+            self.timed(client, "POST /students/appointments/cancel", "POST", "/students/appointments/cancel",
+                       student["token"], {"appointmentId": appt_id})
+
+    def worker(self, seed, deadline):
+        rng = random.Random(seed)
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            if self.args.writes and rng.random() < self.args.write_ratio:
+                self.book_and_cancel(client, rng)
+                continue
+            name = rng.choice(self.endpoints)
+            role, method, path = READ_ENDPOINTS[name]
+            user = rng.choice(self.identities[role])
+            self.timed(client, name, method, path.format(child_id=user.get("child_id")), user["token"])
+
+    def run(self):
+        deadline = time.perf_counter() + self.args.warmup
+        self.worker(0, deadline)  # single-threaded warm-up, discarded
+        self.samples.clear()
+        self.statuses.clear()
+
+        started = time.perf_counter()
+        deadline = started + self.args.duration
+        threads = [threading.Thread(target=self.worker, args=(i + 1, deadline))
+                   for i in range(self.args.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        endpoints = {}
+        for name, latencies in sorted(self.samples.items()):
+            endpoints[name] = {**summarize(latencies, elapsed),
+                               "statuses": {str(k): v for k, v in self.statuses[name].items()}}
+        total = sum(len(v) for v in self.samples.values())
+        return {
+            "config": {k: v for k, v in vars(self.args).items() if k not in ("compare", "output")},
+            "elapsed_s": round(elapsed, 2),
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "endpoints": endpoints,
+        }
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    rows = []
+    for name, cur in new["endpoints"].items():
+        prev = old["endpoints"].get(name)
+        if not prev:
+            continue
+        rows.append({
+            "endpoint": name,
+            "p50": f"{prev['p50_ms']} -> {cur['p50_ms']}",
+            "p95": f"{prev['p95_ms']} -> {cur['p95_ms']}",
+            "p99": f"{prev['p99_ms']} -> {cur['p99_ms']}",
+            "rps": f"{prev['throughput_rps']} -> {cur['throughput_rps']}",
+        })
+    print(f"{old['commit']} -> {new['commit']} (ms, req/s)")
+    print_table(rows, ["endpoint", "p50", "p95", "p99", "rps"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the clinic API.")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="discarded warm-up seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads (keep <= DB_POOL_SIZE)")
+    parser.add_argument("--users-per-role", type=int, default=200)
+    parser.add_argument("--only", nargs="*", help="only endpoints whose name contains one of these")
+    parser.add_argument("--writes", action="store_true", help="also book and cancel appointments")
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--send-mail", action="store_true", help="do not suppress outgoing e-mail")
+    parser.add_argument("--output", help="JSON results path")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    if not args.send_mail:
+        app.extensions["mail"].suppress = True
+
+    identities = load_identities(args.users_per_role)
+    slots = load_open_slots(100000) if args.writes else []
+    results = LoadRun(args, identities, slots).run()
+
+    rows = [{"endpoint": name, **{k: v for k, v in s.items() if k != "statuses"}}
+            for name, s in results["endpoints"].items()]
+    print_table(rows, ["endpoint", "count", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    print(f"\nTotal: {results['total_requests']} requests in {results['elapsed_s']}s "
+          f"({results['throughput_rps']} req/s)")
+    write_results("load", results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# nlp_startup_benchmark.py
+"""
+Startup time and peak RSS of the chatbot's NLU, each case in a fresh process:
+
+    app-import    import app (spaCy no longer loads here)
+    full-model    spacy.load(SPACY_MODEL) with every pipe, as the chatbot used to
+    ner-only      utils.nlu.get_nlp(): the trimmed pipeline the chatbot now loads
+
+From backend/:
+
+    python -m benchmarks.nlp_startup_benchmark --repeat 3
+
+Each case also reports the mean time per utterance over a small chat corpus.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.common import print_table, write_results
+
+CORPUS = [
+    "schedule",
+    "show therapists",
+    "view appointments",
+    "book with dr smith tomorrow at 10am",
+    "can I see someone next week",
+    "cancel my appointment on friday",
+    "reschedule to 3pm",
+    "hi",
+]
+
+# Runs in the child process; prints one JSON line.
+CHILD = r"""
+import json, resource, sys, time
+case, corpus = sys.argv[1], json.loads(sys.argv[2])
+started = time.perf_counter()
+nlp = None
+if case == "app-import":
+    import app
+elif case == "full-model":
+    import spacy
+    from utils.nlu import SPACY_MODEL
+    nlp = spacy.load(SPACY_MODEL)
+else:
+    from utils.nlu import get_nlp
+    nlp = get_nlp()
+load_s = time.perf_counter() - started
+per_doc_ms = None
+if nlp is not None:
+    nlp(corpus[0])
+    t = time.perf_counter()
+    for _ in range(20):
+        for text in corpus:
+            nlp(text)
+    per_doc_ms = (time.perf_counter() - t) / (20 * len(corpus)) * 1000
+    pipes = nlp.pipe_names
+else:
+    pipes = []
+print(json.dumps({
+    "load_s": load_s,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "per_doc_ms": per_doc_ms,
+    "pipes": pipes,
+}))
+"""
+
+CASES = ["app-import", "full-model", "ner-only"]
+
+
+def run_case(case):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, case, json.dumps(CORPUS)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NLU startup time and memory benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per case (best load time kept)")
+    parser.add_argument("--output", help="JSON results path")
+    args = parser.parse_args()
+
+    rows = []
+    for case in CASES:
+        runs = [run_case(case) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["load_s"])
+        rows.append({
+            "case": case,
+            "load_s": round(best["load_s"], 3),
+            "rss_mb": round(max(r["rss_mb"] for r in runs), 1),
+            "per_doc_ms": round(best["per_doc_ms"], 3) if best["per_doc_ms"] is not None else "-",
+            "pipes": ",".join(best["pipes"]) or "-",
+        })
+    print_table(rows, ["case", "load_s", "rss_mb", "per_doc_ms", "pipes"])
+    write_results("nlp_startup", {"config": vars(args), "cases": rows}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# nlu_benchmark.py
+"""
+Per-message latency of extract_intent_and_entities over a corpus of chatbot
+messages, before and after the rule-based fast path and the result cache.
+
+From backend/:
+
+    python -m benchmarks.nlu_benchmark --rounds 50
+    python -m benchmarks.nlu_benchmark --corpus my_messages.txt
+
+"before" swaps the previous behaviour back in (spaCy on every message,
+substring keyword lists checked one by one, no cache); "fast-path" is
+utils.nlu with its result cache turned off and "cached" is utils.nlu as
+shipped. Messages whose intent differs from "before" are listed at the end.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from benchmarks.common import print_table, summarize, write_results
+from utils import nlu
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "chat_messages.txt")
+
+LEGACY_KEYWORDS = [
+    ("schedule", ["book", "schedule", "make an appointment"]),
+    ("reschedule", ["reschedule", "change", "modify"]),
+    ("cancel", ["cancel", "delete", "remove"]),
+    ("view_appointments", ["view appointments", "show appointments", "see appointments", "list appointments"]),
+    ("show_therapists", ["show therapists", "list therapists", "available therapists", "therapist availability"]),
+    ("greet", ["hello", "hi", "hey", "greetings"]),
+]
+
+
+def legacy_detect_intent(text_lower):
+    for intent, keywords in LEGACY_KEYWORDS:
+        if any(word in text_lower for word in keywords):
+            return intent
+    return None
+
+
+@contextlib.contextmanager
+def legacy_mode():
+    detect, needs = nlu.detect_intent, nlu.needs_ner
+    nlu.detect_intent, nlu.needs_ner = legacy_detect_intent, lambda text_lower: True
+    try:
+        with cache_disabled():
+            yield
+    finally:
+        nlu.detect_intent, nlu.needs_ner = detect, needs
+
+
+@contextlib.contextmanager
+def cache_disabled():
+    maxsize = nlu.nlu_cache.maxsize
+    nlu.nlu_cache.clear()
+    nlu.nlu_cache.maxsize = 0
+    try:
+        yield
+    finally:
+        nlu.nlu_cache.maxsize = maxsize
+        nlu.nlu_cache.clear()
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def measure(corpus, rounds):
+    latencies, intents = [], {}
+    calls = 0
+    extract = nlu.extract_entities
+
+    def counting(text):
+        nonlocal calls
+        calls += 1
+        return extract(text)
+
+    nlu.extract_entities = counting
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):   # silence the NLU debug print
+            for _ in range(rounds):
+                for text in corpus:
+                    started = time.perf_counter()
+                    intents[text] = nlu.extract_intent_and_entities(text)[0]
+                    latencies.append(time.perf_counter() - started)
+    finally:
+        nlu.extract_entities = extract
+    return latencies, intents, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NLU fast-path microbenchmark.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="one message per line")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--output", help="JSON results path")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    nlu.warm_up_nlp()
+
+    with legacy_mode():
+        before, before_intents, before_calls = measure(corpus, args.rounds)
+    with cache_disabled():
+        fast, after_intents, fast_calls = measure(corpus, args.rounds)
+    cached, _, cached_calls = measure(corpus, args.rounds)
+    cache_stats = nlu.nlu_cache.stats()
+
+    rows = [
+        {"run": "before", "spacy_calls": before_calls, **summarize(before)},
+        {"run": "fast-path", "spacy_calls": fast_calls, **summarize(fast)},
+        {"run": "cached", "spacy_calls": cached_calls, **summarize(cached)},
+    ]
+    print(f"{len(corpus)} messages x {args.rounds} rounds")
+    print_table(rows, ["run", "count", "spacy_calls", "mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+    print(f"Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+
+    changed = [{"message": t, "before": before_intents[t], "after": after_intents[t]}
+               for t in corpus if before_intents[t] != after_intents[t]]
+    if changed:
+        print("\nIntent changes:")
+        print_table(changed, ["message", "before", "after"])
+    write_results("nlu", {"config": vars(args), "runs": rows, "cache": cache_stats,
+                          "intent_changes": changed}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# nlu_isolation_benchmark.py
+"""
+Does chat traffic slow down the rest of the API? Serves a small Flask app with
+the threaded dev server: /probe stands in for any cheap endpoint, /chat runs
+extract_intent_and_entities. One client measures /probe latency while
+--chat-clients threads keep /chat busy with messages that need NER.
+
+From backend/:
+
+    python -m benchmarks.nlu_isolation_benchmark --duration 20 --workers 2
+
+Runs:
+  idle         /probe alone
+  in-process   chat load, spaCy in the request threads (NLU_WORKERS=0)
+  worker-pool  chat load, spaCy in --workers processes (utils/nlu_pool.py)
+
+The NLU result cache is off so every chat message is analysed.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.request
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+from benchmarks.common import print_table, summarize, write_results
+from benchmarks.nlu_benchmark import DEFAULT_CORPUS, cache_disabled, load_corpus
+from utils import nlu
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route("/probe")
+    def probe():
+        return jsonify({"ok": True, "items": list(range(20))})
+
+    @app.route("/chat", methods=["POST"])
+    def chat():
+        intent, entities = nlu.extract_intent_and_entities(request.get_json()["message"])
+        return jsonify({"intent": intent, "entities": entities})
+
+    return app
+
+
+def get(url):
+    with urllib.request.urlopen(url) as resp:
+        resp.read()
+
+
+def post(url, body):
+    req = urllib.request.Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+
+
+def run(name, base, messages, chat_clients, duration):
+    stop = threading.Event()
+    chat_sent = [0] * chat_clients
+
+    def chat_client(n):
+        i = n
+        while not stop.is_set():
+            post(base + "/chat", {"message": messages[i % len(messages)]})
+            chat_sent[n] += 1
+            i += chat_clients
+
+    threads = [threading.Thread(target=chat_client, args=(n,), daemon=True) for n in range(chat_clients)]
+    for t in threads:
+        t.start()
+
+    latencies = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        t0 = time.perf_counter()
+        get(base + "/probe")
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for t in threads:
+        t.join()
+    return {"run": name, **summarize(latencies), "chat_msgs_per_s": round(sum(chat_sent) / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Endpoint latency under chat load, with and without NLU workers.")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per run")
+    parser.add_argument("--chat-clients", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2, help="NLU worker processes for the worker-pool run")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="one message per line")
+    parser.add_argument("--output", help="JSON results path")
+    args = parser.parse_args()
+
+    # only messages that reach spaCy put load on the server
+    messages = [m for m in load_corpus(args.corpus) if nlu.needs_ner(nlu.normalize_utterance(m))]
+    server = make_server("127.0.0.1", 0, make_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    rows = []
+    try:
+        with cache_disabled():
+            nlu.NLU_WORKERS = 0
+            nlu.warm_up_nlp()
+            rows.append(run("idle", base, messages, 0, args.duration))
+            rows.append(run("in-process", base, messages, args.chat_clients, args.duration))
+
+            nlu.NLU_WORKERS = args.workers
+            nlu.warm_up_nlp()
+            rows.append(run("worker-pool", base, messages, args.chat_clients, args.duration))
+            pool_stats = nlu.worker_pool_stats()
+    finally:
+        nlu.shutdown_worker_pool()
+        server.shutdown()
+
+    print(f"{len(messages)} NER messages, {args.chat_clients} chat clients, {args.duration:g}s per run")
+    print_table(rows, ["run", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms", "chat_msgs_per_s"])
+    print(f"Worker pool: {pool_stats['batches']} batches, avg {pool_stats['avg_batch']} messages, "
+          f"{pool_stats['timeouts']} timeouts")
+    write_results("nlu_isolation", {"config": vars(args), "runs": rows, "pool": pool_stats}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# open_slot_index_benchmark.py
+"""
+How the in-memory open slot index (utils/open_slot_index.py) scales with the
+number of open slots: load time, listing latency from memory, and the cost of
+catching up after one therapist's slots change. Rows are generated in memory,
+so no database is needed. From backend/:
+
+    python -m benchmarks.open_slot_index_benchmark --slots 1000 100000 1000000
+
+Listing latency covers building the response lists, not JSON encoding; run
+benchmarks.load_benchmark --only available-appointments for the endpoints
+end to end.
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import print_table, summarize, write_results
+from utils import availability_events
+from utils.availability_events import AvailabilityEvent
+from utils.open_slot_index import OpenSlotIndex
+
+
+class GeneratedConnection:
+    """Answers the index's queries with generated therapists and slots."""
+
+    def __init__(self, therapists, slots_per_therapist, only=None):
+        self.therapists = therapists
+        self.per = slots_per_therapist
+        self.only = only
+        self.statement = None
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, sql, params=None):
+        self.statement = sql
+
+    def _ids(self):
+        return self.only if self.only is not None else range(1, self.therapists + 1)
+
+    def fetchall(self):
+        if "FROM THERAPIST" in self.statement:
+            return [{"THERAPIST_ID": t, "FirstName": f"First{t}", "LastName": f"Last{t}"} for t in self._ids()]
+        if "FROM AVAILABILITY_RULE" in self.statement:
+            return []
+        first = date.today() + timedelta(days=1)
+        rows = []
+        for t in self._ids():
+            for n in range(self.per):
+                start = timedelta(hours=8 + n % 8)
+                rows.append({"ID": t * self.per + n, "THERAPIST_ID": t, "Date": first + timedelta(days=n // 8),
+                             "Start_Time": start, "End_Time": start + timedelta(minutes=50)})
+        return rows
+
+    def close(self):
+        pass
+
+
+def no_connection():
+    raise AssertionError("listing opened a connection")
+
+
+def run(total_slots, therapists, reads):
+    per = max(1, total_slots // therapists)
+    index = OpenSlotIndex()
+    index._reconciler = True   # no age-based reloads while timing
+    started = time.perf_counter()
+    index.ensure_current(lambda: GeneratedConnection(therapists, per))
+    load_s = time.perf_counter() - started
+
+    student, parent = [], []
+    for _ in range(reads):
+        t0 = time.perf_counter()
+        index.student_listing(no_connection)
+        student.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        index.parent_listing(no_connection)
+        parent.append(time.perf_counter() - t0)
+
+    # One therapist's slot created: the next read re-queries just that therapist
+    catch_up = []
+    for n in range(min(reads, 50)):
+        tid = n % therapists + 1
+        index.on_event(AvailabilityEvent(availability_events.CREATED, tid, ()))
+        t0 = time.perf_counter()
+        index.parent_listing(lambda: GeneratedConnection(therapists, per, only=[tid]))
+        catch_up.append(time.perf_counter() - t0)
+
+    return {
+        "slots": per * therapists,
+        "load_s": round(load_s, 3),
+        "student": summarize(student),
+        "parent": summarize(parent),
+        "catch_up": summarize(catch_up),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open slot index scaling.")
+    parser.add_argument("--slots", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--therapists", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=500)
+    parser.add_argument("--output", help="JSON results path")
+    args = parser.parse_args()
+
+    results = [run(n, args.therapists, args.reads) for n in args.slots]
+    rows = [{"slots": r["slots"], "load_s": r["load_s"],
+             "student_p50_ms": r["student"]["p50_ms"], "student_p99_ms": r["student"]["p99_ms"],
+             "parent_p50_ms": r["parent"]["p50_ms"], "parent_p99_ms": r["parent"]["p99_ms"],
+             "catch_up_p50_ms": r["catch_up"]["p50_ms"]}
+            for r in results]
+    print_table(rows, list(rows[0]))
+    write_results("open_slot_index", {"config": vars(args), "runs": results}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+# smtp_benchmark.py
+"""
+Messages per second for one SMTP session per message (mail.send) versus one
+shared session (MailBatch), against a local SMTP stand-in.
+
+From backend/:
+
+    python -m benchmarks.smtp_benchmark --messages 500
+    python -m benchmarks.smtp_benchmark --handshake-delay 0.2   # mimic a remote relay
+
+The stand-in is aiosmtpd when installed, otherwise the stdlib smtpd module
+(Python <= 3.11). --handshake-delay adds latency to every EHLO/HELO so the
+per-connection cost resembles a real relay's TLS + auth round trips.
+"""
+import argparse
+import asyncio
+import socket
+import sys
+import threading
+import time
+
+from flask import Flask
+from flask_mail import Mail
+
+from benchmarks.common import print_table, write_results
+from utils.emailer import MailBatch, build_appt_message
+
+APPT = {
+    "child": "Ava Lee",
+    "therapist": "Noah Patel",
+    "time": "2025-04-16 10:00 AM",
+    "type": "Online",
+    "meeting_link": "https://therapy-clinic.com/meeting/benchmark",
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Sink:
+    """Counts delivered messages; delays the greeting when asked to."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def start_server(port, delay):
+    """Start a local SMTP server in the background; returns (sink, stop)."""
+    sink = Sink(delay)
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        return start_smtpd(port, sink)
+    controller = Controller(sink, hostname="127.0.0.1", port=port)
+    controller.start()
+    return sink, controller.stop
+
+
+def start_smtpd(port, sink):
+    import asyncore
+    import smtpd
+
+    class Channel(smtpd.SMTPChannel):
+        def smtp_EHLO(self, arg):
+            time.sleep(sink.delay)
+            super().smtp_EHLO(arg)
+
+        def smtp_HELO(self, arg):
+            time.sleep(sink.delay)
+            super().smtp_HELO(arg)
+
+    class Server(smtpd.SMTPServer):
+        channel_class = Channel
+
+        def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+            sink.received += 1
+
+    server = Server(("127.0.0.1", port), None)
+    thread = threading.Thread(target=asyncore.loop, kwargs={"timeout": 0.1}, daemon=True)
+    thread.start()
+
+    def stop():
+        server.close()
+        thread.join(1)
+    return sink, stop
+
+
+def make_app(port, max_emails):
+    app = Flask(__name__)
+    app.config.update(
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=port,
+        MAIL_USE_TLS=False,
+        MAIL_USE_SSL=False,
+        MAIL_DEFAULT_SENDER="bench@example.com",
+        MAIL_MAX_EMAILS=max_emails,
+    )
+    return app, Mail(app)
+
+
+def run(mode, mail, n):
+    messages = [build_appt_message(f"user{i}@example.com", "booked", APPT) for i in range(n)]
+    started = time.perf_counter()
+    connections = n
+    if mode == "per-message":
+        for msg in messages:
+            mail.send(msg)
+    else:
+        with MailBatch(mail) as batch:
+            for msg in messages:
+                batch.send(msg)
+        connections = batch.connections
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "messages": n,
+        "connections": connections,
+        "elapsed_s": round(elapsed, 3),
+        "msgs_per_s": round(n / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMTP send throughput benchmark.")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--handshake-delay", type=float, default=0.0, help="seconds added to each EHLO")
+    parser.add_argument("--max-emails", type=int, default=None, help="MAIL_MAX_EMAILS for the batch run")
+    parser.add_argument("--output", help="JSON results path")
+    args = parser.parse_args()
+
+    port = free_port()
+    sink, stop = start_server(port, args.handshake_delay)
+    app, mail = make_app(port, args.max_emails)
+    try:
+        with app.app_context():
+            rows = [run("per-message", mail, args.messages), run("batched", mail, args.messages)]
+    finally:
+        stop()
+
+    expected = 2 * args.messages
+    if sink.received != expected:
+        print(f"Warning: server received {sink.received} of {expected} messages")
+    print_table(rows, ["mode", "messages", "connections", "elapsed_s", "msgs_per_s"])
+    speedup = rows[1]["msgs_per_s"] / rows[0]["msgs_per_s"] if rows[0]["msgs_per_s"] else 0
+    print(f"\nBatched: {speedup:.1f}x messages/s")
+    write_results("smtp", {"config": vars(args), "runs": rows}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
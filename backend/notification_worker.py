@@ -0,0 +1,71 @@
+# notification_worker.py
+"""
+Delivers appointment e-mails queued in NOTIFICATION_OUTBOX by the API.
+
+Run it next to the Flask app, from backend/:
+
+    python notification_worker.py            # poll forever
+    python notification_worker.py --once     # drain what is due and exit
+
+Several workers can run at once; rows are claimed with SKIP LOCKED.
+"""
+import argparse
+import signal
+import sys
+import time
+
+from app import app, mail, get_db_connection
+from utils.outbox import claim_batch, deliver
+
+running = True
+
+
+def stop(signum, frame):
+    global running
+    print(f"Received signal {signum}, finishing current batch")
+    running = False
+
+
+def drain(batch_size):
+    """Claim and deliver due rows until none are left; returns the number handled."""
+    handled = 0
+    while running:
+        conn = get_db_connection()
+        try:
+            rows = claim_batch(conn, batch_size)
+            if not rows:
+                return handled
+            sent, failed = deliver(conn, mail, rows)
+            print(f"Outbox batch: {sent} sent, {failed} failed")
+            handled += len(rows)
+        finally:
+            conn.close()
+    return handled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send queued appointment notifications.")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="seconds to sleep when idle")
+    parser.add_argument("--once", action="store_true", help="drain due rows once and exit")
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print("Notification worker started")
+    with app.app_context():        # send_appt_email logs through current_app
+        while running:
+            try:
+                drain(args.batch_size)
+            except Exception as e:
+                print(f"Outbox worker error: {e}")
+            if args.once:
+                break
+            time.sleep(args.poll_interval)
+    print("Notification worker stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
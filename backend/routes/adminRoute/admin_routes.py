@@ -2,6 +2,11 @@
 from flask import request, jsonify
 import json
 import mysql.connector
+from utils import pagination, sql_metrics
+from utils.nlu import nlu_cache, worker_pool_stats
+from utils.open_slot_index import open_slot_index
+from utils.therapist_index import therapist_index
+from routes.chatBotRoute.chatbot_states import state_metrics
 
 def register_routes(app, get_db_connection, jwt_required, get_jwt_identity):
     """
@@ -23,12 +28,21 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity):
         token = json.loads(get_jwt_identity())
         if token.get("role") != "admin" or not is_admin(token["userId"]):
             return jsonify({"message": "Unauthorized access."}), 403
+        try:
+            page = pagination.page_request(request.args, "admin_users", 2)
+        except pagination.InvalidPage as e:
+            return jsonify({"message": str(e)}), 400
 
         try:
             conn = get_db_connection()
             cur = conn.cursor(dictionary=True)
 
-            query = """
+            # Paged: a range of the created_at index from the last user served
+            keyset, params = "", []
+            if page and page.after:
+                keyset = "WHERE u.created_at < %s OR (u.created_at = %s AND u.USER_ID < %s)"
+                params = [page.after[0], page.after[0], page.after[1]]
+            query = f"""
             SELECT
               u.USER_ID    AS id,
               u.username   AS username,
@@ -87,11 +101,18 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity):
             LEFT JOIN STUDENT   s ON u.USER_ID = s.USER_ID    AND u.ROLE = 'student'
             LEFT JOIN THERAPIST t ON u.USER_ID = t.USER_ID    AND u.ROLE = 'therapist'
             LEFT JOIN ADMIN     a ON u.USER_ID = a.USER_ID    AND u.ROLE = 'admin'
-            ORDER BY u.created_at DESC
+            {keyset}
+            ORDER BY u.created_at DESC, u.USER_ID DESC
             """
+            if page:
+                query += " LIMIT %s"
+                params.append(page.limit + 1)
 
-            cur.execute(query)
+            cur.execute(query, params)
             users = cur.fetchall()
+            next_cursor = None
+            if page:
+                users, next_cursor = pagination.split_page(users, page, lambda u: (u["created_at"], u["id"]))
 
             for u in users:
                 if u["role"] == "parent" and u.get("parent_id"):
@@ -112,6 +133,8 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity):
 
             cur.close()
             conn.close()
+            if page:
+                return jsonify({"users": users, "nextCursor": next_cursor}), 200
             return jsonify({"users": users}), 200
 
         except Exception as exc:
@@ -178,9 +201,12 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity):
                 conn.close()
                 return jsonify({"message": "Therapist not found or already verified."}), 404
 
+            cur.execute("SELECT THERAPIST_ID, FirstName, LastName FROM THERAPIST WHERE USER_ID = %s", (user_id,))
+            therapist = cur.fetchone()
             conn.commit()
             cur.close()
             conn.close()
+            therapist_index.upsert(therapist["THERAPIST_ID"], therapist["FirstName"], therapist["LastName"])
             return jsonify({"message": "Therapist verified."}), 200
 
         except Exception as exc:
@@ -206,9 +232,12 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity):
                 conn.close()
                 return jsonify({"message": "Therapist not found or already unverified."}), 404
 
+            cur.execute("SELECT THERAPIST_ID FROM THERAPIST WHERE USER_ID = %s", (user_id,))
+            therapist = cur.fetchone()
             conn.commit()
             cur.close()
             conn.close()
+            therapist_index.remove(therapist["THERAPIST_ID"])
             return jsonify({"message": "Therapist unverified."}), 200
 
         except Exception as exc:
@@ -384,4 +413,68 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity):
             if 'cur' in locals():
                 cur.close()
             if 'conn' in locals():
-                conn.close()
\ No newline at end of file
+                conn.close()
+
+    @app.route("/admin/metrics/sql", methods=["GET"])
+    @jwt_required()
+    def get_sql_metrics():
+        """
+        Per-route SQL aggregates: query count, DB time, rows fetched and
+        statements repeated often enough within one request to look like N+1.
+        Pass ?reset=1 to clear the counters after reading them.
+        """
+        token = json.loads(get_jwt_identity())
+        if token.get("role") != "admin" or not is_admin(token["userId"]):
+            return jsonify({"message": "Unauthorized access."}), 403
+
+        metrics = sql_metrics.snapshot()
+        if request.args.get("reset") == "1":
+            sql_metrics.reset()
+        return jsonify(metrics), 200
+
+    @app.route("/admin/metrics/nlu", methods=["GET"])
+    @jwt_required()
+    def get_nlu_metrics():
+        """
+        Chatbot NLU cache size and hit/miss counters, plus the worker pool's
+        batch/timeout counters when NLU_WORKERS is set.
+        Pass ?reset=1 to empty the cache and zero the counters after reading them.
+        """
+        token = json.loads(get_jwt_identity())
+        if token.get("role") != "admin" or not is_admin(token["userId"]):
+            return jsonify({"message": "Unauthorized access."}), 403
+
+        metrics = nlu_cache.stats()
+        metrics["workers"] = worker_pool_stats()
+        if request.args.get("reset") == "1":
+            nlu_cache.clear()
+        return jsonify(metrics), 200
+
+    @app.route("/admin/metrics/chatbot", methods=["GET"])
+    @jwt_required()
+    def get_chatbot_metrics():
+        """
+        Chatbot turns per conversation state: count, how many opened a DB
+        connection, and latency. Pass ?reset=1 to zero them after reading.
+        """
+        token = json.loads(get_jwt_identity())
+        if token.get("role") != "admin" or not is_admin(token["userId"]):
+            return jsonify({"message": "Unauthorized access."}), 403
+
+        metrics = state_metrics.snapshot()
+        if request.args.get("reset") == "1":
+            state_metrics.reset()
+        return jsonify(metrics), 200
+
+    @app.route("/admin/metrics/open-slots", methods=["GET"])
+    @jwt_required()
+    def get_open_slot_metrics():
+        """
+        Size and freshness of the in-memory open slot index behind the
+        available-appointments endpoints.
+        """
+        token = json.loads(get_jwt_identity())
+        if token.get("role") != "admin" or not is_admin(token["userId"]):
+            return jsonify({"message": "Unauthorized access."}), 403
+
+        return jsonify(open_slot_index.stats()), 200
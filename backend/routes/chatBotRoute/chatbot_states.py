@@ -0,0 +1,916 @@
+# chatbot_states.py
+"""
+Chatbot conversation states.
+
+Every state a chat session can be in has one handler, registered with
+@state(name, needs_db=...). A handler takes a ChatContext and returns
+(payload, status); interact() in chatbot_routes turns that into the JSON reply.
+
+Handlers registered with needs_db=False are never given a database
+connection. The others open one on first use of ctx.cursor, so a reply like
+"virtual", "yes" or a slot number costs no pool checkout. dispatch() times
+every turn per state into state_metrics.
+
+Lists shown to the user (therapists, dates, slots) stay on the session with a
+stamp, so a numeric pick resolves from what was shown instead of re-running
+the query. A stamp goes stale after CHAT_LIST_TTL seconds, and date and slot
+lists also when utils.availability_events reports a change for that
+therapist; a stale list is re-fetched and shown again. Only the final
+booking step re-checks the database.
+
+Recurring availability rules (utils/availability_rules.py) are expanded over
+the next RULE_HORIZON_DAYS days wherever dates and slots are listed.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from utils import availability_events, availability_rules
+from utils.nlu import extract_intent_and_entities
+from utils.slot_reservation import SlotUnavailable, claim_slot, has_same_day_appointment, insert_appointment
+from utils.therapist_index import therapist_index
+
+# Therapists listed per "show therapists" reply; "more" pages through the rest
+THERAPIST_PAGE_SIZE = 10
+# Seconds a listed therapist, date or slot can be picked by number before the list is re-fetched
+CHAT_LIST_TTL = float(os.getenv("CHAT_LIST_TTL", 300))
+
+# Hot statements, module-level so scripts/explain_check.py EXPLAINs exactly these.
+# Therapists with an open slot or a rule running in the horizon (%s days)
+THERAPISTS_WITH_OPEN_SLOTS_SQL = """
+    SELECT t.THERAPIST_ID, t.FirstName, t.LastName
+    FROM THERAPIST t
+    WHERE EXISTS (
+            SELECT 1 FROM AVAILABILITY av
+            WHERE av.THERAPIST_ID = t.THERAPIST_ID AND av.Status = 'available' AND av.Date >= CURDATE())
+       OR EXISTS (
+            SELECT 1 FROM AVAILABILITY_RULE r
+            WHERE r.THERAPIST_ID = t.THERAPIST_ID AND r.End_Date >= CURDATE()
+              AND r.Start_Date <= CURDATE() + INTERVAL %s DAY)
+    ORDER BY t.FirstName, t.LastName, t.THERAPIST_ID
+"""
+# One "show therapists" page, each with its next open AVAILABILITY slot (NULL for rule-only therapists)
+THERAPIST_PAGE_SQL = """
+    SELECT t.THERAPIST_ID, t.FirstName, t.LastName, f.Date, f.Start_Time, COUNT(*) OVER () AS total
+    FROM THERAPIST t
+    LEFT JOIN (
+        SELECT x.THERAPIST_ID, x.Date, x.Start_Time
+        FROM (
+            SELECT av.THERAPIST_ID, av.Date, av.Start_Time,
+                   ROW_NUMBER() OVER (PARTITION BY av.THERAPIST_ID ORDER BY av.Date, av.Start_Time) AS rn
+            FROM AVAILABILITY av
+            WHERE av.Status = 'available' AND av.Date >= CURDATE()
+        ) x
+        WHERE x.rn = 1
+    ) f ON f.THERAPIST_ID = t.THERAPIST_ID
+    WHERE f.THERAPIST_ID IS NOT NULL
+       OR EXISTS (
+            SELECT 1 FROM AVAILABILITY_RULE r
+            WHERE r.THERAPIST_ID = t.THERAPIST_ID AND r.End_Date >= CURDATE()
+              AND r.Start_Date <= CURDATE() + INTERVAL %s DAY)
+    ORDER BY t.FirstName, t.LastName, t.THERAPIST_ID
+    LIMIT %s OFFSET %s
+"""
+OPEN_DATES_SQL = """
+    SELECT DISTINCT av.Date
+    FROM AVAILABILITY av
+    WHERE av.THERAPIST_ID = %s AND av.Status = 'available' AND av.Date >= CURDATE()
+    ORDER BY av.Date
+    LIMIT 5
+"""
+# {time_filter} drops slots already started when the date is today
+SLOTS_ON_DATE_SQL = """
+    SELECT av.ID as id, av.Date, av.Start_Time
+    FROM AVAILABILITY av
+    WHERE av.THERAPIST_ID = %s AND av.Date = %s AND av.Status = 'available' {time_filter}
+    ORDER BY av.Start_Time
+    LIMIT 5
+"""
+UPCOMING_APPOINTMENTS_SQL = """
+    SELECT a.Appointment_ID, a.Appointment_time, a.Appointment_type, a.Reason_for_meeting,
+           t.THERAPIST_ID, t.FirstName, t.LastName
+    FROM APPOINTMENTS a
+    JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
+    JOIN THERAPIST t ON av.THERAPIST_ID = t.THERAPIST_ID
+    WHERE a.STUDENT_ID = %s AND a.Status = 'pending' AND a.Appointment_time >= NOW()
+    ORDER BY a.Appointment_time
+"""
+
+HELP_MESSAGE = "Hi {name}!! You're all set! How can I help you today? Just say hi, or try things like 'show therapists', 'schedule' to book an appointment, 'view appointments' to see your upcoming ones, or 'reschedule' or 'cancel' to manage them."
+GREETING = "Hey there, {name}! I’m here to help with your therapy needs. You can say things like 'show therapists' to see who’s available, 'schedule' to book an appointment, 'view appointments' to check your upcoming ones, or 'reschedule' or 'cancel' to manage them. What’s up?"
+TYPE_PROMPT = "Cool, let’s pick the appointment type: type 'virtual' for online or 'in_person' for in-person."
+REASON_PROMPT = "Got it! Now, what’s the reason for this appointment? (e.g., 'Therapy session for anxiety')"
+YES_OR_NO = "Just say 'yes' to confirm or 'no' to go back, please!"
+LIST_REFRESHED = "Availability may have changed since that list, so here’s a fresh one. "
+
+
+class ChatContext:
+    """
+    What a state handler works with: the session (mutated in place), the
+    user's message and a database cursor that is only opened when first used.
+    """
+
+    def __init__(self, session, user_input, connect=None, create_token=None):
+        self.session = session
+        self.user_input = user_input
+        self._connect = connect
+        self._create_token = create_token
+        self.conn = None
+        self._cursor = None
+
+    @property
+    def cursor(self):
+        if self._cursor is None:
+            if self._connect is None:
+                raise RuntimeError(f"Chatbot state '{self.session['state']}' is registered with needs_db=False")
+            self.conn = self._connect()
+            self._cursor = self.conn.cursor(dictionary=True)
+        return self._cursor
+
+    @property
+    def used_db(self):
+        return self.conn is not None
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        if self.conn is not None:
+            self.conn.rollback()
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+        if self.conn is not None:
+            self.conn.close()
+
+    def create_token(self, identity):
+        return self._create_token(identity=identity, expires_delta=timedelta(hours=1))
+
+
+class StateMetrics:
+    """Per-state turn counts and latency, for GET /admin/metrics/chatbot."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def record(self, state_name, elapsed, used_db):
+        with self._lock:
+            agg = self._states.setdefault(state_name, {"turns": 0, "db_turns": 0, "total_ms": 0.0, "max_ms": 0.0})
+            agg["turns"] += 1
+            agg["db_turns"] += used_db
+            agg["total_ms"] += elapsed * 1000
+            agg["max_ms"] = max(agg["max_ms"], elapsed * 1000)
+
+    def snapshot(self):
+        """Per-state aggregates, most total time first."""
+        with self._lock:
+            states = [
+                {
+                    "state": name,
+                    "needs_db": STATES[name].needs_db if name in STATES else None,
+                    "turns": agg["turns"],
+                    "db_turns": agg["db_turns"],
+                    "total_ms": round(agg["total_ms"], 3),
+                    "avg_ms": round(agg["total_ms"] / agg["turns"], 3),
+                    "max_ms": round(agg["max_ms"], 3),
+                }
+                for name, agg in self._states.items()
+            ]
+        states.sort(key=lambda s: s["total_ms"], reverse=True)
+        return {"states": states}
+
+    def reset(self):
+        with self._lock:
+            self._states.clear()
+
+
+state_metrics = StateMetrics()
+
+StateHandler = namedtuple("StateHandler", "name handle needs_db")
+
+STATES = {}
+
+
+def state(name, needs_db):
+    """Register the decorated function as the handler for chat state `name`."""
+    def register(handle):
+        STATES[name] = StateHandler(name, handle, needs_db)
+        return handle
+    return register
+
+
+def dispatch(session, user_input, connect=None, create_token=None):
+    """
+    Run the handler for session["state"] and return its (payload, status).
+    Database errors roll back and propagate; the connection, if one was
+    opened, is closed either way.
+    """
+    handler = STATES.get(session.get("state"))
+    if handler is None:
+        return {"message": "Oops, looks like your session expired. Let’s start a new chat!"}, 400
+
+    ctx = ChatContext(session, user_input, connect if handler.needs_db else None, create_token)
+    started = time.perf_counter()
+    try:
+        return handler.handle(ctx)
+    except Exception:
+        ctx.rollback()
+        raise
+    finally:
+        ctx.close()
+        state_metrics.record(handler.name, time.perf_counter() - started, ctx.used_db)
+
+
+# ── helpers ─────────────────────────────────────────────────
+
+def _format_date(value):
+    return value.strftime("%Y-%m-%d") if hasattr(value, "strftime") else str(value)
+
+
+def _format_time(value):
+    """A TIME column (timedelta from the connector, or time) as '3:00 PM'."""
+    if isinstance(value, timedelta):
+        total_seconds = int(value.total_seconds())
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        am_pm = "AM" if hours < 12 else "PM"
+        if hours == 0:
+            hours = 12
+        elif hours > 12:
+            hours -= 12
+        return f"{hours}:{minutes:02d} {am_pm}"
+    return value.strftime("%I:%M %p").lstrip("0")
+
+
+def _choose(ctx, key, noun):
+    """The session[key] entry the user picked by number, or (None, error reply)."""
+    options = ctx.session[key]
+    try:
+        choice = int(ctx.user_input.strip()) - 1
+    except ValueError:
+        return None, ({"message": f"Oops, I need a number to select {noun}. Can you try again?"}, 400)
+    if choice < 0 or choice >= len(options):
+        return None, ({"message": f"Hmm, that’s not a valid choice. Please pick a number between 1 and {len(options)}."}, 400)
+    return options[choice], None
+
+
+def _remember(session, key, items, therapist_id=None, complete=True):
+    """
+    Keep a list shown to the user in session[key] and stamp it. Per-therapist
+    lists carry that therapist's availability version; the therapist list only
+    has the time window, since any booking anywhere would otherwise expire it.
+    """
+    session[key] = items
+    session.setdefault("list_stamps", {})[key] = {
+        "at": time.time(),
+        "therapist_id": therapist_id,
+        "version": availability_events.version(therapist_id) if therapist_id is not None else None,
+        "complete": complete,
+    }
+
+
+def _is_fresh(session, key, complete=False):
+    """Whether session[key] can still be trusted (and, with complete=True, holds the whole list)."""
+    stamp = (session.get("list_stamps") or {}).get(key)
+    if not stamp or key not in session or time.time() - stamp["at"] > CHAT_LIST_TTL:
+        return False
+    if complete and not stamp["complete"]:
+        return False
+    return stamp["version"] is None or stamp["version"] == availability_events.version(stamp["therapist_id"])
+
+
+def _signed_in(ctx, student_id):
+    session = ctx.session
+    access_token = ctx.create_token(json.dumps({
+        "userId": session["user_id"],
+        "username": session["username"],
+        "role": session["role"],
+        "student_id": student_id
+    }))
+    session["verified"] = True
+    session["state"] = "verified"
+    session["token"] = access_token
+    # Display a simple greeting after verification
+    return {"message": HELP_MESSAGE.format(name=session["user_first_name"]), "token": access_token}, 200
+
+
+def _therapists_with_open_slots(ctx):
+    """Every therapist with an open slot, as session["therapists"]; a fresh full listing is reused."""
+    session = ctx.session
+    if _is_fresh(session, "therapists", complete=True):
+        return session["therapists"]
+    # A therapist with a rule running in the horizon counts, even if its slots turn out booked
+    ctx.cursor.execute(THERAPISTS_WITH_OPEN_SLOTS_SQL, (availability_rules.RULE_HORIZON_DAYS,))
+    therapists = [
+        {"id": t["THERAPIST_ID"], "name": f"{t['FirstName']} {t['LastName']}".strip()}
+        for t in ctx.cursor.fetchall()
+    ]
+    _remember(session, "therapists", therapists)
+    return therapists
+
+
+def _therapist_menu(session, intro, question):
+    response = intro
+    for i, therapist in enumerate(session["therapists"], 1):
+        response += f"{i}. {therapist['name']}\n"
+    response += question
+    return {"message": response}, 200
+
+
+def _load_dates(ctx):
+    """Put the selected therapist's next open dates in session["dates"]; False if there are none."""
+    ctx.cursor.execute(OPEN_DATES_SQL, (ctx.session["selected_therapist"]["id"],))
+    dates = {d["Date"] for d in ctx.cursor.fetchall()}
+    dates.update(occ["Date"] for occ in _rule_slots(ctx, *availability_rules.default_window()))
+    if not dates:
+        return False
+    _remember(ctx.session, "dates", [{"date": _format_date(d)} for d in sorted(dates)[:5]],
+              ctx.session["selected_therapist"]["id"])
+    return True
+
+
+def _rule_slots(ctx, start, end):
+    """Open recurring-rule occurrences of the selected therapist between two dates."""
+    return availability_rules.open_occurrences(ctx.cursor, start, end, [ctx.session["selected_therapist"]["id"]])
+
+
+def _no_dates(session):
+    return {"message": f"Sorry, {session['selected_therapist']['name']} doesn’t have any open dates right now."}, 200
+
+
+def _date_menu(session, note=""):
+    session["state"] = "selecting_date"
+    response = note + f"Okay, here are some available dates for {session['selected_therapist']['name']}:\n"
+    for i, date in enumerate(session["dates"], 1):
+        response += f"{i}. {date['date']}\n"
+    response += "Which date works for you?"
+    return {"message": response}, 200
+
+
+def _load_slots(ctx):
+    """Put the open slots on session["selected_date"] in session["slots"]; False if there are none."""
+    session = ctx.session
+    selected_date = datetime.strptime(session["selected_date"]["date"], "%Y-%m-%d").date()
+    time_filter = ""
+    if selected_date == datetime.now().date():
+        time_filter = "AND av.Start_Time > TIME(NOW())"
+    ctx.cursor.execute(SLOTS_ON_DATE_SQL.format(time_filter=time_filter),
+                       (session["selected_therapist"]["id"], selected_date))
+    slots = ctx.cursor.fetchall()
+    now = datetime.now()
+    slots += [
+        occ for occ in _rule_slots(ctx, selected_date, selected_date)
+        if selected_date != now.date() or occ["Start_Time"] > timedelta(hours=now.hour, minutes=now.minute, seconds=now.second)
+    ]
+    slots = sorted(slots, key=lambda slot: slot["Start_Time"])[:5]
+    if not slots:
+        return False
+    _remember(session, "slots", [
+        {"id": slot["id"], "date": _format_date(slot["Date"]), "start_time": _format_time(slot["Start_Time"])}
+        for slot in slots
+    ], session["selected_therapist"]["id"])
+    return True
+
+
+def _no_slots(session):
+    return {"message": f"Sorry, {session['selected_therapist']['name']} doesn’t have any open slots on {session['selected_date']['date']}."}, 200
+
+
+def _slot_menu(session, note=""):
+    session["state"] = "selecting_slot"
+    response = note + f"Here are the available slots for {session['selected_therapist']['name']} on {session['selected_date']['date']}:\n"
+    for i, slot in enumerate(session["slots"], 1):
+        response += f"{i}. {slot['start_time']}\n"
+    response += "Which slot would you like?"
+    return {"message": response}, 200
+
+
+def _find_slot(ctx, slot_date, slot_time):
+    """The open slot of the selected therapist at exactly `slot_time` ('3:00 PM') on `slot_date`, or None."""
+    wanted = datetime.strptime(slot_time, "%I:%M %p")
+    ctx.cursor.execute("""
+        SELECT av.ID as id, av.Date, av.Start_Time
+        FROM AVAILABILITY av
+        WHERE av.THERAPIST_ID = %s AND av.Date = %s AND av.Start_Time = %s AND av.Status = 'available'
+    """, (ctx.session["selected_therapist"]["id"], slot_date, wanted.strftime("%H:%M:%S")))
+    slot = ctx.cursor.fetchone()
+    if not slot:
+        day = datetime.strptime(slot_date, "%Y-%m-%d").date()
+        start = timedelta(hours=wanted.hour, minutes=wanted.minute)
+        slot = next((occ for occ in _rule_slots(ctx, day, day) if occ["Start_Time"] == start), None)
+    if not slot:
+        return None
+    return {"id": slot["id"], "date": _format_date(slot["Date"]), "start_time": _format_time(slot["Start_Time"])}
+
+
+def _after_therapist(ctx):
+    """
+    Next step once a therapist is chosen. A date (and time) given up front in
+    the booking request skips the date and slot lists when they are open.
+    """
+    session = ctx.session
+    prefill = session.get("booking_prefill") or {}
+    wanted_date, wanted_time = prefill.pop("date", None), prefill.pop("time", None)
+    note = ""
+    if wanted_date and wanted_date >= date.today().strftime("%Y-%m-%d"):
+        session["selected_date"] = {"date": wanted_date}
+        if wanted_time:
+            slot = _find_slot(ctx, wanted_date, wanted_time)
+            if slot:
+                session["selected_slot"] = slot
+                return _ask_type(session)
+            note = f"{wanted_time} isn’t open on {wanted_date}. "
+        if _load_slots(ctx):
+            return _slot_menu(session, note)
+    if not _load_dates(ctx):
+        return _no_dates(session)
+    return _date_menu(session)
+
+
+# A one-shot request ("book a virtual session with Dr. Lee tomorrow at 3pm for
+# anxiety") leaves what it said in session["booking_prefill"]; each step below
+# takes its answer from there and only asks when it is missing.
+
+def _ask_type(session):
+    appt_type = (session.get("booking_prefill") or {}).pop("appointment_type", None)
+    if not appt_type:
+        session["state"] = "selecting_appointment_type"
+        return {"message": TYPE_PROMPT}, 200
+    session["appointment_type"] = appt_type
+    return _ask_reason(session)
+
+
+def _ask_reason(session):
+    reason = (session.get("booking_prefill") or {}).pop("reason", None)
+    if not reason:
+        session["state"] = "entering_reason"
+        return {"message": REASON_PROMPT}, 200
+    session["reason"] = reason
+    return _confirm(session)
+
+
+def _confirm(session):
+    session["state"] = "confirming_appointment"
+    return {
+        "message": f"Let’s confirm your appointment with {session['selected_therapist']['name']} on {session['selected_slot']['date']} at {session['selected_slot']['start_time']} ({session['appointment_type']}) - {session['reason']}. Just say 'yes' to confirm or 'no' to go back."
+    }, 200
+
+
+def _upcoming_appointments(ctx):
+    ctx.cursor.execute(UPCOMING_APPOINTMENTS_SQL, (ctx.session["selected_child"]["id"],))
+    return [
+        {
+            "id": appt["Appointment_ID"],
+            "therapist": f"{appt['FirstName']} {appt['LastName']}".strip(),
+            "therapist_id": appt["THERAPIST_ID"],
+            "date": appt["Appointment_time"].strftime("%Y-%m-%d"),
+            "time": appt["Appointment_time"].strftime("%I:%M %p").lstrip("0"),
+            "type": appt["Appointment_type"],
+            "reason": appt["Reason_for_meeting"]
+        }
+        for appt in ctx.cursor.fetchall()
+    ]
+
+
+# ── sign-in ─────────────────────────────────────────────────
+
+@state("awaiting_username", needs_db=True)
+def awaiting_username(ctx):
+    session = ctx.session
+    username = ctx.user_input.strip()
+    # Join USERS with STUDENT to get the FirstName
+    ctx.cursor.execute("""
+        SELECT u.USER_ID, u.ROLE, s.FirstName
+        FROM USERS u
+        LEFT JOIN STUDENT s ON u.USER_ID = s.USER_ID
+        WHERE u.username = %s
+    """, (username,))
+    user = ctx.cursor.fetchone()
+    if not user or user["ROLE"] not in ["parent", "student"]:
+        return {"message": "Hmm, that username doesn't seem right, or you're not a parent or student. Can you try again?"}, 400
+    session["username"] = username
+    session["user_id"] = user["USER_ID"]
+    session["role"] = user["ROLE"]
+    session["user_first_name"] = user["FirstName"] if user["FirstName"] else "User"  # Fallback to "User" if FirstName is not available
+
+    if user["ROLE"] != "parent":
+        session["state"] = "awaiting_dob"
+        return {"message": "Great! Now, can you tell me your Date of Birth (YYYY-MM-DD)?"}, 200
+
+    ctx.cursor.execute("""
+        SELECT s.STUDENT_ID, s.FirstName, s.LastName
+        FROM GUARDIAN g
+        JOIN STUDENT s ON g.STUDENT_ID = s.STUDENT_ID
+        WHERE g.PARENT_ID = (SELECT PARENT_ID FROM PARENT WHERE USER_ID = %s)
+    """, (user["USER_ID"],))
+    children = ctx.cursor.fetchall()
+    if not children:
+        return {"message": "Looks like you haven't registered any children yet. You can add a child by logging into your account at /parents."}, 200
+    session["children"] = [
+        {"id": child["STUDENT_ID"], "name": f"{child['FirstName']} {child['LastName']}"}
+        for child in children
+    ]
+    session["state"] = "selecting_child"
+    response = "Alright, let’s pick a child for the appointment:\n"
+    for i, child in enumerate(session["children"], 1):
+        response += f"{i}. {child['name']}\n"
+    response += "Which child would you like to select?"
+    return {"message": response}, 200
+
+
+@state("selecting_child", needs_db=False)
+def selecting_child(ctx):
+    child, error = _choose(ctx, "children", "a child")
+    if error:
+        return error
+    ctx.session["selected_child"] = child
+    ctx.session["state"] = "awaiting_child_dob"
+    return {"message": f"Got it! Now, what’s the Date of Birth (YYYY-MM-DD) for {child['name']}?"}, 200
+
+
+@state("awaiting_child_dob", needs_db=True)
+def awaiting_child_dob(ctx):
+    try:
+        provided_dob = datetime.strptime(ctx.user_input.strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return {"message": "Hmm, that date format doesn’t look right. Can you try again using YYYY-MM-DD?"}, 400
+
+    ctx.cursor.execute("SELECT DOB FROM STUDENT WHERE STUDENT_ID = %s", (ctx.session["selected_child"]["id"],))
+    child_details = ctx.cursor.fetchone()
+    if not child_details:
+        return {"message": "I couldn’t find that child’s details. Let’s try again."}, 404
+    if child_details["DOB"] != provided_dob:
+        return {"message": "That Date of Birth doesn’t match our records for this child. Can you double-check?"}, 400
+    return _signed_in(ctx, ctx.session["selected_child"]["id"])
+
+
+@state("awaiting_dob", needs_db=True)
+def awaiting_dob(ctx):
+    try:
+        provided_dob = datetime.strptime(ctx.user_input.strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return {"message": "Hmm, that date format doesn’t look right. Can you try again using YYYY-MM-DD?"}, 400
+
+    ctx.cursor.execute("SELECT DOB, STUDENT_ID FROM STUDENT WHERE USER_ID = %s", (ctx.session["user_id"],))
+    user_details = ctx.cursor.fetchone()
+    if not user_details:
+        return {"message": "I couldn’t find your details. Let’s try again."}, 404
+    if user_details["DOB"] != provided_dob:
+        return {"message": "That Date of Birth doesn’t match our records. Can you double-check?"}, 400
+    ctx.session["selected_child"] = {"id": user_details["STUDENT_ID"]}
+    return _signed_in(ctx, user_details["STUDENT_ID"])
+
+
+# ── commands ────────────────────────────────────────────────
+
+@state("verified", needs_db=True)
+def verified(ctx):
+    session = ctx.session
+    # Try NLU processing first
+    intent, entities = extract_intent_and_entities(ctx.user_input)
+
+    if intent:
+        # If NLU detected an intent, use it as the command
+        command = intent
+        session["nlu_entities"] = entities  # Store entities for later use
+        print(f"Command set to: {command}, Entities: {entities}")  # Debug log
+    else:
+        # Fallback to manual command
+        command = ctx.user_input.lower().strip()
+        print(f"No intent detected, command set to: {command}")  # Debug log
+
+    session.pop("booking_prefill", None)  # details from an earlier booking request don't carry over
+
+    # Greet the user once; a first message that already asks for something is answered instead
+    if not session["has_greeted"]:
+        session["has_greeted"] = True
+        if command == "greet" or not intent:
+            return {"message": GREETING.format(name=session["user_first_name"])}, 200
+
+    # A bare number right after a therapist listing picks from it
+    if not intent and command.isdigit() and session.get("therapists"):
+        return pick_listed_therapist(ctx)
+    if command == "show_therapists" or (command in ["more", "next"] and "therapist_offset" in session):
+        return show_therapists(ctx, command)
+    if command == "schedule":
+        return schedule(ctx, entities)
+    if command in ["view_appointments", "reschedule", "cancel"]:
+        return list_appointments(ctx, command)
+
+    print("Reached default else block in verified state")  # Debug log
+    return {"message": "Hmm, I didn’t quite catch that. What would you like to do? You can say 'show therapists' to see available therapists, 'schedule' to book an appointment, 'view appointments' to check your upcoming ones, or 'reschedule' or 'cancel' to manage them."}, 200
+
+
+def show_therapists(ctx, command):
+    session = ctx.session
+    # A new listing starts at the top; "more"/"next" continue where the last page ended
+    offset = session["therapist_offset"] if command in ["more", "next"] else 0
+    if offset == 0 or len(session.get("therapists") or []) != offset or not _is_fresh(session, "therapists"):
+        offset = 0  # another flow replaced the listed therapists, or they are stale; start over
+        session["therapists"] = []
+    # One page of therapists with an open slot or a running rule, each with its
+    # next open AVAILABILITY slot (NULL for rule-only therapists), in a single query
+    ctx.cursor.execute(THERAPIST_PAGE_SQL, (availability_rules.RULE_HORIZON_DAYS, THERAPIST_PAGE_SIZE, offset))
+    rows = ctx.cursor.fetchall()
+    # Rule occurrences may come before a therapist's first AVAILABILITY slot (or be their only ones)
+    next_slots = {row["THERAPIST_ID"]: (row["Date"], row["Start_Time"]) for row in rows if row["Date"] is not None}
+    if rows:
+        window = availability_rules.default_window()
+        for occ in availability_rules.open_occurrences(ctx.cursor, *window, [row["THERAPIST_ID"] for row in rows]):
+            current = next_slots.get(occ["THERAPIST_ID"])
+            if current is None or (occ["Date"], occ["Start_Time"]) < current:
+                next_slots[occ["THERAPIST_ID"]] = (occ["Date"], occ["Start_Time"])
+    therapist_availability = []
+    for row in rows:
+        next_slot = next_slots.get(row["THERAPIST_ID"])
+        therapist_availability.append({
+            "name": f"{row['FirstName']} {row['LastName']}".strip(),
+            "id": row["THERAPIST_ID"],
+            "next_slot": f"{_format_date(next_slot[0])} at {_format_time(next_slot[1])}" if next_slot
+                         else f"fully booked for the next {availability_rules.RULE_HORIZON_DAYS} days"
+        })
+
+    if not therapist_availability:
+        session.pop("therapist_offset", None)
+        if offset:
+            return {"message": "That’s everyone with open slots right now. Say 'show therapists' to start over."}, 200
+        return {"message": "Sorry, there aren’t any therapists available right now."}, 200
+
+    # Numbering continues across pages; session["therapists"][n - 1] is therapist n
+    total = rows[0]["total"]
+    shown = offset + len(therapist_availability)
+    _remember(session, "therapists",
+              session["therapists"] + [{"id": t["id"], "name": t["name"]} for t in therapist_availability],
+              complete=shown >= total)
+    if offset == 0:
+        therapist_message = "Here’s who’s available and their next open slots:\n"
+    else:
+        therapist_message = f"Here are more therapists ({offset + 1}-{shown} of {total}):\n"
+    for i, therapist in enumerate(therapist_availability, offset + 1):
+        therapist_message += f"{i}. {therapist['name']} - Next open slot: {therapist['next_slot']}\n"
+    if shown < total:
+        session["therapist_offset"] = shown
+        therapist_message += f"Showing {shown} of {total}. Say 'more' to see the next ones. "
+    else:
+        session.pop("therapist_offset", None)
+    therapist_message += "Pick a therapist by number to schedule, or let me know what else you’d like to do!"
+    return {"message": therapist_message}, 200
+
+
+def pick_listed_therapist(ctx):
+    """A number typed after "show therapists": resolved from the listing on the session."""
+    session = ctx.session
+    if not _is_fresh(session, "therapists"):
+        payload, status = show_therapists(ctx, "show_therapists")
+        if session.get("therapists"):
+            payload["message"] = LIST_REFRESHED + payload["message"]
+        return payload, status
+    therapist, error = _choose(ctx, "therapists", "a therapist")
+    if error:
+        return error
+    session["selected_therapist"] = therapist
+    return _after_therapist(ctx)
+
+
+def schedule(ctx, entities):
+    session = ctx.session
+    session["booking_prefill"] = {
+        key: entities[key] for key in ("date", "time", "appointment_type", "reason") if entities.get(key)
+    }
+    therapist_name = entities.get("therapist")
+    print(f"Therapist name extracted: {therapist_name}")  # Debug log
+    if not therapist_name:
+        # Default flow if NLU didn't provide a therapist
+        print("No therapist name provided by NLU, listing all therapists")  # Debug log
+        if not _therapists_with_open_slots(ctx):
+            return {"message": "Sorry, there aren’t any therapists available right now."}, 200
+        session["state"] = "selecting_therapist"
+        return _therapist_menu(session, "Let’s pick a therapist first! Here’s who’s available:\n",
+                               "Who would you like to schedule with?")
+
+    # Resolve the name in memory, then keep the best-ranked candidate with open slots
+    therapist_index.ensure_loaded(ctx.cursor)
+    candidates = therapist_index.lookup(therapist_name)
+    therapist = None
+    if candidates:
+        ids = [c["id"] for c in candidates]
+        placeholders = ", ".join(["%s"] * len(ids))
+        ctx.cursor.execute(f"""
+            SELECT DISTINCT THERAPIST_ID
+            FROM AVAILABILITY
+            WHERE THERAPIST_ID IN ({placeholders}) AND Status = 'available' AND Date >= CURDATE()
+            UNION
+            SELECT THERAPIST_ID
+            FROM AVAILABILITY_RULE
+            WHERE THERAPIST_ID IN ({placeholders}) AND End_Date >= CURDATE()
+              AND Start_Date <= CURDATE() + INTERVAL %s DAY
+        """, ids + ids + [availability_rules.RULE_HORIZON_DAYS])
+        open_ids = {row["THERAPIST_ID"] for row in ctx.cursor.fetchall()}
+        therapist = next((c for c in candidates if c["id"] in open_ids), None)
+    print(f"Therapist search result: {therapist} (candidates: {candidates})")  # Debug log
+    if not therapist:
+        # Dynamically fetch available therapists for the error message
+        therapist_list = ", ".join(t["name"] for t in _therapists_with_open_slots(ctx))
+        print(f"Therapist not found, returning list: {therapist_list}")  # Debug log
+        return {"message": f"I couldn’t find a therapist matching '{therapist_name}'. Try again or pick from this list: {therapist_list}."}, 200
+
+    session["selected_therapist"] = {"id": therapist["id"], "name": therapist["name"]}
+    print(f"Therapist selected: {session['selected_therapist']['name']}")  # Debug log
+    return _after_therapist(ctx)
+
+
+def list_appointments(ctx, command):
+    session = ctx.session
+    appointments = _upcoming_appointments(ctx)
+    if not appointments:
+        if command == "view_appointments":
+            return {"message": "Looks like you don’t have any upcoming appointments right now."}, 200
+        return {"message": f"You don’t have any upcoming appointments to {command} right now."}, 200
+
+    session["appointments"] = appointments
+    response = "Here are your upcoming appointments:\n"
+    for i, appt in enumerate(appointments, 1):
+        response += f"{i}. {appt['therapist']} on {appt['date']} at {appt['time']} ({appt['type']}) - {appt['reason']}\n"
+    if command == "view_appointments":
+        response += "You can pick an appointment number to reschedule or cancel it, or type 'schedule' to book a new one."
+    else:
+        session["state"] = "selecting_appointment_" + command
+        response += f"Which appointment would you like to {command}?"
+    return {"message": response}, 200
+
+
+# ── rescheduling and cancelling ─────────────────────────────
+
+@state("selecting_appointment_reschedule", needs_db=True)
+def selecting_appointment_reschedule(ctx):
+    session = ctx.session
+    appointment, error = _choose(ctx, "appointments", "an appointment")
+    if error:
+        return error
+    session["selected_appointment"] = appointment
+    session["state"] = "selecting_therapist"
+
+    # Start the scheduling flow for a new slot, but don't free the slot yet
+    if not _therapists_with_open_slots(ctx):
+        return {"message": "Sorry, there aren’t any therapists available right now for rescheduling."}, 200
+    return _therapist_menu(session, "Let’s reschedule that appointment. Here are the available therapists:\n",
+                           "Who would you like to reschedule with?")
+
+
+@state("selecting_appointment_cancel", needs_db=False)
+def selecting_appointment_cancel(ctx):
+    appointment, error = _choose(ctx, "appointments", "an appointment")
+    if error:
+        return error
+    ctx.session["selected_appointment"] = appointment
+    ctx.session["state"] = "confirming_cancellation"
+    return {
+        "message": f"Are you sure you want to cancel your appointment with {appointment['therapist']} on {appointment['date']} at {appointment['time']}? Just say 'yes' to confirm or 'no' to go back."
+    }, 200
+
+
+@state("confirming_cancellation", needs_db=True)
+def confirming_cancellation(ctx):
+    session = ctx.session
+    response = ctx.user_input.lower().strip()
+    if response == "yes":
+        appointment = session["selected_appointment"]
+        ctx.cursor.execute("UPDATE AVAILABILITY SET Status = 'available' WHERE ID = (SELECT AVAILABILITY_ID FROM APPOINTMENTS WHERE Appointment_ID = %s)", (appointment["id"],))
+        ctx.cursor.execute("UPDATE APPOINTMENTS SET Status = 'cancelled' WHERE Appointment_ID = %s", (appointment["id"],))
+        ctx.commit()
+        availability_events.publish(availability_events.RELEASED, appointment.get("therapist_id"))
+        session["state"] = "verified"
+        return {
+            "message": f"Okay, I’ve cancelled your appointment with {appointment['therapist']} on {appointment['date']} at {appointment['time']}. Anything else I can help with? You can 'schedule' a new appointment, 'view appointments', or 'reschedule' or 'cancel' others."
+        }, 200
+    if response == "no":
+        session["state"] = "verified"
+        return {
+            "message": "No worries, I’ve cancelled the cancellation! What else can I help with? You can 'show therapists', 'schedule', 'view appointments', 'reschedule', or 'cancel' an appointment."
+        }, 200
+    return {"message": YES_OR_NO}, 400
+
+
+# ── booking ─────────────────────────────────────────────────
+
+# A pick from a stale list is not acted on: the list is fetched again and
+# re-shown, since its numbering may no longer match what is open.
+
+@state("selecting_therapist", needs_db=True)
+def selecting_therapist(ctx):
+    session = ctx.session
+    if not _is_fresh(session, "therapists"):
+        if not _therapists_with_open_slots(ctx):
+            session["state"] = "verified"
+            return {"message": "Sorry, there aren’t any therapists available right now."}, 200
+        return _therapist_menu(session, LIST_REFRESHED + "Here’s who’s available:\n", "Who would you like?")
+    therapist, error = _choose(ctx, "therapists", "a therapist")
+    if error:
+        return error
+    session["selected_therapist"] = therapist
+    return _after_therapist(ctx)
+
+
+@state("selecting_date", needs_db=True)
+def selecting_date(ctx):
+    session = ctx.session
+    if not _is_fresh(session, "dates"):
+        if not _load_dates(ctx):
+            return _no_dates(session)
+        return _date_menu(session, LIST_REFRESHED)
+    date, error = _choose(ctx, "dates", "a date")
+    if error:
+        return error
+    session["selected_date"] = date
+    if not _load_slots(ctx):
+        return _no_slots(session)
+    return _slot_menu(session)
+
+
+@state("selecting_slot", needs_db=True)
+def selecting_slot(ctx):
+    session = ctx.session
+    if not _is_fresh(session, "slots"):
+        if not _load_slots(ctx):
+            return _no_slots(session)
+        return _slot_menu(session, LIST_REFRESHED)
+    slot, error = _choose(ctx, "slots", "a slot")
+    if error:
+        return error
+    session["selected_slot"] = slot
+    return _ask_type(session)
+
+
+@state("selecting_appointment_type", needs_db=False)
+def selecting_appointment_type(ctx):
+    appt_type = ctx.user_input.lower().strip()
+    if appt_type not in ["virtual", "in_person"]:
+        return {"message": "Hmm, that’s not quite right. Please type 'virtual' for online or 'in_person' for in-person."}, 400
+    ctx.session["appointment_type"] = appt_type
+    return _ask_reason(ctx.session)
+
+
+@state("entering_reason", needs_db=False)
+def entering_reason(ctx):
+    reason = ctx.user_input.strip()
+    if not reason:
+        return {"message": "I need a reason for the appointment. Can you tell me why you’re booking this?"}, 400
+    ctx.session["reason"] = reason
+    return _confirm(ctx.session)
+
+
+@state("confirming_appointment", needs_db=True)
+def confirming_appointment(ctx):
+    session = ctx.session
+    response = ctx.user_input.lower().strip()
+    if response == "no":
+        session["state"] = "verified"
+        return {
+            "message": "No problem, I’ve cancelled that booking for now. What else can I help with? You can 'show therapists', 'schedule', 'view appointments', 'reschedule', or 'cancel' an appointment."
+        }, 200
+    if response != "yes":
+        return {"message": YES_OR_NO}, 400
+
+    # Claiming the slot is the authoritative availability check
+    cursor = ctx.cursor
+    slot_id = session["selected_slot"]["id"]
+    try:
+        slot = claim_slot(cursor, slot_id)
+    except SlotUnavailable:
+        ctx.rollback()
+        return {"message": "Oh no, that slot isn’t available anymore. Let’s pick a different one."}, 400
+
+    # Same rule as the booking routes: one appointment per therapist per day
+    rescheduled = session.get("selected_appointment")
+    if has_same_day_appointment(cursor, session["selected_child"]["id"], slot,
+                                exclude_appointment_id=rescheduled["id"] if rescheduled else None):
+        ctx.rollback()
+        if session["role"] == "parent":
+            return {"message": "This child already has an appointment with this therapist on the same day."}, 400
+        return {"message": "You already have an appointment with this therapist on the same day."}, 400
+
+    # If rescheduling, free up the old slot
+    if rescheduled:
+        cursor.execute("UPDATE AVAILABILITY SET Status = 'available' WHERE ID = (SELECT AVAILABILITY_ID FROM APPOINTMENTS WHERE Appointment_ID = %s)", (session["selected_appointment"]["id"],))
+        cursor.execute("UPDATE APPOINTMENTS SET Status = 'cancelled' WHERE Appointment_ID = %s", (session["selected_appointment"]["id"],))
+
+    # Book the new appointment
+    insert_appointment(cursor, slot, session["selected_child"]["id"], session["appointment_type"], session["reason"],
+                       parent_user_id=session["user_id"] if session["role"] == "parent" else None)
+    ctx.commit()
+    if rescheduled:
+        availability_events.publish(availability_events.RELEASED, rescheduled.get("therapist_id"))
+    availability_events.publish(availability_events.BOOKED, session["selected_therapist"]["id"], [slot["ID"]])
+
+    session["state"] = "verified"
+    success_message = "Awesome, your appointment is booked!"
+    if session["role"] == "parent":
+        success_message += f" It’s for {session['selected_child']['name']}"
+    success_message += f" with {session['selected_therapist']['name']} on {session['selected_slot']['date']} at {session['selected_slot']['start_time']} ({session['appointment_type']}). Anything else I can help with? You can 'schedule' another appointment, 'view appointments', 'reschedule', or 'cancel'."
+    return {"message": success_message}, 200
@@ -1,12 +1,51 @@
 from flask import request, jsonify
 import mysql.connector
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import bcrypt
 from utils.emailer import send_appt_email 
-from utils.emailer import notify_parent_for_appt, notify_therapist_for_appt 
+from utils.outbox import enqueue_appt_notifications
+from utils import availability_events, availability_rules, pagination
+from utils.open_slot_index import open_slot_index
+from utils.slot_reservation import (SlotUnavailable, claim_slot, has_same_day_appointment,
+                                    insert_appointment, move_appointment)
 from flask_mail import Mail         
 
+# The appointment rows a parent sees; the statements below add which and in what order
+# (module-level so scripts/explain_check.py EXPLAINs exactly these)
+PARENT_APPOINTMENT_ROWS_SQL = """
+    SELECT 
+      a.Appointment_ID as id,
+      a.Appointment_time,
+      a.Status,
+      a.Appointment_type,
+      a.Meeting_link,
+      s.FirstName as child_first_name,
+      s.LastName as child_last_name,
+      s.STUDENT_ID as child_id,
+      t.THERAPIST_ID as therapist_id,
+      t.FirstName as therapist_first_name,
+      t.LastName as therapist_last_name
+    FROM APPOINTMENTS a
+    JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
+    JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
+    JOIN THERAPIST t ON av.THERAPIST_ID = t.THERAPIST_ID
+"""
+PARENT_APPOINTMENTS_SQL = PARENT_APPOINTMENT_ROWS_SQL + """
+    JOIN GUARDIAN g ON s.STUDENT_ID = g.STUDENT_ID
+    WHERE g.PARENT_ID = %s
+      AND a.Status != 'cancelled'
+    ORDER BY a.Appointment_time DESC
+"""
+# A page: one child's range each, {keyset} filled in past the first page, joined
+# with UNION ALL and cut by MERGED_PAGE_SQL
+CHILD_APPOINTMENTS_PAGE_SQL = "(" + PARENT_APPOINTMENT_ROWS_SQL + """
+    WHERE a.STUDENT_ID = %s AND a.Status != 'cancelled'{keyset}
+    ORDER BY a.Appointment_time DESC, a.Appointment_ID DESC
+    LIMIT %s)"""
+APPOINTMENTS_AFTER_SQL = " AND (a.Appointment_time < %s OR (a.Appointment_time = %s AND a.Appointment_ID < %s))"
+MERGED_PAGE_SQL = " ORDER BY Appointment_time DESC, id DESC LIMIT %s"
+
 def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail):
     """
     Register parent-specific routes with the Flask app.
@@ -284,6 +323,10 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
     @jwt_required()
     def get_parent_appointments():
         user_id = get_parent_user_id()
+        try:
+            page = pagination.page_request(request.args, "parent_appointments", 2)
+        except pagination.InvalidPage as e:
+            return jsonify({"message": str(e)}), 400
         try:
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
@@ -293,31 +336,27 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
                 return jsonify({"message": "Parent record not found."}), 404
             parent_id = parent_row["PARENT_ID"]
 
-            # Exclude appointments with Status = 'cancelled'
-            query = """
-                SELECT 
-                  a.Appointment_ID as id,
-                  a.Appointment_time,
-                  a.Status,
-                  a.Appointment_type,
-                  a.Meeting_link,
-                  s.FirstName as child_first_name,
-                  s.LastName as child_last_name,
-                  s.STUDENT_ID as child_id,
-                  t.THERAPIST_ID as therapist_id,
-                  t.FirstName as therapist_first_name,
-                  t.LastName as therapist_last_name
-                FROM APPOINTMENTS a
-                JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
-                JOIN GUARDIAN g ON s.STUDENT_ID = g.STUDENT_ID
-                JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
-                JOIN THERAPIST t ON av.THERAPIST_ID = t.THERAPIST_ID
-                WHERE g.PARENT_ID = %s
-                  AND a.Status != 'cancelled'
-                ORDER BY a.Appointment_time DESC
-            """
-            cursor.execute(query, (parent_id,))
-            rows = cursor.fetchall()
+            next_cursor = None
+            if page:
+                # One bounded range of (STUDENT_ID, Appointment_time) per child, merged
+                cursor.execute("SELECT STUDENT_ID FROM GUARDIAN WHERE PARENT_ID = %s", (parent_id,))
+                children = [row["STUDENT_ID"] for row in cursor.fetchall()]
+                part = CHILD_APPOINTMENTS_PAGE_SQL.format(keyset=APPOINTMENTS_AFTER_SQL if page.after else "")
+                rows = []
+                if children:
+                    params = []
+                    for child_id in children:
+                        params.append(child_id)
+                        if page.after:
+                            params += [page.after[0], page.after[0], page.after[1]]
+                        params.append(page.limit + 1)
+                    cursor.execute(" UNION ALL ".join([part] * len(children)) + MERGED_PAGE_SQL,
+                                   params + [page.limit + 1])
+                    rows = cursor.fetchall()
+                rows, next_cursor = pagination.split_page(rows, page, lambda row: (row["Appointment_time"], row["id"]))
+            else:
+                cursor.execute(PARENT_APPOINTMENTS_SQL, (parent_id,))
+                rows = cursor.fetchall()
             appts = []
             for row in rows:
                 therapist_full = f"{row['therapist_first_name']} {row['therapist_last_name']}"
@@ -334,6 +373,8 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
                     "child_name": child_full,
                     "child_id": row["child_id"]
                 })
+            if page:
+                return jsonify({"appointments": appts, "nextCursor": next_cursor}), 200
             return jsonify({"appointments": appts}), 200
         except mysql.connector.Error as err:
             print("Database error in get_parent_appointments:", err)
@@ -349,56 +390,27 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
     @jwt_required()
     def get_available_appointments():
         """
-        Returns available appointment slots grouped by therapist.
+        Returns available appointment slots grouped by therapist. Slots from
+        recurring rules are included for ?from=&to= (default: the next few weeks).
         """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            query = """
-                SELECT
-                    av.ID as id,
-                    av.Date,
-                    av.Start_Time,
-                    av.End_Time,
-                    t.FirstName as therapist_first_name,
-                    t.LastName as therapist_last_name,
-                    t.THERAPIST_ID as therapist_id
-                FROM AVAILABILITY av
-                JOIN THERAPIST t ON av.THERAPIST_ID = t.THERAPIST_ID
-                WHERE av.Status = 'available'
-                  AND av.Date >= CURDATE()
-                ORDER BY t.FirstName, t.LastName, av.Date, av.Start_Time
-            """
-            cursor.execute(query)
-            rows = cursor.fetchall()
-
-            # Group slots by therapist full name.
-            grouped = {}
-            for row in rows:
-                therapist_name = f"{row['therapist_first_name']} {row['therapist_last_name']}"
-                slot = {
-                    "id": row["id"],
-                    "date": row["Date"].strftime("%Y-%m-%d") if hasattr(row["Date"], "strftime") else str(row["Date"]),
-                    "start_time": row["Start_Time"].strftime("%H:%M:%S") if hasattr(row["Start_Time"], "strftime") else str(row["Start_Time"]),
-                    "end_time": row["End_Time"].strftime("%H:%M:%S") if hasattr(row["End_Time"], "strftime") else str(row["End_Time"])
-                }
-                if therapist_name not in grouped:
-                    grouped[therapist_name] = {
-                        "therapist_id": row["therapist_id"],
-                        "therapist_name": therapist_name,
-                        "appointments": []
-                    }
-                grouped[therapist_name]["appointments"].append(slot)
-            result = list(grouped.values())
+            window = availability_rules.parse_window(request.args)
+        except ValueError:
+            return jsonify({"message": "from and to must be dates (YYYY-MM-DD)"}), 400
+        try:
+            page = pagination.page_request(request.args, "parent_available", 3)
+        except pagination.InvalidPage as e:
+            return jsonify({"message": str(e)}), 400
+        try:
+            # Served from memory; the database is only read when slots changed since the last request
+            if page:
+                result, next_cursor = open_slot_index.parent_page(get_db_connection, page, window)
+                return jsonify({"availableAppointments": result, "nextCursor": next_cursor}), 200
+            result = open_slot_index.parent_listing(get_db_connection, window)
             return jsonify({"availableAppointments": result}), 200
         except mysql.connector.Error as err:
             print("Database error in get_available_appointments:", err)
             return jsonify({"message": "Error fetching available appointments."}), 500
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     # --- Get Appointments for a Specific Child ---
     @app.route("/parents/child-appointments/<int:child_id>", methods=["GET"])
@@ -493,61 +505,23 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             guardian_row = cursor.fetchone()
             if not guardian_row:
                 return jsonify({"message": "Child does not belong to this parent."}), 403
-            # Check if the appointment slot is available.
-            cursor.execute("""
-                SELECT ID, Date, Start_Time, THERAPIST_ID
-                FROM AVAILABILITY
-                WHERE ID = %s AND Status = 'available'
-            """, (slot_id,))
-            slot_row = cursor.fetchone()
-            if not slot_row:
+            # Claim the slot; a concurrent booking of the same slot gets SlotUnavailable.
+            try:
+                slot_row = claim_slot(cursor, slot_id)
+            except SlotUnavailable:
+                conn.rollback()
                 return jsonify({"message": "Slot not found or already booked."}), 404
 
             # Check if the child already has an appointment with this therapist on the same day
-            slot_date = slot_row["Date"].strftime('%Y-%m-%d') if isinstance(slot_row["Date"], datetime) else slot_row["Date"]
-            cursor.execute(
-                """
-                SELECT COUNT(*) AS count
-                FROM APPOINTMENTS a
-                JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
-                WHERE a.STUDENT_ID = %s
-                  AND av.THERAPIST_ID = %s
-                  AND DATE(a.Appointment_time) = %s
-                  AND a.Status != 'cancelled'
-                """,
-                (child_id, slot_row["THERAPIST_ID"], slot_date)
-            )
-            existing_appointment = cursor.fetchone()
-            if existing_appointment['count'] > 0:
+            if has_same_day_appointment(cursor, child_id, slot_row):
+                conn.rollback()
                 return jsonify({"message": "This child already has an appointment with this therapist on the same day."}), 400
 
-            start_value = slot_row["Start_Time"]
-            if isinstance(start_value, timedelta):
-                start_time = (datetime.min + start_value).time()
-            else:
-                start_time = start_value
-            appt_datetime = datetime.combine(slot_row["Date"], start_time)
-            insert_q = """
-                INSERT INTO APPOINTMENTS
-                (STUDENT_ID, AVAILABILITY_ID, Appointment_time, Status, Appointment_type, Reason_for_meeting, PARENTID)
-                VALUES (%s, %s, %s, %s, %s, %s, (SELECT PARENT_ID FROM PARENT WHERE USER_ID = %s))
-            """
-            cursor.execute(insert_q, (
-                child_id,
-                slot_id,
-                appt_datetime,
-                "pending",
-                appointment_type,
-                reason_for_meeting,
-                user_id
-            ))
-            new_appointment_id = cursor.lastrowid
-            cursor.execute("UPDATE AVAILABILITY SET Status = 'not_available' WHERE ID = %s", (slot_id,))
+            new_appointment_id = insert_appointment(cursor, slot_row, child_id, appointment_type,
+                                                    reason_for_meeting, parent_user_id=user_id)
+            enqueue_appt_notifications(cursor, new_appointment_id, "booked", ("parent", "therapist"))
             conn.commit()
-
-            notify_parent_for_appt(cursor, mail, new_appointment_id, "booked")
-            
-            notify_therapist_for_appt(cursor, mail, new_appointment_id, "booked")
+            availability_events.publish(availability_events.BOOKED, slot_row["THERAPIST_ID"], [slot_row["ID"]])
 
             return jsonify({
                 "message": "Appointment booked successfully, pending therapist confirmation",
@@ -577,8 +551,9 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             cursor = conn.cursor(dictionary=True)
             # Verify appointment ownership.
             cursor.execute("""
-                SELECT a.Appointment_ID as id, a.AVAILABILITY_ID
+                SELECT a.Appointment_ID as id, a.AVAILABILITY_ID, av.THERAPIST_ID
                 FROM APPOINTMENTS a
+                JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
                 JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
                 JOIN GUARDIAN g ON s.STUDENT_ID = g.STUDENT_ID
                 WHERE a.Appointment_ID = %s
@@ -591,11 +566,9 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             cursor.execute("UPDATE APPOINTMENTS SET Status = 'cancelled' WHERE Appointment_ID = %s", (appointment_id,))
             # Mark the availability slot as available.
             cursor.execute("UPDATE AVAILABILITY SET Status = 'available' WHERE ID = %s", (appointment["AVAILABILITY_ID"],))
+            enqueue_appt_notifications(cursor, appointment_id, "cancelled", ("parent", "therapist"))
             conn.commit()
-
-            notify_parent_for_appt(cursor, mail, appointment_id, "cancelled")
-
-            notify_therapist_for_appt(cursor, mail, appointment_id, "cancelled")
+            availability_events.publish(availability_events.RELEASED, appointment["THERAPIST_ID"], [appointment["AVAILABILITY_ID"]])
 
             return jsonify({"message": "Appointment cancelled successfully."}), 200
         except mysql.connector.Error as err:
@@ -623,8 +596,9 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             cursor = conn.cursor(dictionary=True)
             # Verify appointment ownership.
             cursor.execute("""
-                SELECT a.Appointment_ID as id, a.AVAILABILITY_ID, a.Appointment_time, a.STUDENT_ID
+                SELECT a.Appointment_ID as id, a.AVAILABILITY_ID, a.Appointment_time, a.STUDENT_ID, av.THERAPIST_ID
                 FROM APPOINTMENTS a
+                JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
                 JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
                 JOIN GUARDIAN g ON s.STUDENT_ID = g.STUDENT_ID
                 WHERE a.Appointment_ID = %s
@@ -633,57 +607,24 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             appointment = cursor.fetchone()
             if not appointment:
                 return jsonify({"message": "Appointment not found or permission denied."}), 403
-            # Check that the new slot is available.
-            cursor.execute("""
-                SELECT ID, Date, Start_Time, THERAPIST_ID
-                FROM AVAILABILITY
-                WHERE ID = %s AND Status = 'available'
-            """, (new_slot_id,))
-            new_slot = cursor.fetchone()
-            if not new_slot:
+            # Claim the new slot.
+            try:
+                new_slot = claim_slot(cursor, new_slot_id)
+            except SlotUnavailable:
+                conn.rollback()
                 return jsonify({"message": "New slot not available."}), 404
 
             # Check if the child already has an appointment with this therapist on the same day
-            slot_date = new_slot["Date"].strftime('%Y-%m-%d') if isinstance(new_slot["Date"], datetime) else new_slot["Date"]
-            cursor.execute(
-                """
-                SELECT COUNT(*) AS count
-                FROM APPOINTMENTS a
-                JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
-                WHERE a.STUDENT_ID = %s
-                  AND av.THERAPIST_ID = %s
-                  AND DATE(a.Appointment_time) = %s
-                  AND a.Status != 'cancelled'
-                  AND a.Appointment_ID != %s
-                """,
-                (appointment["STUDENT_ID"], new_slot["THERAPIST_ID"], slot_date, appointment_id)
-            )
-            existing_appointment = cursor.fetchone()
-            if existing_appointment['count'] > 0:
+            if has_same_day_appointment(cursor, appointment["STUDENT_ID"], new_slot, exclude_appointment_id=appointment_id):
+                conn.rollback()
                 return jsonify({"message": "This child already has an appointment with this therapist on the same day."}), 400
 
-            start_value = new_slot["Start_Time"]
-            if isinstance(start_value, timedelta):
-                new_start_time = (datetime.min + start_value).time()
-            else:
-                new_start_time = start_value
-            new_appt_datetime = datetime.combine(new_slot["Date"], new_start_time)
-            # Update the appointment with the new slot and appointment time.
-            cursor.execute("""
-                UPDATE APPOINTMENTS
-                SET AVAILABILITY_ID = %s, Appointment_time = %s, Status = 'pending'
-                WHERE Appointment_ID = %s
-            """, (new_slot_id, new_appt_datetime, appointment_id))
-            # Set the old slot status to 'available'.
-            cursor.execute("UPDATE AVAILABILITY SET Status = 'available' WHERE ID = %s", (appointment["AVAILABILITY_ID"],))
-            # Mark the new slot as 'not_available'.
-            cursor.execute("UPDATE AVAILABILITY SET Status = 'not_available' WHERE ID = %s", (new_slot_id,))
-            
-            notify_parent_for_appt(cursor, mail, appointment_id, "rescheduled")
-
-            notify_therapist_for_appt(cursor, mail, appointment_id, "rescheduled")
-            
+            # Move the appointment to the new slot and reopen the old one.
+            move_appointment(cursor, appointment_id, appointment["AVAILABILITY_ID"], new_slot)
+            enqueue_appt_notifications(cursor, appointment_id, "rescheduled", ("parent", "therapist"))
             conn.commit()
+            availability_events.publish(availability_events.RELEASED, appointment["THERAPIST_ID"], [appointment["AVAILABILITY_ID"]])
+            availability_events.publish(availability_events.BOOKED, new_slot["THERAPIST_ID"], [new_slot["ID"]])
             return jsonify({"message": "Appointment rescheduled successfully, pending therapist confirmation"}), 200
         except mysql.connector.Error as err:
             conn.rollback()
@@ -824,6 +765,9 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             )
             
             conn.commit()
+            if child_appointments:
+                availability_events.publish(availability_events.RELEASED, None,
+                                            [appt["AVAILABILITY_ID"] for appt in child_appointments])
             return jsonify({"message": "Child account and associated appointments deleted successfully."}), 200
 
         except mysql.connector.Error as err:
@@ -3,7 +3,27 @@ from flask import jsonify, request
 from datetime import datetime
 import json
 import uuid
-from utils.emailer import notify_student_for_appt, notify_therapist_for_appt
+from utils.outbox import enqueue_appt_notifications
+from utils import availability_events, availability_rules, pagination
+from utils.open_slot_index import open_slot_index
+from utils.slot_reservation import (SlotUnavailable, claim_slot, has_same_day_appointment,
+                                    insert_appointment, move_appointment)
+
+# A student's appointments, newest first; a page fills in {keyset} and {limit}
+# (module-level so scripts/explain_check.py EXPLAINs exactly these)
+STUDENT_APPOINTMENTS_SQL = """
+    SELECT a.Appointment_ID AS id, a.Appointment_time, a.Status AS status,
+           a.Appointment_type AS appointment_type, a.Meeting_link AS meeting_link,
+           a.Reason_for_meeting AS reasonForMeeting,
+           CONCAT(t.FirstName,' ',t.LastName) AS therapist_name,
+           t.THERAPIST_ID AS therapist_id
+    FROM APPOINTMENTS a
+    JOIN AVAILABILITY av ON a.AVAILABILITY_ID=av.ID
+    JOIN THERAPIST t ON av.THERAPIST_ID=t.THERAPIST_ID
+    WHERE a.STUDENT_ID=%s{keyset}
+    ORDER BY a.Appointment_time DESC, a.Appointment_ID DESC{limit}
+"""
+APPOINTMENTS_AFTER_SQL = " AND (a.Appointment_time < %s OR (a.Appointment_time = %s AND a.Appointment_ID < %s))"
 
 def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail):
     def verify_student(identity):
@@ -194,25 +214,24 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
         if not student_info:
             return jsonify({"message": "Access denied: Not a student"}), 403
         student_id, _ = student_info
+        try:
+            page = pagination.page_request(request.args, "student_appointments", 2)
+        except pagination.InvalidPage as e:
+            return jsonify({"message": str(e)}), 400
         try:
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
-            cursor.execute(
-                """
-                SELECT a.Appointment_ID AS id, a.Appointment_time, a.Status AS status,
-                       a.Appointment_type AS appointment_type, a.Meeting_link AS meeting_link,
-                       a.Reason_for_meeting AS reasonForMeeting,
-                       CONCAT(t.FirstName,' ',t.LastName) AS therapist_name,
-                       t.THERAPIST_ID AS therapist_id
-                FROM APPOINTMENTS a
-                JOIN AVAILABILITY av ON a.AVAILABILITY_ID=av.ID
-                JOIN THERAPIST t ON av.THERAPIST_ID=t.THERAPIST_ID
-                WHERE a.STUDENT_ID=%s
-                ORDER BY a.Appointment_time DESC
-                """,
-                (student_id,)
-            )
+            keyset, limit, params = "", "", [student_id]
+            if page and page.after:
+                keyset = APPOINTMENTS_AFTER_SQL
+                params += [page.after[0], page.after[0], page.after[1]]
+            if page:
+                limit = " LIMIT %s"
+                params.append(page.limit + 1)
+            cursor.execute(STUDENT_APPOINTMENTS_SQL.format(keyset=keyset, limit=limit), params)
             apps = cursor.fetchall()
+            if page:
+                apps, next_cursor = pagination.split_page(apps, page, lambda appt: (appt['Appointment_time'], appt['id']))
             for appt in apps:
                 if isinstance(appt.get('Appointment_time'), datetime):
                     appt['appointment_time'] = appt['Appointment_time'].strftime('%Y-%m-%d %H:%M:%S')
@@ -220,6 +239,8 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             cursor.close()
             conn.close()
             print(f"Appointments fetched for student_id={student_id}: {len(apps)} appointments")
+            if page:
+                return jsonify({"appointments": apps, "nextCursor": next_cursor}), 200
             return jsonify({"appointments": apps}), 200
         except Exception as e:
             print(f"Error fetching appointments for student_id={student_id}: {e}")
@@ -243,60 +264,28 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
         try:
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
-            # Fetch the slot details
-            cursor.execute(
-                "SELECT ID, Date, Start_Time, Status, THERAPIST_ID FROM AVAILABILITY WHERE ID=%s",
-                (slot_id,)
-            )
-            slot = cursor.fetchone()
-            print(f"Slot query result: {slot}")
-            if not slot:
-                cursor.close(); conn.close()
-                print("END: Slot not found")
-                return jsonify({"message": "Selected slot does not exist"}), 404
-            if slot['Status'] != 'available':
+            # Claim the slot first; a concurrent booking of the same slot gets SlotUnavailable
+            try:
+                slot = claim_slot(cursor, slot_id)
+            except SlotUnavailable as e:
+                conn.rollback()
                 cursor.close(); conn.close()
-                print(f"END: Slot status: {slot['Status']}")
+                print(f"END: Could not claim slot: {e}")
+                if e.status is None:
+                    return jsonify({"message": "Selected slot does not exist"}), 404
                 return jsonify({"message": "Selected slot is not available"}), 400
 
             # Check if the student already has an appointment with this therapist on the same day
-            slot_date = slot['Date'].strftime('%Y-%m-%d') if isinstance(slot['Date'], datetime) else slot['Date']
-            cursor.execute(
-                """
-                SELECT COUNT(*) AS count
-                FROM APPOINTMENTS a
-                JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
-                WHERE a.STUDENT_ID = %s
-                  AND av.THERAPIST_ID = %s
-                  AND DATE(a.Appointment_time) = %s
-                  AND a.Status != 'cancelled'
-                """,
-                (student_id, slot['THERAPIST_ID'], slot_date)
-            )
-            existing_appointment = cursor.fetchone()
-            if existing_appointment['count'] > 0:
+            if has_same_day_appointment(cursor, student_id, slot):
+                conn.rollback()
                 cursor.close(); conn.close()
-                print(f"END: Student already has an appointment with therapist_id={slot['THERAPIST_ID']} on {slot_date}")
+                print(f"END: Student already has an appointment with therapist_id={slot['THERAPIST_ID']} on {slot['Date']}")
                 return jsonify({"message": "You already have an appointment with this therapist on the same day."}), 400
 
-            appt_time = f"{slot['Date']} {slot['Start_Time']}"
-            cursor.execute(
-                """
-                INSERT INTO APPOINTMENTS(STUDENT_ID,AVAILABILITY_ID,Appointment_time,Status,Appointment_type,Meeting_link,Reason_for_meeting)
-                VALUES(%s,%s,%s,'pending',%s,%s,%s)
-                """,
-                (student_id, slot_id, appt_time, appt_type, None, reason)  # Meeting_link set to NULL initially
-            )
-            appointment_id = cursor.lastrowid
-            cursor.execute("UPDATE AVAILABILITY SET Status='not_available' WHERE ID=%s", (slot_id,))
+            appointment_id = insert_appointment(cursor, slot, student_id, appt_type, reason)
+            enqueue_appt_notifications(cursor, appointment_id, "pending", ("student", "therapist"))
             conn.commit()
-            try:
-                print(f"Calling notify_student_for_appt for appointment_id={appointment_id}")
-                notify_student_for_appt(cursor, mail, appointment_id, "pending")  # Notify with pending status
-                notify_therapist_for_appt(cursor, mail, appointment_id, "pending")
-                print(f"END: Student email notification sent for appointment_id={appointment_id}, status=pending")
-            except Exception as email_err:
-                print(f"END: Error sending student email notification for appointment_id={appointment_id}: {email_err}")
+            availability_events.publish(availability_events.BOOKED, slot['THERAPIST_ID'], [slot['ID']])
             cursor.close()
             conn.close()
             print(f"END: Appointment booked successfully for appointment_id={appointment_id}")
@@ -355,14 +344,8 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
                 """,
                 (link, appt_id)
             )
+            enqueue_appt_notifications(cursor, appt_id, "confirmed", ("student", "therapist"))
             conn.commit()
-            try:
-                print(f"Calling notify_student_for_appt for appointment_id={appt_id}")
-                notify_student_for_appt(cursor, mail, appt_id, "confirmed")
-                notify_therapist_for_appt(cursor, mail, appt_id, "confirmed")
-                print(f"END: Notifications sent for appointment_id={appt_id}, status=confirmed")
-            except Exception as email_err:
-                print(f"END: Error sending notifications for appointment_id={appt_id}: {email_err}")
             cursor.close()
             conn.close()
             print(f"END: Appointment confirmed successfully for appointment_id={appt_id}")
@@ -391,7 +374,11 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
             cursor.execute(
-                "SELECT AVAILABILITY_ID, Status FROM APPOINTMENTS WHERE Appointment_ID=%s AND STUDENT_ID=%s",
+                """
+                SELECT a.AVAILABILITY_ID, a.Status, av.THERAPIST_ID
+                FROM APPOINTMENTS a JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
+                WHERE a.Appointment_ID=%s AND a.STUDENT_ID=%s
+                """,
                 (appt_id, student_id)
             )
             appt = cursor.fetchone()
@@ -407,12 +394,9 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             avail = appt['AVAILABILITY_ID']
             cursor.execute("UPDATE APPOINTMENTS SET Status='cancelled' WHERE Appointment_ID=%s", (appt_id,))
             cursor.execute("UPDATE AVAILABILITY SET Status='available' WHERE ID=%s", (avail,))
+            enqueue_appt_notifications(cursor, appt_id, "cancelled", ("student", "therapist"))
             conn.commit()
-            try:
-                notify_student_for_appt(cursor, mail, appt_id, "cancelled")
-                notify_therapist_for_appt(cursor, mail, appt_id, "cancelled")
-            except Exception as email_err:
-                print(f"END: Error sending student email notification for appointment_id={appt_id}: {email_err}")
+            availability_events.publish(availability_events.RELEASED, appt['THERAPIST_ID'], [avail])
             cursor.close()
             conn.close()
             return jsonify({"message": "Appointment cancelled successfully"}), 200
@@ -440,7 +424,11 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
             cursor.execute(
-                "SELECT AVAILABILITY_ID, Appointment_type, Status FROM APPOINTMENTS WHERE Appointment_ID=%s AND STUDENT_ID=%s",
+                """
+                SELECT a.AVAILABILITY_ID, a.Appointment_type, a.Status, av.THERAPIST_ID
+                FROM APPOINTMENTS a JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
+                WHERE a.Appointment_ID=%s AND a.STUDENT_ID=%s
+                """,
                 (appt_id, student_id)
             )
             orig = cursor.fetchone()
@@ -454,53 +442,26 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
                 print(f"END: Appointment status is {orig['Status']}, cannot reschedule")
                 return jsonify({"message": f"Appointment status is {orig['Status']}, cannot reschedule"}), 400
             old_av = orig['AVAILABILITY_ID']
-            appt_type = orig['Appointment_type']
-            cursor.execute("SELECT Status, Date, Start_Time, THERAPIST_ID FROM AVAILABILITY WHERE ID=%s", (new_slot,))
-            slot = cursor.fetchone()
-            print(f"New slot query result: {slot}")
-            if not slot or slot['Status'] != 'available':
+            try:
+                slot = claim_slot(cursor, new_slot)
+            except SlotUnavailable as e:
+                conn.rollback()
                 cursor.close(); conn.close()
-                print("END: New slot not available")
+                print(f"END: New slot not available: {e}")
                 return jsonify({"message": "New slot not available"}), 400
 
             # Check if the student already has an appointment with this therapist on the same day as the new slot
-            slot_date = slot['Date'].strftime('%Y-%m-%d') if isinstance(slot['Date'], datetime) else slot['Date']
-            cursor.execute(
-                """
-                SELECT COUNT(*) AS count
-                FROM APPOINTMENTS a
-                JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
-                WHERE a.STUDENT_ID = %s
-                  AND av.THERAPIST_ID = %s
-                  AND DATE(a.Appointment_time) = %s
-                  AND a.Status != 'cancelled'
-                  AND a.Appointment_ID != %s
-                """,
-                (student_id, slot['THERAPIST_ID'], slot_date, appt_id)
-            )
-            existing_appointment = cursor.fetchone()
-            if existing_appointment['count'] > 0:
+            if has_same_day_appointment(cursor, student_id, slot, exclude_appointment_id=appt_id):
+                conn.rollback()
                 cursor.close(); conn.close()
-                print(f"END: Student already has an appointment with therapist_id={slot['THERAPIST_ID']} on {slot_date}")
+                print(f"END: Student already has an appointment with therapist_id={slot['THERAPIST_ID']} on {slot['Date']}")
                 return jsonify({"message": "You already have an appointment with this therapist on the same day."}), 400
 
-            new_time = f"{slot['Date']} {slot['Start_Time']}"
-            cursor.execute(
-                """
-                UPDATE APPOINTMENTS SET AVAILABILITY_ID=%s, Appointment_time=%s, Status='pending' WHERE Appointment_ID=%s
-                """,
-                (new_slot, new_time, appt_id)
-            )
-            cursor.execute("UPDATE AVAILABILITY SET Status='available' WHERE ID=%s", (old_av,))
-            cursor.execute("UPDATE AVAILABILITY SET Status='not_available' WHERE ID=%s", (new_slot,))
+            move_appointment(cursor, appt_id, old_av, slot)
+            enqueue_appt_notifications(cursor, appt_id, "rescheduled", ("student", "therapist"))
             conn.commit()
-            try:
-                print(f"Calling notify_student_for_appt for appointment_id={appt_id}")
-                notify_student_for_appt(cursor, mail, appt_id, "rescheduled")
-                notify_therapist_for_appt(cursor, mail, appt_id, "rescheduled")
-                print(f"END: Student email notification sent for appointment_id={appt_id}, status=rescheduled")
-            except Exception as email_err:
-                print(f"END: Error sending student email notification for appointment_id={appt_id}: {email_err}")
+            availability_events.publish(availability_events.RELEASED, orig['THERAPIST_ID'], [old_av])
+            availability_events.publish(availability_events.BOOKED, slot['THERAPIST_ID'], [slot['ID']])
             cursor.close()
             conn.close()
             print(f"END: Appointment rescheduled successfully for appointment_id={appt_id}")
@@ -518,35 +479,21 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
         if not verify_student(get_jwt_identity()):
             return jsonify({"message": "Access denied: Not a student"}), 403
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT THERAPIST_ID, CONCAT(FirstName,' ',LastName) AS therapist_name FROM THERAPIST")
-            therapists = cursor.fetchall()
-            result = []
-            for t in therapists:
-                cursor.execute(
-                    "SELECT ID AS id, Date AS date, Start_Time AS start_time, End_Time AS end_time "
-                    "FROM AVAILABILITY WHERE THERAPIST_ID=%s AND Status='available' AND Date>=CURDATE() "
-                    "ORDER BY Date, Start_Time",
-                    (t['THERAPIST_ID'],)
-                )
-                slots = cursor.fetchall()
-                formatted_slots = [
-                    {
-                        'id': s['id'],
-                        'date': s['date'].strftime('%Y-%m-%d') if hasattr(s['date'], 'strftime') else s['date'],
-                        'start_time': str(s['start_time']),
-                        'end_time': str(s['end_time'])
-                    }
-                    for s in slots
-                ]
-                result.append({
-                    'therapist_id': t['THERAPIST_ID'],
-                    'therapist_name': t['therapist_name'],
-                    'appointments': formatted_slots
-                })
-            cursor.close()
-            conn.close()
+            # Recurring-rule slots are listed for ?from=&to= (default: the next few weeks)
+            window = availability_rules.parse_window(request.args)
+        except ValueError:
+            return jsonify({"message": "from and to must be dates (YYYY-MM-DD)"}), 400
+        try:
+            page = pagination.page_request(request.args, "student_available", 1)
+        except pagination.InvalidPage as e:
+            return jsonify({"message": str(e)}), 400
+        try:
+            # Served from memory; the database is only read when slots changed since the last request
+            if page:
+                result, next_cursor = open_slot_index.student_page(get_db_connection, page, window)
+                print(f"Available appointments fetched: {len(result)} therapists")
+                return jsonify({"availableAppointments": result, "nextCursor": next_cursor}), 200
+            result = open_slot_index.student_listing(get_db_connection, window)
             print(f"Available appointments fetched: {len(result)} therapists")
             return jsonify({"availableAppointments": result}), 200
         except Exception as e:
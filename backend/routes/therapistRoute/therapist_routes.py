@@ -2,7 +2,42 @@ import json
 from flask import jsonify, request
 import mysql.connector
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from utils.emailer import notify_student_for_appt, notify_parent_for_appt, notify_therapist_for_appt
+from utils.outbox import enqueue_appt_notifications
+from utils.therapist_index import therapist_index
+from utils import availability_bulk, availability_events, availability_rules, pagination
+
+# A therapist's appointment rows; the statements below add which and in what order
+# (module-level so scripts/explain_check.py EXPLAINs exactly these)
+THERAPIST_APPOINTMENT_ROWS_SQL = """
+SELECT 
+    a.Appointment_ID,
+    a.Appointment_time,
+    a.Status,
+    a.Appointment_type,
+    a.Reason_for_meeting,
+    s.FirstName as student_first_name,
+    s.LastName as student_last_name
+FROM APPOINTMENTS a
+JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
+JOIN THERAPIST t ON av.THERAPIST_ID = t.THERAPIST_ID
+JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
+WHERE t.USER_ID = %s
+"""
+THERAPIST_APPOINTMENTS_SQL = THERAPIST_APPOINTMENT_ROWS_SQL + "ORDER BY a.Appointment_time DESC"
+# The appointments of one page's booked slots ({slots}: their ids' placeholders)
+SLOT_APPOINTMENTS_SQL = THERAPIST_APPOINTMENT_ROWS_SQL + """  AND av.ID IN ({slots})
+ORDER BY av.Date DESC, av.Start_Time DESC, a.Appointment_time DESC, a.Appointment_ID DESC
+"""
+# One page of the therapist's booked slots, newest first; {keyset} past the first page
+BOOKED_SLOTS_PAGE_SQL = """
+SELECT av.ID, av.Date, av.Start_Time
+FROM AVAILABILITY av
+WHERE av.THERAPIST_ID = (SELECT THERAPIST_ID FROM THERAPIST WHERE USER_ID = %s){keyset}
+  AND EXISTS (SELECT 1 FROM APPOINTMENTS x WHERE x.AVAILABILITY_ID = av.ID)
+ORDER BY av.Date DESC, av.Start_Time DESC
+LIMIT %s
+"""
+BOOKED_SLOTS_AFTER_SQL = " AND (av.Date < %s OR (av.Date = %s AND av.Start_Time < %s))"
 
 def extract_user_id():
     current = get_jwt_identity()
@@ -88,6 +123,7 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             SELECT 
                 u.USER_ID as user_id,
                 u.username,
+                t.THERAPIST_ID as therapist_id,
                 t.FirstName as first_name,
                 t.LastName as last_name,
                 t.Gender as gender,
@@ -102,6 +138,10 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             cursor.execute(select_query, (current_user_id,))
             updated_profile = cursor.fetchone()
             updated_profile['verified'] = updated_profile['verified'] is not None
+            # Only verified therapists are offered by name in the chatbot
+            therapist_id = updated_profile.pop('therapist_id')
+            if updated_profile['verified']:
+                therapist_index.upsert(therapist_id, updated_profile['first_name'], updated_profile['last_name'])
             return jsonify(updated_profile), 200
         except mysql.connector.Error as err:
             print("Database error in update_therapist_profile:", err)
@@ -178,6 +218,7 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             ))
             conn.commit()
             new_availability_id = cursor.lastrowid
+            availability_events.publish(availability_events.CREATED, therapist_id, [new_availability_id])
             return jsonify({
                 "message": "Availability created successfully",
                 "availabilityId": new_availability_id
@@ -191,32 +232,90 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             if 'conn' in locals():
                 conn.close()
 
+    @app.route('/therapist/availability/bulk', methods=['POST'])
+    @jwt_required()
+    def bulk_create_therapist_availability():
+        """
+        Creates many slots in one transaction: {"slots": [{date, startTime, endTime}, ...],
+        "allOrNothing": false}. Answers with a per-slot report (utils/availability_bulk.py).
+        """
+        current_user_id = extract_user_id()
+        data = request.get_json() or {}
+        slots = data.get('slots')
+        if not isinstance(slots, list) or not slots:
+            return jsonify({"error": "Missing required field: slots"}), 400
+        if len(slots) > availability_bulk.MAX_BULK_SLOTS:
+            return jsonify({"error": f"At most {availability_bulk.MAX_BULK_SLOTS} slots per request"}), 400
+
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT THERAPIST_ID FROM THERAPIST WHERE USER_ID = %s", (current_user_id,))
+            therapist_row = cursor.fetchone()
+            if not therapist_row:
+                return jsonify({"error": "Therapist not found"}), 404
+
+            therapist_id = therapist_row['THERAPIST_ID']
+            report, created = availability_bulk.import_slots(
+                cursor, therapist_id, slots, all_or_nothing=bool(data.get('allOrNothing'))
+            )
+            conn.commit()
+            if created:
+                availability_events.publish(availability_events.CREATED, therapist_id, created)
+            rejected = sum(1 for row in report if row['status'] != 'created')
+            return jsonify({
+                "message": f"{len(created)} of {len(slots)} availability slots created",
+                "created": len(created),
+                "rejected": rejected,
+                "results": report
+            }), 201 if created else 409
+        except mysql.connector.Error as err:
+            print("Database error in bulk_create_therapist_availability:", err)
+            if 'conn' in locals():
+                conn.rollback()
+            return jsonify({"error": "Failed to create availability"}), 500
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            if 'conn' in locals():
+                conn.close()
+
     @app.route('/therapist/appointments', methods=['GET'])
     @jwt_required()
     def get_therapist_appointments():
+        """
+        All of the therapist's appointments, newest first. With ?limit= or
+        ?cursor=, one page of booked slots (every appointment of a slot on the
+        same page) as {"appointments": [...], "nextCursor": ...}.
+        """
         current_user_id = extract_user_id()
+        try:
+            page = pagination.page_request(request.args, "therapist_appointments", 2)
+        except pagination.InvalidPage as e:
+            return jsonify({"error": str(e)}), 400
         try:
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
-            query = """
-            SELECT 
-                a.Appointment_ID,
-                a.Appointment_time,
-                a.Status,
-                a.Appointment_type,
-                a.Reason_for_meeting,
-                s.FirstName as student_first_name,
-                s.LastName as student_last_name
-            FROM APPOINTMENTS a
-            JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
-            JOIN THERAPIST t ON av.THERAPIST_ID = t.THERAPIST_ID
-            JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
-            WHERE t.USER_ID = %s
-            ORDER BY a.Appointment_time DESC
-            """
-            cursor.execute(query, (current_user_id,))
-            appointments = cursor.fetchall()
-            return jsonify(appointments), 200
+            if not page:
+                cursor.execute(THERAPIST_APPOINTMENTS_SQL, (current_user_id,))
+                appointments = cursor.fetchall()
+                return jsonify(appointments), 200
+
+            # APPOINTMENTS has no therapist column, so page over the therapist's booked
+            # slots: a range of the (THERAPIST_ID, Date, Start_Time) unique key
+            keyset, params = "", [current_user_id]
+            if page.after:
+                keyset = BOOKED_SLOTS_AFTER_SQL
+                params += [page.after[0], page.after[0], page.after[1]]
+            cursor.execute(BOOKED_SLOTS_PAGE_SQL.format(keyset=keyset), params + [page.limit + 1])
+            slots, next_cursor = pagination.split_page(
+                cursor.fetchall(), page, lambda slot: (slot["Date"], slot["Start_Time"]))
+            appointments = []
+            if slots:
+                cursor.execute(SLOT_APPOINTMENTS_SQL.format(slots=", ".join(["%s"] * len(slots))),
+                               [current_user_id] + [slot["ID"] for slot in slots])
+                appointments = cursor.fetchall()
+            return jsonify({"appointments": appointments, "nextCursor": next_cursor}), 200
         except mysql.connector.Error as err:
             print("Database error in get_therapist_appointments:", err)
             return jsonify({"error": "Failed to retrieve appointments"}), 500
@@ -235,14 +334,15 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             cursor = conn.cursor()
 
             check_query = """
-            SELECT ID
+            SELECT ID, THERAPIST_ID
             FROM AVAILABILITY
             WHERE ID = %s AND THERAPIST_ID = (
                 SELECT THERAPIST_ID FROM THERAPIST WHERE USER_ID = %s
             )
             """
             cursor.execute(check_query, (availability_id, current_user_id))
-            if not cursor.fetchone():
+            slot = cursor.fetchone()
+            if not slot:
                 return jsonify({"error": "Availability slot not found or not owned by this therapist"}), 404
 
             delete_query = """
@@ -251,6 +351,7 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             """
             cursor.execute(delete_query, (availability_id,))
             conn.commit()
+            availability_events.publish(availability_events.DELETED, slot[1], [availability_id])
 
             return jsonify({"message": "Availability deleted successfully"}), 200
         except mysql.connector.Error as err:
@@ -277,14 +378,15 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             cursor = conn.cursor()
 
             check_query = """
-            SELECT ID
+            SELECT ID, THERAPIST_ID
             FROM AVAILABILITY
             WHERE ID = %s AND THERAPIST_ID = (
                 SELECT THERAPIST_ID FROM THERAPIST WHERE USER_ID = %s
             )
             """
             cursor.execute(check_query, (availability_id, current_user_id))
-            if not cursor.fetchone():
+            slot = cursor.fetchone()
+            if not slot:
                 return jsonify({"error": "Availability slot not found or not owned by this therapist"}), 404
 
             update_query = """
@@ -300,6 +402,7 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
                 availability_id
             ))
             conn.commit()
+            availability_events.publish(availability_events.UPDATED, slot[1], [availability_id])
 
             return jsonify({"message": "Availability updated successfully"}), 200
         except mysql.connector.Error as err:
@@ -311,6 +414,186 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             if 'conn' in locals():
                 conn.close()
 
+    @app.route('/therapist/availability/rules', methods=['GET'])
+    @jwt_required()
+    def get_availability_rules():
+        current_user_id = extract_user_id()
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+            SELECT r.ID, r.Weekday, r.Start_Time, r.End_Time, r.Slot_Minutes, r.Start_Date, r.End_Date
+            FROM AVAILABILITY_RULE r
+            JOIN THERAPIST t ON r.THERAPIST_ID = t.THERAPIST_ID
+            WHERE t.USER_ID = %s
+            ORDER BY r.Start_Date, r.Weekday, r.Start_Time
+            """, (current_user_id,))
+            rules = cursor.fetchall()
+            exceptions = {}
+            if rules:
+                placeholders = ", ".join(["%s"] * len(rules))
+                cursor.execute(f"""
+                SELECT ID, RULE_ID, Date, Start_Time
+                FROM AVAILABILITY_RULE_EXCEPTION
+                WHERE RULE_ID IN ({placeholders})
+                ORDER BY Date, Start_Time
+                """, [rule["ID"] for rule in rules])
+                for row in cursor.fetchall():
+                    exceptions.setdefault(row["RULE_ID"], []).append({
+                        "id": row["ID"],
+                        "date": row["Date"].isoformat(),
+                        "startTime": str(row["Start_Time"]) if row["Start_Time"] is not None else None
+                    })
+
+            result = [{
+                "id": rule["ID"],
+                "weekday": availability_rules.WEEKDAYS[rule["Weekday"]],
+                "startTime": str(rule["Start_Time"]),
+                "endTime": str(rule["End_Time"]),
+                "slotMinutes": rule["Slot_Minutes"],
+                "startDate": rule["Start_Date"].isoformat(),
+                "endDate": rule["End_Date"].isoformat(),
+                "exceptions": exceptions.get(rule["ID"], [])
+            } for rule in rules]
+            return jsonify(result), 200
+        except mysql.connector.Error as err:
+            print("Database error in get_availability_rules:", err)
+            return jsonify({"error": "Failed to retrieve availability rules"}), 500
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            if 'conn' in locals():
+                conn.close()
+
+    @app.route('/therapist/availability/rules', methods=['POST'])
+    @jwt_required()
+    def create_availability_rule():
+        current_user_id = extract_user_id()
+        data = request.get_json() or {}
+        try:
+            rule = availability_rules.parse_rule(data)
+            exceptions = availability_rules.parse_exceptions(data.get("exceptions", []))
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
+
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT THERAPIST_ID FROM THERAPIST WHERE USER_ID = %s", (current_user_id,))
+            therapist_row = cursor.fetchone()
+            if not therapist_row:
+                return jsonify({"error": "Therapist not found"}), 404
+
+            therapist_id = therapist_row[0]
+            cursor.execute("""
+            INSERT INTO AVAILABILITY_RULE
+            (THERAPIST_ID, Weekday, Start_Time, End_Time, Slot_Minutes, Start_Date, End_Date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (
+                therapist_id,
+                rule["Weekday"],
+                str(rule["Start_Time"]),
+                str(rule["End_Time"]),
+                rule["Slot_Minutes"],
+                rule["Start_Date"],
+                rule["End_Date"]
+            ))
+            rule_id = cursor.lastrowid
+            if exceptions:
+                cursor.executemany("""
+                INSERT INTO AVAILABILITY_RULE_EXCEPTION (RULE_ID, Date, Start_Time)
+                VALUES (%s, %s, %s)
+                """, [(rule_id, day, str(start) if start is not None else None) for day, start in exceptions])
+            conn.commit()
+            availability_events.publish(availability_events.CREATED, therapist_id)
+            return jsonify({
+                "message": "Availability rule created successfully",
+                "ruleId": rule_id
+            }), 201
+        except mysql.connector.Error as err:
+            print("Database error in create_availability_rule:", err)
+            return jsonify({"error": "Failed to create availability rule"}), 500
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            if 'conn' in locals():
+                conn.close()
+
+    @app.route('/therapist/availability/rules/<int:rule_id>', methods=['DELETE'])
+    @jwt_required()
+    def delete_availability_rule(rule_id):
+        # Occurrences already booked (or otherwise materialized) stay as AVAILABILITY rows
+        current_user_id = extract_user_id()
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+            SELECT r.ID, r.THERAPIST_ID
+            FROM AVAILABILITY_RULE r
+            JOIN THERAPIST t ON r.THERAPIST_ID = t.THERAPIST_ID
+            WHERE r.ID = %s AND t.USER_ID = %s
+            """, (rule_id, current_user_id))
+            rule = cursor.fetchone()
+            if not rule:
+                return jsonify({"error": "Availability rule not found or not owned by this therapist"}), 404
+
+            cursor.execute("DELETE FROM AVAILABILITY_RULE WHERE ID = %s", (rule_id,))
+            conn.commit()
+            availability_events.publish(availability_events.DELETED, rule[1])
+
+            return jsonify({"message": "Availability rule deleted successfully"}), 200
+        except mysql.connector.Error as err:
+            print("Database error in delete_availability_rule:", err)
+            return jsonify({"error": "Failed to delete availability rule"}), 500
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            if 'conn' in locals():
+                conn.close()
+
+    @app.route('/therapist/availability/rules/<int:rule_id>/exceptions', methods=['POST'])
+    @jwt_required()
+    def add_availability_rule_exceptions(rule_id):
+        # Takes days or single slots out of a rule; occurrences already booked are not touched
+        current_user_id = extract_user_id()
+        data = request.get_json() or {}
+        try:
+            exceptions = availability_rules.parse_exceptions(data.get("exceptions"))
+        except ValueError as err:
+            return jsonify({"error": str(err)}), 400
+        if not exceptions:
+            return jsonify({"error": "Missing required field: exceptions"}), 400
+
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+            SELECT r.ID, r.THERAPIST_ID
+            FROM AVAILABILITY_RULE r
+            JOIN THERAPIST t ON r.THERAPIST_ID = t.THERAPIST_ID
+            WHERE r.ID = %s AND t.USER_ID = %s
+            """, (rule_id, current_user_id))
+            rule = cursor.fetchone()
+            if not rule:
+                return jsonify({"error": "Availability rule not found or not owned by this therapist"}), 404
+
+            cursor.executemany("""
+            INSERT INTO AVAILABILITY_RULE_EXCEPTION (RULE_ID, Date, Start_Time)
+            VALUES (%s, %s, %s)
+            """, [(rule_id, day, str(start) if start is not None else None) for day, start in exceptions])
+            conn.commit()
+            availability_events.publish(availability_events.UPDATED, rule[1])
+
+            return jsonify({"message": "Availability rule exceptions added successfully"}), 201
+        except mysql.connector.Error as err:
+            print("Database error in add_availability_rule_exceptions:", err)
+            return jsonify({"error": "Failed to add availability rule exceptions"}), 500
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            if 'conn' in locals():
+                conn.close()
+
     @app.route('/therapist/appointments/<int:appointment_id>', methods=['DELETE'])
     @jwt_required()
     def delete_appointment(appointment_id):
@@ -322,7 +605,7 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
 
             # Verify the appointment belongs to the therapist and get the AVAILABILITY_ID
             query = """
-            SELECT a.Appointment_ID, a.AVAILABILITY_ID, a.STUDENT_ID
+            SELECT a.Appointment_ID, a.AVAILABILITY_ID, a.STUDENT_ID, av.THERAPIST_ID
             FROM APPOINTMENTS a
             JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
             JOIN THERAPIST t ON av.THERAPIST_ID = t.THERAPIST_ID
@@ -334,6 +617,10 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             if not appointment:
                 return jsonify({"error": "Appointment not found or not owned by this therapist"}), 404
 
+            # Student always, parent if GUARDIAN links one, therapist to confirm their own action.
+            # Queued first: the rows snapshot the appointment the DELETE removes
+            enqueue_appt_notifications(cursor, appointment_id, "cancelled", ("student", "parent", "therapist"))
+
             # Delete the appointment
             cursor.execute("DELETE FROM APPOINTMENTS WHERE Appointment_ID = %s", (appointment_id,))
 
@@ -345,29 +632,7 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             """, (appointment["AVAILABILITY_ID"],))
 
             conn.commit()
-
-            # Send notifications to student, parent (if linked), and therapist
-            # Student: Always notified, as APPOINTMENTS.STUDENT_ID is required
-            try:
-                print(f"Calling notify_student_for_appt for appointment_id={appointment_id}")
-                notify_student_for_appt(cursor, mail, appointment_id, "cancelled")
-                print(f"Student email notification sent for appointment_id={appointment_id}, status=cancelled")
-            except Exception as email_err:
-                print(f"Error sending student email notification for appointment_id={appointment_id}: {email_err}")
-            # Parent: Notified if GUARDIAN links STUDENT_ID to a PARENT_ID
-            try:
-                print(f"Calling notify_parent_for_appt for appointment_id={appointment_id}")
-                notify_parent_for_appt(cursor, mail, appointment_id, "cancelled")
-                print(f"Parent email notification sent for appointment_id={appointment_id}, status=cancelled")
-            except Exception as email_err:
-                print(f"Error sending parent email notification for appointment_id={appointment_id}: {email_err}")
-            # Therapist: Notified to confirm their own action
-            try:
-                print(f"Calling notify_therapist_for_appt for appointment_id={appointment_id}")
-                notify_therapist_for_appt(cursor, mail, appointment_id, "cancelled")
-                print(f"Therapist email notification sent for appointment_id={appointment_id}, status=cancelled")
-            except Exception as email_err:
-                print(f"Error sending therapist email notification for appointment_id={appointment_id}: {email_err}")
+            availability_events.publish(availability_events.RELEASED, appointment["THERAPIST_ID"], [appointment["AVAILABILITY_ID"]])
 
             print(f"END: Appointment deleted successfully for appointment_id={appointment_id}")
             return jsonify({"message": "Appointment deleted and slot made available"}), 200
@@ -421,7 +686,6 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
                 data.get('meetingLink'),
                 appointment_id
             ))
-            conn.commit()
 
             # Determine notification status
             # If only meetingLink changed, use 'link_updated'
@@ -434,28 +698,9 @@ def register_routes(app, get_db_connection, jwt_required, get_jwt_identity, mail
             elif status not in ['booked', 'cancelled', 'rescheduled']:
                 status = 'updated'  # Generic status for other changes
 
-            # Send notifications to student, parent (if linked), and therapist
-            # Student: Always notified, as APPOINTMENTS.STUDENT_ID is required
-            try:
-                print(f"Calling notify_student_for_appt for appointment_id={appointment_id}")
-                notify_student_for_appt(cursor, mail, appointment_id, status)
-                print(f"Student email notification sent for appointment_id={appointment_id}, status={status}")
-            except Exception as email_err:
-                print(f"Error sending student email notification for appointment_id={appointment_id}: {email_err}")
-            # Parent: Notified if GUARDIAN links STUDENT_ID to a PARENT_ID
-            try:
-                print(f"Calling notify_parent_for_appt for appointment_id={appointment_id}")
-                notify_parent_for_appt(cursor, mail, appointment_id, status)
-                print(f"Parent email notification sent for appointment_id={appointment_id}, status={status}")
-            except Exception as email_err:
-                print(f"Error sending parent email notification for appointment_id={appointment_id}: {email_err}")
-            # Therapist: Notified to confirm their own action
-            try:
-                print(f"Calling notify_therapist_for_appt for appointment_id={appointment_id}")
-                notify_therapist_for_appt(cursor, mail, appointment_id, status)
-                print(f"Therapist email notification sent for appointment_id={appointment_id}, status={status}")
-            except Exception as email_err:
-                print(f"Error sending therapist email notification for appointment_id={appointment_id}: {email_err}")
+            # Student always, parent if GUARDIAN links one, therapist to confirm their own action
+            enqueue_appt_notifications(cursor, appointment_id, status, ("student", "parent", "therapist"))
+            conn.commit()
 
             print(f"END: Appointment updated successfully for appointment_id={appointment_id}")
             return jsonify({"message": "Appointment updated successfully"}), 200
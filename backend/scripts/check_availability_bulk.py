@@ -0,0 +1,59 @@
+# check_availability_bulk.py
+"""
+Check the conflict report of utils/availability_bulk.py: a payload is checked
+against itself and against existing rows, without a database. From backend/:
+
+    python -m scripts.check_availability_bulk
+
+Exits 1 if any row gets the wrong status.
+"""
+import sys
+from datetime import date, timedelta
+
+from utils.availability_bulk import plan
+
+DAY = "2030-04-16"
+EXISTING = [{"ID": 5, "Date": date(2030, 4, 16), "Start_Time": timedelta(hours=11),
+             "End_Time": timedelta(hours=11, minutes=50)},
+            # an open occurrence of a recurring rule, as import_slots adds them
+            {"ID": "r7-20300416-1500", "Date": date(2030, 4, 16), "Start_Time": timedelta(hours=15),
+             "End_Time": timedelta(hours=15, minutes=30)}]
+
+# payload row -> (status before insert, conflicting payload index or existing id)
+CASES = [
+    ({"date": DAY, "startTime": "09:00", "endTime": "09:50"}, (None, None)),
+    ({"date": DAY, "startTime": "09:00", "endTime": "09:30"}, ("duplicate", None)),
+    ({"date": DAY, "startTime": "09:30", "endTime": "10:00"}, ("overlap", 0)),
+    ({"date": DAY, "startTime": "09:50", "endTime": "10:40"}, (None, None)),     # touching is fine
+    ({"date": DAY, "startTime": "11:00", "endTime": "11:30"}, ("exists", 5)),
+    ({"date": DAY, "startTime": "11:30", "endTime": "12:00"}, ("overlap", 5)),
+    ({"date": "2030-04-17", "startTime": "11:00", "endTime": "11:50"}, (None, None)),
+    ({"date": DAY, "startTime": "15:00", "endTime": "15:30"}, ("exists", "r7-20300416-1500")),
+    ({"date": DAY, "startTime": "14:45", "endTime": "15:15"}, ("overlap", "r7-20300416-1500")),
+    ({"date": DAY, "startTime": "13:00", "endTime": "12:00"}, ("invalid", None)),
+    ({"date": "16/04/2030", "startTime": "13:00", "endTime": "14:00"}, ("invalid", None)),
+    ({"date": DAY, "startTime": "1pm", "endTime": "14:00"}, ("invalid", None)),
+    ({"date": DAY}, ("invalid", None)),
+    ("09:00", ("invalid", None)),
+]
+
+
+def main():
+    report, accepted = plan([row for row, _ in CASES], EXISTING)
+    failures = 0
+    for (row, expected), entry in zip(CASES, report):
+        conflict = entry.get("conflictsWith") or {}
+        got = (entry["status"], conflict.get("index", conflict.get("availabilityId")))
+        if got != expected:
+            failures += 1
+            print(f"{row!r:<70} FAILED: got {got}, expected {expected}")
+    accepted_indexes = [i for i, *_ in accepted]
+    if accepted_indexes != [i for i, (_, (status, _)) in enumerate(CASES) if status is None]:
+        failures += 1
+        print(f"accepted rows FAILED: got {accepted_indexes}")
+    print(f"{len(CASES) + 1 - failures}/{len(CASES) + 1} rows ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# check_availability_rules.py
+"""
+Check the pure parts of utils/availability_rules.py: expanding a rule over a
+window, virtual slot ids, and parsing rule bodies and ?from=/?to= windows.
+No database needed. From backend/:
+
+    python -m scripts.check_availability_rules
+
+Exits 1 if any check fails.
+"""
+import sys
+from datetime import date, timedelta
+
+from utils import availability_rules as rules
+
+CHECKS = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+# Wednesdays 9:00-11:00 in 50-minute slots through April 2030
+RULE = {"ID": 12, "Weekday": 2, "Start_Time": timedelta(hours=9), "End_Time": timedelta(hours=11),
+        "Slot_Minutes": 50, "Start_Date": date(2030, 4, 1), "End_Date": date(2030, 4, 30)}
+
+
+@check
+def expands_only_the_window():
+    got = list(rules.occurrences(RULE, date(2030, 4, 15), date(2030, 4, 28)))
+    assert [(d, s) for d, s, _ in got] == [
+        (date(2030, 4, 17), timedelta(hours=9)), (date(2030, 4, 17), timedelta(hours=9, minutes=50)),
+        (date(2030, 4, 24), timedelta(hours=9)), (date(2030, 4, 24), timedelta(hours=9, minutes=50)),
+    ], got
+    assert got[0][2] == timedelta(hours=9, minutes=50)
+
+
+@check
+def clipped_to_rule_dates():
+    assert not list(rules.occurrences(RULE, date(2030, 5, 1), date(2030, 5, 31)))
+    assert list(rules.occurrences(RULE, date(2030, 3, 1), date(2030, 4, 3)))[0][0] == date(2030, 4, 3)
+
+
+@check
+def exceptions_skip_days_and_slots():
+    skipped = {(date(2030, 4, 17), None), (date(2030, 4, 24), timedelta(hours=9))}
+    got = list(rules.occurrences(RULE, date(2030, 4, 15), date(2030, 4, 28), skipped))
+    assert [(d, s) for d, s, _ in got] == [(date(2030, 4, 24), timedelta(hours=9, minutes=50))], got
+
+
+@check
+def virtual_id_round_trip():
+    slot_id = rules.virtual_slot_id(12, date(2030, 4, 17), timedelta(hours=15, minutes=30))
+    assert slot_id == "r12-20300417-1530"
+    assert rules.parse_virtual_slot_id(slot_id) == (12, date(2030, 4, 17), timedelta(hours=15, minutes=30))
+    for bad in (1001, "1001", "r12-20300231-1530", "r12-2030417-1530", None):
+        assert not rules.is_virtual_slot_id(bad), bad
+
+
+@check
+def parses_rule_bodies():
+    rule = rules.parse_rule({"weekday": "Wednesday", "startTime": "09:00", "endTime": "11:00",
+                             "slotMinutes": 50, "startDate": "2030-04-01", "endDate": "2030-04-30"})
+    assert {k: rule[k] for k in RULE if k != "ID"} == {k: v for k, v in RULE.items() if k != "ID"}, rule
+    for body in (
+        {"weekday": 7},
+        {"weekday": True},
+        {"weekday": 2, "startTime": "11:00", "endTime": "09:00"},
+        {"weekday": 2, "startTime": "09:00", "endTime": "09:30", "slotMinutes": 60},
+        {"weekday": 2, "startTime": "09:00", "endTime": "11:00", "startDate": "2030-04-30", "endDate": "2030-04-01"},
+        {"weekday": 2, "startTime": "9am", "endTime": "11:00"},
+    ):
+        try:
+            rules.parse_rule(body)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {body}")
+
+
+@check
+def parses_windows():
+    today = date.today()
+    assert rules.parse_window({}) == (today, today + timedelta(days=rules.RULE_HORIZON_DAYS))
+    assert rules.parse_window({"from": "2000-01-01"})[0] == today
+    start, end = rules.parse_window({"to": "2999-01-01"})
+    assert end - start == timedelta(days=rules.MAX_WINDOW_DAYS)
+    try:
+        rules.parse_window({"from": "next week"})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("accepted a malformed date")
+
+
+def main():
+    failures = 0
+    for fn in CHECKS:
+        try:
+            fn()
+            print(f"{fn.__name__:<40} ok")
+        except Exception as err:
+            failures += 1
+            print(f"{fn.__name__:<40} FAILED: {type(err).__name__}: {err}")
+    print(f"{len(CHECKS) - failures}/{len(CHECKS)} checks ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+# check_chatbot_states.py
+"""
+Drive the chatbot state handlers one at a time, without Flask or MySQL.
+
+States registered with needs_db=False run with no connection factory at all,
+so touching the database there fails loudly; picks from a fresh list are
+checked not to open one either. Database states get a scripted
+connection that hands back canned rows in order and records what was run.
+From backend/:
+
+    python -m scripts.check_chatbot_states
+
+Exits 1 if any check fails.
+"""
+import contextlib
+import io
+import sys
+from datetime import date, timedelta
+
+from routes.chatBotRoute.chatbot_states import STATES, ChatContext, _remember, dispatch, schedule, state_metrics
+from utils import availability_events
+from utils.therapist_index import therapist_index
+
+
+class ScriptedConnection:
+    """
+    Returns `results` (one list of rows per SELECT) in order; other statements
+    report the next of `rowcounts` as affected rows, 1 once those run out.
+    """
+
+    def __init__(self, results, rowcounts=()):
+        self.results = list(results)
+        self.rowcounts = list(rowcounts)
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self, dictionary=False):
+        return ScriptedCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class ScriptedCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(" ".join(sql.split()))
+        if sql.lstrip().upper().startswith("SELECT"):
+            self.rows = self.conn.results.pop(0)
+            self.rowcount = len(self.rows)
+        else:
+            self.rows = []
+            self.rowcount = self.conn.rowcounts.pop(0) if self.conn.rowcounts else 1
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+
+def fake_token(identity, expires_delta):
+    return "token-for-" + identity
+
+
+def booking_session(**extra):
+    session = {
+        "state": "selecting_slot",
+        "user_id": 42,
+        "username": "sam@example.com",
+        "role": "student",
+        "verified": True,
+        "has_greeted": True,
+        "user_first_name": "Sam",
+        "selected_child": {"id": 7},
+        "selected_therapist": {"id": 3, "name": "Noah Patel"},
+        "slots": [{"id": 1001, "date": "2030-04-16", "start_time": "10:00 AM"},
+                  {"id": 1002, "date": "2030-04-16", "start_time": "11:00 AM"}],
+    }
+    session.update(extra)
+    for key in ("therapists", "dates", "slots"):
+        if key in session:
+            _remember(session, key, session[key], None if key == "therapists" else 3)
+    return session
+
+
+CHECKS = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+@check
+def declared_db_needs():
+    no_db = sorted(name for name, handler in STATES.items() if not handler.needs_db)
+    assert no_db == ["entering_reason", "selecting_appointment_cancel", "selecting_appointment_type",
+                     "selecting_child"], no_db
+
+
+@check
+def slot_pick_without_db():
+    opened = []
+    session = booking_session()
+    payload, status = dispatch(session, "2", lambda: opened.append(1))
+    assert status == 200 and session["selected_slot"]["id"] == 1002
+    assert session["state"] == "selecting_appointment_type" and not opened
+
+
+@check
+def stale_slot_list_is_reshown():
+    conn = ScriptedConnection([[{"id": 1002, "Date": date(2030, 4, 16), "Start_Time": timedelta(hours=11)}], []])
+    session = booking_session(selected_date={"date": "2030-04-16"})
+    availability_events.publish(availability_events.BOOKED, 3, [1001])
+    payload, status = dispatch(session, "2", lambda: conn)
+    assert status == 200 and session["state"] == "selecting_slot" and "selected_slot" not in session
+    assert session["slots"] == [{"id": 1002, "date": "2030-04-16", "start_time": "11:00 AM"}]
+    assert dispatch(session, "1")[1] == 200 and session["selected_slot"]["id"] == 1002
+
+
+@check
+def other_therapists_changes_keep_list():
+    opened = []
+    session = booking_session()
+    availability_events.publish(availability_events.CREATED, 4, [2001])
+    dispatch(session, "1", lambda: opened.append(1))
+    assert not opened and session["selected_slot"]["id"] == 1001
+
+
+@check
+def listed_therapist_pick_from_session():
+    conn = ScriptedConnection([[{"Date": date(2030, 4, 16)}], []])
+    session = booking_session(state="verified", therapists=[{"id": 3, "name": "Noah Patel"}, {"id": 5, "name": "Mei Lee"}])
+    payload, status = dispatch(session, "2", lambda: conn)
+    assert status == 200 and session["selected_therapist"]["id"] == 5 and session["state"] == "selecting_date"
+    # the therapist's open dates, then their rules; no therapist list query
+    assert len(conn.statements) == 2 and "THERAPIST t" not in conn.statements[0]
+
+
+@check
+def expired_therapist_list_is_reshown():
+    conn = ScriptedConnection([[{"THERAPIST_ID": 5, "FirstName": "Mei", "LastName": "Lee"}]])
+    session = booking_session(state="selecting_therapist", therapists=[{"id": 3, "name": "Noah Patel"}])
+    session["list_stamps"]["therapists"]["at"] = 0
+    payload, status = dispatch(session, "1", lambda: conn)
+    assert status == 200 and "Mei Lee" in payload["message"] and session["state"] == "selecting_therapist"
+    assert session["therapists"] == [{"id": 5, "name": "Mei Lee"}]
+
+
+@check
+def slot_pick_rejects_bad_input():
+    session = booking_session()
+    assert dispatch(session, "9")[1] == 400
+    assert dispatch(session, "ten")[1] == 400
+    assert session["state"] == "selecting_slot"
+
+
+@check
+def type_and_reason_without_db():
+    session = booking_session(state="selecting_appointment_type", selected_slot={"id": 1001, "date": "2030-04-16", "start_time": "10:00 AM"})
+    assert dispatch(session, "Virtual ")[1] == 200 and session["appointment_type"] == "virtual"
+    payload, status = dispatch(session, "anxiety follow-up")
+    assert status == 200 and session["state"] == "confirming_appointment"
+    assert "Noah Patel" in payload["message"]
+
+
+@check
+def child_pick_without_db():
+    session = booking_session(state="selecting_child", children=[{"id": 7, "name": "Ana Diaz"}])
+    payload, status = dispatch(session, "1")
+    assert status == 200 and session["state"] == "awaiting_child_dob"
+
+
+@check
+def greeting_opens_no_connection():
+    opened = []
+    session = booking_session(state="verified", has_greeted=False)
+    dispatch(session, "hello", lambda: opened.append(1))
+    assert not opened and session["has_greeted"]
+
+
+@check
+def student_sign_in():
+    conn = ScriptedConnection([[{"DOB": date(2010, 5, 1), "STUDENT_ID": 7}]])
+    session = booking_session(state="awaiting_dob")
+    payload, status = dispatch(session, "2010-05-01", lambda: conn, fake_token)
+    assert status == 200 and session["verified"] and payload["token"].startswith("token-for-")
+    assert conn.closed
+
+
+@check
+def date_pick_lists_slots():
+    conn = ScriptedConnection([[{"id": 1001, "Date": date(2030, 4, 16), "Start_Time": timedelta(hours=15)}], []])
+    session = booking_session(state="selecting_date", dates=[{"date": "2030-04-16"}])
+    payload, status = dispatch(session, "1", lambda: conn)
+    assert status == 200 and session["state"] == "selecting_slot"
+    assert session["slots"] == [{"id": 1001, "date": "2030-04-16", "start_time": "3:00 PM"}]
+
+
+CLAIMED_SLOT = {"ID": 1001, "Date": date(2030, 4, 16), "Start_Time": timedelta(hours=10),
+                "THERAPIST_ID": 3, "Status": "not_available"}
+
+
+@check
+def confirm_books_and_commits():
+    conn = ScriptedConnection([[CLAIMED_SLOT], [{"count": 0}]])
+    session = booking_session(state="confirming_appointment", appointment_type="virtual", reason="anxiety",
+                              selected_slot={"id": 1001, "date": "2030-04-16", "start_time": "10:00 AM"})
+    payload, status = dispatch(session, "yes", lambda: conn)
+    assert status == 200 and conn.commits == 1 and session["state"] == "verified"
+    assert conn.statements[0].startswith("UPDATE AVAILABILITY SET Status = 'not_available'")
+    assert any(s.startswith("INSERT INTO APPOINTMENTS") for s in conn.statements)
+
+
+@check
+def confirm_lost_claim_rolls_back():
+    conn = ScriptedConnection([[dict(CLAIMED_SLOT, Status="not_available")]], rowcounts=[0])
+    session = booking_session(state="confirming_appointment", appointment_type="virtual", reason="anxiety",
+                              selected_slot={"id": 1001, "date": "2030-04-16", "start_time": "10:00 AM"})
+    payload, status = dispatch(session, "yes", lambda: conn)
+    assert status == 400 and conn.commits == 0 and conn.rollbacks == 1
+    assert not any(s.startswith("INSERT") for s in conn.statements)
+
+
+@check
+def confirm_same_day_rolls_back():
+    conn = ScriptedConnection([[CLAIMED_SLOT], [{"count": 1}]])
+    session = booking_session(state="confirming_appointment", appointment_type="virtual", reason="anxiety",
+                              selected_slot={"id": 1001, "date": "2030-04-16", "start_time": "10:00 AM"})
+    payload, status = dispatch(session, "yes", lambda: conn)
+    assert status == 400 and "same day" in payload["message"], payload
+    assert conn.commits == 0 and conn.rollbacks == 1
+    assert not any(s.startswith("INSERT") for s in conn.statements)
+
+
+@check
+def confirm_no_skips_db():
+    opened = []
+    session = booking_session(state="confirming_appointment")
+    dispatch(session, "no", lambda: opened.append(1))
+    assert not opened and session["state"] == "verified"
+
+
+@check
+def one_shot_booking_goes_to_confirmation():
+    therapist_index._loaded_at = None
+    conn = ScriptedConnection([
+        [{"THERAPIST_ID": 3, "FirstName": "Mei", "LastName": "Lee"}],           # name index load
+        [{"THERAPIST_ID": 3}],                                                   # candidates with open slots
+        [{"id": 1005, "Date": date(2030, 4, 16), "Start_Time": timedelta(hours=15)}],  # the 3 PM slot
+    ])
+    session = booking_session(state="verified")
+    entities = {"therapist": "lee", "date": "2030-04-16", "time": "3:00 PM",
+                "appointment_type": "virtual", "reason": "anxiety"}
+    payload, status = schedule(ChatContext(session, "book ...", lambda: conn), entities)
+    assert status == 200 and session["state"] == "confirming_appointment", payload
+    assert session["selected_slot"]["id"] == 1005 and session["reason"] == "anxiety"
+    assert len(conn.statements) == 3
+
+
+@check
+def one_shot_asks_only_for_missing_reason():
+    session = booking_session(booking_prefill={"appointment_type": "in_person"})
+    payload, status = dispatch(session, "1")
+    assert session["state"] == "entering_reason" and session["appointment_type"] == "in_person"
+
+
+@check
+def unknown_state():
+    assert dispatch({"state": "nowhere"}, "hi")[1] == 400
+
+
+@check
+def metrics_recorded():
+    stats = {s["state"]: s for s in state_metrics.snapshot()["states"]}
+    assert stats["selecting_slot"]["turns"] >= 5 and stats["selecting_slot"]["db_turns"] == 1
+    assert stats["confirming_appointment"]["db_turns"] == 3
+
+
+def main():
+    failures = 0
+    for fn in CHECKS:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):   # silence handler debug prints
+                fn()
+        except Exception as e:
+            failures += 1
+            print(f"{fn.__name__:<40} FAILED: {type(e).__name__}: {e}")
+        else:
+            print(f"{fn.__name__:<40} ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# check_date_time_parser.py
+"""
+Table-driven accuracy check for utils/date_time_parser.py, as the chatbot uses
+it: each message goes through nlu.analyze() without spaCy entities and the
+date is resolved against a fixed "today" (Wednesday 2030-04-17).
+
+Also checks which messages still need the spaCy model once their dates and
+times are taken out. From backend/:
+
+    python -m scripts.check_date_time_parser
+
+Exits 1 if any row fails.
+"""
+import sys
+from datetime import date
+
+from utils import nlu
+
+TODAY = date(2030, 4, 17)   # a Wednesday
+
+# message -> (date, time); None where the rules should find nothing
+CASES = [
+    # ISO dates
+    ("book on 2030-04-22", ("2030-04-22", None)),
+    ("2030-5-3 at 10am", ("2030-05-03", "10:00 AM")),
+    ("book on 2030-02-31", (None, None)),
+    ("call 555-2030-04-22", (None, None)),
+    # relative days
+    ("schedule for today", ("2030-04-17", None)),
+    ("book tonight at 7pm", ("2030-04-17", "7:00 PM")),
+    ("book tomorrow at 3pm", ("2030-04-18", "3:00 PM")),
+    ("the day after tomorrow", ("2030-04-19", None)),
+    ("sometime next week", ("2030-04-24", None)),
+    # weekdays
+    ("book friday", ("2030-04-19", None)),
+    ("this friday at noon", ("2030-04-19", "12:00 PM")),
+    ("this coming monday", ("2030-04-22", None)),
+    ("on wednesday", ("2030-04-17", None)),
+    ("next wednesday", ("2030-04-24", None)),
+    ("next friday at 9am", ("2030-04-19", "9:00 AM")),
+    ("thurs 10:30am", ("2030-04-18", "10:30 AM")),
+    ("tue. at 4 pm", ("2030-04-23", "4:00 PM")),
+    ("sunday 14:00", ("2030-04-21", "2:00 PM")),
+    ("next weekend", (None, None)),
+    # times
+    ("book tomorrow at 3:30 pm", ("2030-04-18", "3:30 PM")),
+    ("at 3 p.m. tomorrow", ("2030-04-18", "3:00 PM")),
+    ("at 11 a.m.", (None, "11:00 AM")),
+    ("12am", (None, "12:00 AM")),
+    ("12:15pm", (None, "12:15 PM")),
+    ("at 09:30", (None, "9:30 AM")),
+    ("at 00:45", (None, "12:45 AM")),
+    ("at 23:59", (None, "11:59 PM")),
+    ("at midday", (None, "12:00 PM")),
+    ("at 3:30", (None, None)),            # which half of the day: left to spaCy
+    ("at 13pm", (None, None)),
+    ("at 24:00", (None, None)),
+    ("i am free", (None, None)),
+    ("i need 2 appointments", (None, None)),
+    ("5 amazing sessions", (None, None)),
+]
+
+# message -> whether spaCy still has to run
+NER_CASES = [
+    ("book tomorrow at 3pm", False),
+    ("book an appointment on friday at 10:30 am", False),
+    ("schedule for 2030-04-22 at 15:00", False),
+    ("book with dr lee tomorrow at 3pm", True),
+    ("book in two weeks", True),
+    ("book on april 22nd", True),
+]
+
+
+def main():
+    failures = 0
+    for message, expected in CASES:
+        _, _, spec, time_value, _, _ = nlu.analyze(message, ents=[])
+        got = (nlu.resolve_date(spec, TODAY), time_value)
+        if got != expected:
+            failures += 1
+            print(f"{message!r:<40} FAILED: got {got}, expected {expected}")
+    for message, expected in NER_CASES:
+        got = nlu.needs_ner(message)
+        if got != expected:
+            failures += 1
+            print(f"{message!r:<40} FAILED: needs_ner {got}, expected {expected}")
+    total = len(CASES) + len(NER_CASES)
+    print(f"{total - failures}/{total} rows ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
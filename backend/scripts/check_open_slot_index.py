@@ -0,0 +1,211 @@
+# check_open_slot_index.py
+"""
+Drive utils/open_slot_index.py with scripted connections, without Flask or
+MySQL: what a listing reads from the database after each kind of availability
+event, and what it returns. From backend/:
+
+    python -m scripts.check_open_slot_index
+
+Exits 1 if any check fails.
+"""
+import contextlib
+import io
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+from utils import availability_events, availability_rules
+from utils.availability_events import AvailabilityEvent
+from utils.open_slot_index import OpenSlotIndex
+
+DAY = date.today() + timedelta(days=1)
+THERAPISTS = [
+    {"THERAPIST_ID": 3, "FirstName": "Noah", "LastName": "Patel"},
+    {"THERAPIST_ID": 5, "FirstName": "Mei", "LastName": "Lee"},
+    {"THERAPIST_ID": 8, "FirstName": "Ana", "LastName": "Diaz"},
+]
+
+
+def slot(slot_id, therapist_id, hour):
+    return {"ID": slot_id, "THERAPIST_ID": therapist_id, "Date": DAY,
+            "Start_Time": timedelta(hours=hour), "End_Time": timedelta(hours=hour, minutes=50)}
+
+
+SLOTS = [slot(1001, 3, 9), slot(1002, 3, 10), slot(1003, 5, 9)]
+
+
+class ScriptedConnection:
+    """Hands back `results` (one list of rows per statement) in order and records the statements."""
+
+    def __init__(self, results, on_execute=None):
+        self.results = list(results)
+        self.statements = []
+        self.on_execute = on_execute
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+        if self.on_execute:
+            self.on_execute(len(self.statements))
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def close(self):
+        pass
+
+
+def loaded_index(slots=SLOTS):
+    """An index after its first load: therapists, slots, and no rules."""
+    index = OpenSlotIndex()
+    conn = ScriptedConnection([THERAPISTS, slots, []])
+    index.ensure_current(lambda: conn)
+    index._reconciler = True   # as if start() had run: no age-based reloads
+    return index
+
+
+def no_connection():
+    raise AssertionError("opened a connection")
+
+
+CHECKS = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+@check
+def first_read_loads_then_serves_from_memory():
+    index = OpenSlotIndex()
+    conn = ScriptedConnection([THERAPISTS, SLOTS, []])
+    listing = index.student_listing(lambda: conn)
+    assert len(conn.statements) == 3, conn.statements
+    assert [t["therapist_id"] for t in listing] == [3, 5, 8]
+    assert [s["id"] for s in listing[0]["appointments"]] == [1001, 1002]
+    assert listing[0]["appointments"][0] == {"id": 1001, "date": DAY.isoformat(),
+                                             "start_time": "9:00:00", "end_time": "9:50:00"}
+    index._reconciler = True
+    assert index.student_listing(no_connection) == listing
+
+
+@check
+def parent_listing_by_name_with_slots_only():
+    listing = loaded_index().parent_listing(no_connection)
+    assert [(t["therapist_id"], t["therapist_name"]) for t in listing] == [(5, "Mei Lee"), (3, "Noah Patel")]
+
+
+@check
+def booked_slot_dropped_without_a_query():
+    index = loaded_index()
+    before = index.parent_listing(no_connection)
+    index.on_event(AvailabilityEvent(availability_events.BOOKED, 5, (1003,)))
+    listing = index.parent_listing(no_connection)
+    assert [t["therapist_id"] for t in listing] == [3]
+    assert [s["id"] for s in before[0]["appointments"]] == [1003]   # earlier listings untouched
+
+
+@check
+def created_slot_requeries_only_that_therapist():
+    index = loaded_index()
+    index.on_event(AvailabilityEvent(availability_events.CREATED, 3, (1004,)))
+    conn = ScriptedConnection([[THERAPISTS[0]], [slot(1004, 3, 8)] + SLOTS[:2], []])
+    listing = index.student_listing(lambda: conn)
+    assert len(conn.statements) == 3 and all("IN (%s)" in s for s in conn.statements[:2]), conn.statements
+    assert [s["id"] for s in listing[0]["appointments"]] == [1004, 1001, 1002]
+    assert [s["id"] for s in listing[1]["appointments"]] == [1003]
+
+
+@check
+def booked_rule_occurrence_requeries():
+    index = loaded_index()
+    index.on_event(AvailabilityEvent(availability_events.BOOKED, 8, (2001,)))   # not an indexed id
+    conn = ScriptedConnection([[THERAPISTS[2]], [], []])
+    index.student_listing(lambda: conn)
+    assert len(conn.statements) == 3
+
+
+@check
+def untargeted_event_reloads_everything():
+    index = loaded_index()
+    index.on_event(AvailabilityEvent(availability_events.RELEASED, None, ()))
+    conn = ScriptedConnection([THERAPISTS, SLOTS[:1], []])
+    listing = index.parent_listing(lambda: conn)
+    assert "IN (" not in conn.statements[0]
+    assert [t["therapist_id"] for t in listing] == [3]
+
+
+@check
+def event_during_load_is_read_again():
+    index = OpenSlotIndex()
+
+    def book_midway(n):
+        if n == 2:   # committed after the slots query ran
+            index.on_event(AvailabilityEvent(availability_events.CREATED, 5, (1005,)))
+
+    # the load, then right away that therapist again
+    conn = ScriptedConnection([THERAPISTS, SLOTS, [], [THERAPISTS[1]], [SLOTS[2], slot(1005, 5, 11)], []],
+                              on_execute=book_midway)
+    index.ensure_current(lambda: conn)
+    assert len(conn.statements) == 6 and "IN (%s)" in conn.statements[3]
+    index._reconciler = True
+    listing = index.parent_listing(no_connection)
+    assert [s["id"] for s in listing[0]["appointments"]] == [1003, 1005]
+
+
+@check
+def concurrent_cold_reads_load_once():
+    index = OpenSlotIndex()
+    index._reconciler = True
+    connections = []
+
+    def connect():
+        conn = ScriptedConnection([THERAPISTS, SLOTS, []], on_execute=lambda n: time.sleep(0.01))
+        connections.append(conn)
+        return conn
+
+    listings = []
+    threads = [threading.Thread(target=lambda: listings.append(index.student_listing(connect)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(connections) == 1, f"{len(connections)} loads"
+    assert len(listings) == 8 and all(listing == listings[0] for listing in listings)
+
+
+@check
+def other_window_reads_its_rule_occurrences():
+    index = loaded_index()
+    window = (DAY, DAY + timedelta(days=60))
+    rule = {"ID": 12, "THERAPIST_ID": 8, "Weekday": DAY.weekday(), "Start_Time": timedelta(hours=9),
+            "End_Time": timedelta(hours=10), "Slot_Minutes": 60, "Start_Date": DAY, "End_Date": DAY,
+            "FirstName": "Ana", "LastName": "Diaz"}
+    conn = ScriptedConnection([[rule], [], []])
+    listing = index.parent_listing(lambda: conn, window)
+    assert [t["therapist_id"] for t in listing] == [8, 5, 3]
+    assert listing[0]["appointments"][0]["id"] == availability_rules.virtual_slot_id(12, DAY, timedelta(hours=9))
+    assert index.parent_listing(no_connection)[0]["therapist_id"] == 5   # default window unchanged
+
+
+def main():
+    failures = 0
+    for fn in CHECKS:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn()
+            print(f"{fn.__name__:<45} ok")
+        except Exception as err:
+            failures += 1
+            print(f"{fn.__name__:<45} FAILED: {type(err).__name__}: {err}")
+    print(f"{len(CHECKS) - failures}/{len(CHECKS)} checks ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# check_pagination.py
+"""
+Check utils/pagination.py and the paged open slot listings without Flask or
+MySQL: cursors round-trip and are rejected by other listings, limits are
+validated and capped, and walking the pages visits every row exactly once.
+From backend/:
+
+    python -m scripts.check_pagination
+
+Exits 1 if any check fails.
+"""
+import contextlib
+import io
+import sys
+from datetime import date, datetime, timedelta
+
+from scripts.check_open_slot_index import loaded_index, no_connection, slot
+from utils import pagination
+from utils.pagination import InvalidPage, Page
+
+CHECKS = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+def raises_invalid(fn, *args):
+    try:
+        fn(*args)
+    except InvalidPage:
+        return True
+    return False
+
+
+def walk(fetch, listing, key_size, limit):
+    """Follow nextCursor from the first page to the last; fetch(page) -> (rows, next_cursor)."""
+    pages, token = [], None
+    while True:
+        args = {"limit": str(limit)}
+        if token:
+            args["cursor"] = token
+        rows, token = fetch(pagination.page_request(args, listing, key_size))
+        pages.append(rows)
+        if token is None:
+            return pages
+
+
+@check
+def cursor_round_trips_sql_types():
+    key = (datetime(2030, 4, 16, 9, 30), date(2030, 4, 16), timedelta(hours=9, minutes=30), 42, "Mei")
+    token = pagination.encode_cursor("student_appointments", key)
+    assert "=" not in token and "/" not in token and "+" not in token, token
+    assert pagination.decode_cursor("student_appointments", token, 5) == key
+
+
+@check
+def cursor_from_another_listing_rejected():
+    token = pagination.encode_cursor("admin_users", (datetime(2030, 1, 1), 7))
+    assert raises_invalid(pagination.decode_cursor, "parent_appointments", token, 2)
+    assert raises_invalid(pagination.decode_cursor, "admin_users", token, 3)
+    for garbage in ("", "not a cursor", "W10", "e30", "!!!!"):
+        assert raises_invalid(pagination.decode_cursor, "admin_users", garbage, 2), garbage
+
+
+@check
+def unpaged_request_unchanged():
+    assert pagination.page_request({}, "admin_users", 2) is None
+    assert pagination.page_request({"from": "2030-04-16"}, "student_available", 1) is None
+
+
+@check
+def limit_defaulted_validated_and_capped():
+    assert pagination.page_request({"cursor": ""}, "x", 1) == Page("x", pagination.PAGE_SIZE, None)
+    assert pagination.page_request({"limit": "10"}, "x", 1).limit == 10
+    assert pagination.page_request({"limit": "100000"}, "x", 1).limit == pagination.MAX_PAGE_SIZE
+    for bad in ("0", "-3", "ten", "1.5"):
+        assert raises_invalid(pagination.page_request, {"limit": bad}, "x", 1), bad
+
+
+@check
+def split_page_keeps_limit_rows():
+    page = Page("x", 3, None)
+    rows, token = pagination.split_page([{"id": n} for n in (9, 8, 7, 6)], page, lambda r: (r["id"],))
+    assert [r["id"] for r in rows] == [9, 8, 7]
+    assert pagination.decode_cursor("x", token, 1) == (7,)
+    rows, token = pagination.split_page([{"id": 2}], page, lambda r: (r["id"],))
+    assert token is None and len(rows) == 1
+
+
+@check
+def keyset_walk_visits_each_row_once():
+    # Ties on time are broken by id, as in the appointment queries
+    rows = sorted(({"time": datetime(2030, 4, 16, 9 + n % 3), "id": n} for n in range(1, 23)),
+                  key=lambda r: (r["time"], r["id"]), reverse=True)
+
+    def fetch(page):
+        after = [r for r in rows if not page.after or (r["time"], r["id"]) < page.after]
+        return pagination.split_page(after[:page.limit + 1], page, lambda r: (r["time"], r["id"]))
+
+    pages = walk(fetch, "student_appointments", 2, 5)
+    assert [len(p) for p in pages] == [5, 5, 5, 5, 2]
+    assert [r["id"] for p in pages for r in p] == [r["id"] for r in rows]
+
+
+@check
+def open_slot_pages_cover_listing():
+    slots = [slot(1000 + n, tid, 9) for n, tid in enumerate((3, 5, 8))]
+    index = loaded_index(slots)
+    student = walk(lambda page: index.student_page(no_connection, page), "student_available", 1, 2)
+    assert [[t["therapist_id"] for t in p] for p in student] == [[3, 5], [8]]
+    parent = walk(lambda page: index.parent_page(no_connection, page), "parent_available", 3, 1)
+    assert [t["therapist_id"] for p in parent for t in p] == [
+        t["therapist_id"] for t in index.parent_listing(no_connection)] == [8, 5, 3]
+
+
+def main():
+    failures = 0
+    for fn in CHECKS:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn()
+            print(f"{fn.__name__:<45} ok")
+        except Exception as err:
+            failures += 1
+            print(f"{fn.__name__:<45} FAILED: {type(err).__name__}: {err}")
+    print(f"{len(CHECKS) - failures}/{len(CHECKS)} checks ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
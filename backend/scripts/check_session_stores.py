@@ -0,0 +1,103 @@
+# check_session_stores.py
+"""
+Exercise every chatbot session store against the same contract: round trip,
+overwrite, delete, sliding TTL, sweeping and (memory) the LRU cap.
+
+From backend/:
+
+    python -m scripts.check_session_stores                      # memory + sqlite (+ fakeredis if installed)
+    python -m scripts.check_session_stores --redis-url redis://localhost:6379/15
+
+Exits 1 if any check fails.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from utils.chat_sessions import MemorySessionStore, RedisSessionStore, SQLiteSessionStore
+
+SESSION = {
+    "state": "selecting_slot",
+    "user_id": 42,
+    "verified": True,
+    "selected_therapist": {"id": 7, "name": "Noah Patel"},
+    "slots": [{"id": 1001, "date": "2025-04-16", "start_time": "10:00 AM"}],
+}
+
+
+def check_store(name, store, ttl):
+    failures = []
+
+    def expect(cond, what):
+        if not cond:
+            failures.append(what)
+
+    sid = store.new_session_id()
+    expect(store.get(sid) is None, "unknown id returns None")
+    store.save(sid, SESSION)
+    expect(store.get(sid) == SESSION, "round trip")
+
+    updated = dict(SESSION, state="verified")
+    store.save(sid, updated)
+    expect(store.get(sid) == updated, "overwrite")
+
+    store.delete(sid)
+    expect(store.get(sid) is None, "delete")
+
+    store.save(sid, SESSION)
+    time.sleep(ttl * 0.6)
+    store.save(sid, SESSION)           # saving restarts the TTL
+    time.sleep(ttl * 0.6)
+    expect(store.get(sid) == SESSION, "save extends ttl")
+    time.sleep(ttl * 1.1)
+    expect(store.get(sid) is None, "expired session is gone")
+
+    store.save(sid, SESSION)
+    time.sleep(ttl * 1.1)
+    store.sweep()
+    expect(store.get(sid) is None, "sweep after expiry")
+
+    print(f"{name:<8} {'ok' if not failures else 'FAILED: ' + ', '.join(failures)}")
+    return not failures
+
+
+def check_lru():
+    store = MemorySessionStore(ttl=60, max_entries=2)
+    for sid in ("a", "b", "c"):
+        store.save(sid, SESSION)
+    ok = store.get("a") is None and store.get("c") == SESSION
+    print(f"{'lru':<8} {'ok' if ok else 'FAILED: oldest entry not evicted'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the chatbot session stores.")
+    parser.add_argument("--ttl", type=float, default=2.0, help="seconds; Redis rounds down to whole seconds")
+    parser.add_argument("--redis-url", help="real Redis to check instead of fakeredis")
+    args = parser.parse_args()
+
+    results = [check_store("memory", MemorySessionStore(args.ttl), args.ttl), check_lru()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results.append(check_store("sqlite", SQLiteSessionStore(os.path.join(tmp, "sessions.db"), args.ttl), args.ttl))
+
+    if args.redis_url:
+        redis_store = RedisSessionStore(max(1, int(args.ttl)), url=args.redis_url, prefix="chat:check:")
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            redis_store = None
+            print(f"{'redis':<8} skipped (pass --redis-url or install fakeredis)")
+        else:
+            redis_store = RedisSessionStore(max(1, int(args.ttl)), client=fakeredis.FakeRedis())
+    if redis_store is not None:
+        results.append(check_store("redis", redis_store, max(1, int(args.ttl))))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
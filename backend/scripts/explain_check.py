@@ -0,0 +1,135 @@
+# explain_check.py
+"""
+Run EXPLAIN on the hot route queries and fail if any of them falls back to a
+full table scan of AVAILABILITY or APPOINTMENTS.
+
+Point it at a seeded database (see scripts/generate_clinic_data.py) – on a
+near-empty table the optimizer may legitimately prefer a scan. From backend/:
+
+    python -m scripts.explain_check
+
+Exits 1 when a hot query scans a watched table, so it can gate CI.
+"""
+import re
+import sys
+from datetime import date, timedelta
+
+import mysql.connector
+
+from app import db_config
+from routes.chatBotRoute import chatbot_states
+from routes.parentRoute import parent_routes
+from routes.studentRoute import student_routes
+from routes.therapistRoute import therapist_routes
+from utils import availability_rules, open_slot_index, slot_reservation
+
+# Tables that must never be read with type=ALL by a hot query
+WATCHED_TABLES = {"AVAILABILITY", "APPOINTMENTS"}
+
+# name -> (SQL as issued by the route, param names resolved from sample rows). The
+# statements are the routes' own module constants, with their format fields filled
+# in the way the route fills them, so this checks what the app actually runs.
+HOT_QUERIES = {
+    "open_slot_index_load": (open_slot_index.OPEN_SLOTS_SQL.format(only=""), ()),
+    "open_slot_index_refresh (per therapist)": (
+        open_slot_index.OPEN_SLOTS_SQL.format(only=" AND THERAPIST_ID IN (%s)"), ("therapist_id",)),
+    "rule_occurrences_taken (per therapist)": (
+        availability_rules.TAKEN_SLOTS_SQL.format(therapists="%s"), ("therapist_id", "window_start", "window_end")),
+    "chatbot_therapists_with_open_slots": (chatbot_states.THERAPISTS_WITH_OPEN_SLOTS_SQL, ("horizon_days",)),
+    "chatbot_show_therapists_page": (
+        chatbot_states.THERAPIST_PAGE_SQL, ("horizon_days", "page_size", "offset")),
+    "chatbot_open_dates": (chatbot_states.OPEN_DATES_SQL, ("therapist_id",)),
+    "chatbot_slots_on_date": (
+        chatbot_states.SLOTS_ON_DATE_SQL.format(time_filter=""), ("therapist_id", "slot_date")),
+    "chatbot_upcoming_appointments": (chatbot_states.UPCOMING_APPOINTMENTS_SQL, ("student_id",)),
+    "same_day_booking_check": (
+        slot_reservation.SAME_DAY_APPOINTMENT_SQL, ("student_id", "therapist_id", "slot_date")),
+    "student_appointments": (
+        student_routes.STUDENT_APPOINTMENTS_SQL.format(keyset="", limit=""), ("student_id",)),
+    "student_appointments_page (after cursor)": (
+        student_routes.STUDENT_APPOINTMENTS_SQL.format(keyset=student_routes.APPOINTMENTS_AFTER_SQL,
+                                                       limit=" LIMIT %s"),
+        ("student_id", "after_time", "after_time", "after_id", "page_size")),
+    "parent_appointments": (parent_routes.PARENT_APPOINTMENTS_SQL, ("parent_id",)),
+    "parent_appointments_page (one child, after cursor)": (
+        parent_routes.CHILD_APPOINTMENTS_PAGE_SQL.format(keyset=parent_routes.APPOINTMENTS_AFTER_SQL)
+        + parent_routes.MERGED_PAGE_SQL,
+        ("student_id", "after_time", "after_time", "after_id", "page_size", "page_size")),
+    "therapist_appointments": (therapist_routes.THERAPIST_APPOINTMENTS_SQL, ("therapist_user_id",)),
+    "therapist_booked_slots_page (after cursor)": (
+        therapist_routes.BOOKED_SLOTS_PAGE_SQL.format(keyset=therapist_routes.BOOKED_SLOTS_AFTER_SQL),
+        ("therapist_user_id", "after_date", "after_date", "after_start", "page_size")),
+    "therapist_slot_appointments_page": (
+        therapist_routes.SLOT_APPOINTMENTS_SQL.format(slots="%s"), ("therapist_user_id", "slot_id")),
+}
+
+
+TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b)(\w+))?", re.IGNORECASE)
+
+
+def table_aliases(sql):
+    """Map the names EXPLAIN reports (aliases included) back to real table names."""
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        aliases[table.upper()] = table.upper()
+        if alias:
+            aliases[alias.upper()] = table.upper()
+    return aliases
+
+
+def sample_params(cursor):
+    """Pick real ids from the seeded data so EXPLAIN sees realistic constants."""
+    today = date.today()
+    samples = {"page_size": 10, "offset": 0, "horizon_days": availability_rules.RULE_HORIZON_DAYS,
+               "slot_date": today + timedelta(days=1),
+               "window_start": today, "window_end": today + timedelta(days=availability_rules.RULE_HORIZON_DAYS),
+               "after_time": "2100-01-01 00:00:00", "after_id": 2**31 - 1,
+               "after_date": "2100-01-01", "after_start": "23:59:59"}
+    for key, sql in {
+        "therapist_id": "SELECT THERAPIST_ID FROM THERAPIST ORDER BY THERAPIST_ID LIMIT 1",
+        "therapist_user_id": "SELECT USER_ID FROM THERAPIST ORDER BY THERAPIST_ID LIMIT 1",
+        "student_id": "SELECT STUDENT_ID FROM STUDENT ORDER BY STUDENT_ID LIMIT 1",
+        "parent_id": "SELECT PARENT_ID FROM PARENT ORDER BY PARENT_ID LIMIT 1",
+        "slot_id": "SELECT AVAILABILITY_ID FROM APPOINTMENTS ORDER BY Appointment_ID LIMIT 1",
+    }.items():
+        cursor.execute(sql)
+        row = cursor.fetchone()
+        samples[key] = list(row.values())[0] if row else 0
+    return samples
+
+
+def check():
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor(dictionary=True)
+    failures = []
+    try:
+        samples = sample_params(cursor)
+        for name, (sql, param_names) in HOT_QUERIES.items():
+            cursor.execute("EXPLAIN " + sql, tuple(samples[p] for p in param_names))
+            plan = cursor.fetchall()
+            aliases = table_aliases(sql)
+            scans = [
+                row for row in plan
+                if aliases.get((row.get("table") or "").upper()) in WATCHED_TABLES
+                and row.get("type") == "ALL"
+            ]
+            for row in plan:
+                print(f"  {name:<48} {row.get('table') or '-':<14} type={row.get('type')} "
+                      f"key={row.get('key')} rows={row.get('rows')}")
+            if scans:
+                failures.append((name, [row["table"] for row in scans]))
+    finally:
+        cursor.close()
+        conn.close()
+
+    if failures:
+        print("\nFull table scans on hot queries:")
+        for name, tables in failures:
+            print(f"  FAIL {name}: {', '.join(tables)}")
+        return 1
+    print(f"\nOK: {len(HOT_QUERIES)} hot queries use indexes on {', '.join(sorted(WATCHED_TABLES))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(check())
@@ -0,0 +1,248 @@
+# generate_clinic_data.py
+"""
+Populate every table in database/therapy_clinic.sql with synthetic clinic data.
+
+Volumes are configurable; the defaults are small enough for a laptop. A
+production-scale run looks like:
+
+    python -m scripts.generate_clinic_data --therapists 5000 --families 100000 \\
+        --availability 2000000 --appointments 500000
+
+Run from backend/ against an empty (or --truncate'd) therapy_clinic database.
+Every generated account uses the password given by --password so the load
+benchmark can log in; usernames follow <role><n>@example.com.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import bcrypt
+import mysql.connector
+
+from app import db_config
+
+TABLES = ["NOTIFICATION_OUTBOX", "AVAILABILITY_RULE_EXCEPTION", "AVAILABILITY_RULE", "APPOINTMENTS",
+          "AVAILABILITY", "GUARDIAN", "THERAPIST", "STUDENT", "PARENT", "ADMIN", "USERS"]
+
+FIRST_NAMES = ["Ava", "Liam", "Noah", "Emma", "Olivia", "Mia", "Lucas", "Amir", "Sofia", "Maya",
+               "Ethan", "Zara", "Leo", "Nora", "Omar", "Ivy", "Kai", "Lena", "Ravi", "Chloe"]
+LAST_NAMES = ["Lee", "Patel", "Garcia", "Smith", "Nguyen", "Khan", "Brown", "Lopez", "Kim", "Silva",
+              "Chen", "Davis", "Martin", "Ali", "Clark", "Wong", "Hall", "Young", "Reed", "Moore"]
+RELATIONS = ["mother", "father", "guardian"]
+REASONS = ["Therapy session for anxiety", "Follow-up", "Stress management", "Initial consultation",
+           "Sleep issues", "Exam stress"]
+SLOT_HOURS = list(range(8, 18))
+BY_USER = lambda row: (row[0],)    # role tables are unique on USER_ID, their first column
+
+
+def batched(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+class Generator:
+    def __init__(self, conn, args):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.password_hash = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+    def insert(self, sql, rows, label, ids_by=None):
+        """
+        Multi-row INSERT in batches. With ids_by = (table, id column, unique key
+        columns, key(row)), returns the generated AUTO_INCREMENT ids in row order,
+        read back by that key: ids of one multi-row INSERT are not consecutive
+        under innodb_autoinc_lock_mode=2 with other writers.
+        """
+        ids = []
+        started = time.perf_counter()
+        for chunk in batched(rows, self.args.batch_size):
+            self.cursor.executemany(sql, chunk)
+            if ids_by:
+                ids.extend(self.ids_for(chunk, *ids_by))
+            self.conn.commit()
+        print(f"  {label:<14} {len(rows):>10,} rows  {time.perf_counter() - started:6.1f}s")
+        return ids
+
+    def ids_for(self, chunk, table, id_column, key_columns, key):
+        keys = [key(row) for row in chunk]
+        if len(key_columns) == 1:
+            where = f"{key_columns[0]} IN ({', '.join(['%s'] * len(keys))})"
+        else:
+            one = "(" + ", ".join(["%s"] * len(key_columns)) + ")"
+            where = f"({', '.join(key_columns)}) IN ({', '.join([one] * len(keys))})"
+        self.cursor.execute(f"SELECT {id_column}, {', '.join(key_columns)} FROM {table} WHERE {where}",
+                            [value for k in keys for value in k])
+        found = {tuple(row[1:]): row[0] for row in self.cursor.fetchall()}
+        return [found[k] for k in keys]
+
+    def name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def users(self, role, count):
+        rows = [
+            (f"{role}{i}@example.com", self.password_hash, role,
+             round(self.rng.uniform(25, 48), 6), round(self.rng.uniform(-124, -67), 6))
+            for i in range(count)
+        ]
+        return self.insert(
+            "INSERT INTO USERS (username, password, ROLE, latitude, longitude) VALUES (%s, %s, %s, %s, %s)",
+            rows, f"USERS/{role}", ("USERS", "USER_ID", ["username"], lambda row: (row[0],)))
+
+    def run(self):
+        a = self.args
+        if a.truncate:
+            self.truncate()
+
+        admin_users = self.users("admin", 1)
+        admin_id = self.insert("INSERT INTO ADMIN (USER_ID) VALUES (%s)", [(u,) for u in admin_users], "ADMIN",
+                               ("ADMIN", "ADMIN_ID", ["USER_ID"], BY_USER))[0]
+
+        therapist_users = self.users("therapist", a.therapists)
+        rows = []
+        for i, uid in enumerate(therapist_users):
+            first, last = self.name()
+            verified = self.rng.random() < a.verified_ratio
+            rows.append((uid, first, last, f"CERT-{i:06d}", self.rng.choice(["male", "female"]),
+                         admin_id if verified else None))
+        therapist_ids = self.insert(
+            "INSERT INTO THERAPIST (USER_ID, FirstName, LastName, CERT_Number, Gender, ADMIN_ID) "
+            "VALUES (%s, %s, %s, %s, %s, %s)", rows, "THERAPIST",
+            ("THERAPIST", "THERAPIST_ID", ["USER_ID"], BY_USER))
+
+        parent_users = self.users("parent", a.families)
+        rows = []
+        for uid in parent_users:
+            first, last = self.name()
+            rows.append((uid, first, last, f"555{self.rng.randrange(10**7):07d}",
+                         date(1970, 1, 1) + timedelta(days=self.rng.randrange(9000)),
+                         self.rng.choice(["male", "female"])))
+        parent_ids = self.insert(
+            "INSERT INTO PARENT (USER_ID, FirstName, LastName, Phone_number, DOB, Gender) "
+            "VALUES (%s, %s, %s, %s, %s, %s)", rows, "PARENT",
+            ("PARENT", "PARENT_ID", ["USER_ID"], BY_USER))
+
+        # Each family has 1..max_children children; a share of students sign up on their own.
+        children_per_family = [self.rng.randint(1, a.max_children) for _ in parent_ids]
+        n_students = sum(children_per_family) + a.independent_students
+        student_users = self.users("student", n_students)
+        rows = []
+        for uid in student_users:
+            first, last = self.name()
+            rows.append((uid, first, last, f"555{self.rng.randrange(10**7):07d}",
+                         date(2005, 1, 1) + timedelta(days=self.rng.randrange(5000)),
+                         self.rng.choice(["male", "female"])))
+        student_ids = self.insert(
+            "INSERT INTO STUDENT (USER_ID, FirstName, LastName, Phone_number, DOB, Gender) "
+            "VALUES (%s, %s, %s, %s, %s, %s)", rows, "STUDENT",
+            ("STUDENT", "STUDENT_ID", ["USER_ID"], BY_USER))
+
+        rows, parent_of = [], {}
+        next_student = 0
+        for parent_id, n in zip(parent_ids, children_per_family):
+            for _ in range(n):
+                sid = student_ids[next_student]
+                next_student += 1
+                parent_of[sid] = parent_id
+                rows.append((parent_id, sid, self.rng.choice(RELATIONS)))
+        self.insert("INSERT INTO GUARDIAN (PARENT_ID, STUDENT_ID, Relation) VALUES (%s, %s, %s)",
+                    rows, "GUARDIAN")
+
+        # Hourly slots spread over [-past_days, +future_days]; (therapist, date, hour) stays unique.
+        slots, seen = [], set()
+        today = date.today()
+        span = a.past_days + a.future_days
+        while len(slots) < a.availability:
+            tid = self.rng.choice(therapist_ids)
+            day = today + timedelta(days=self.rng.randrange(span) - a.past_days)
+            hour = self.rng.choice(SLOT_HOURS)
+            if (tid, day, hour) in seen:
+                continue
+            seen.add((tid, day, hour))
+            slots.append((tid, day, hour))
+        seen = None
+        booked = set(self.rng.sample(range(len(slots)), min(a.appointments, len(slots))))
+        status_of = {i: self.rng.choices(["pending", "confirmed", "cancelled"], weights=[3, 6, 1])[0]
+                     for i in sorted(booked)}
+        # Cancelling releases the slot, as the cancel routes do
+        rows = [
+            (tid, day, f"{hour:02d}:00:00", f"{hour + 1:02d}:00:00",
+             "not_available" if status_of.get(i, "cancelled") != "cancelled" else "available")
+            for i, (tid, day, hour) in enumerate(slots)
+        ]
+        slot_ids = self.insert(
+            "INSERT INTO AVAILABILITY (THERAPIST_ID, Date, Start_Time, End_Time, Status) "
+            "VALUES (%s, %s, %s, %s, %s)", rows, "AVAILABILITY",
+            ("AVAILABILITY", "ID", ["THERAPIST_ID", "Date", "Start_Time"],
+             lambda row: (row[0], row[1], timedelta(hours=int(row[2][:2])))))
+
+        rows = []
+        for i in sorted(booked):
+            tid, day, hour = slots[i]
+            sid = self.rng.choice(student_ids)
+            appt_time = datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+            status = status_of[i]
+            appt_type = self.rng.choice(["virtual", "in_person"])
+            rows.append((sid, slot_ids[i], appt_time, status, appt_type,
+                         None, self.rng.choice(REASONS), parent_of.get(sid)))
+        self.insert(
+            "INSERT INTO APPOINTMENTS (STUDENT_ID, AVAILABILITY_ID, Appointment_time, Status, "
+            "Appointment_type, Meeting_link, Reason_for_meeting, PARENTID) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", rows, "APPOINTMENTS")
+
+    def truncate(self):
+        print("Truncating tables")
+        self.cursor.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+        existing = {row[0] for row in self.cursor.fetchall()}
+        missing = [table for table in TABLES if table not in existing]
+        if missing:
+            print(f"  skipping {', '.join(missing)}: not created yet (python -m scripts.migrate adds them)")
+        self.cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in TABLES:
+            if table in existing:
+                self.cursor.execute(f"TRUNCATE TABLE {table}")
+        self.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        self.conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic therapy clinic data.")
+    parser.add_argument("--therapists", type=int, default=200)
+    parser.add_argument("--families", type=int, default=2000, help="parent accounts")
+    parser.add_argument("--max-children", type=int, default=3, help="children per family (1..N)")
+    parser.add_argument("--independent-students", type=int, default=500, help="students without a guardian")
+    parser.add_argument("--availability", type=int, default=50000, help="AVAILABILITY rows")
+    parser.add_argument("--appointments", type=int, default=10000, help="booked slots (<= availability)")
+    parser.add_argument("--past-days", type=int, default=60)
+    parser.add_argument("--future-days", type=int, default=120)
+    parser.add_argument("--verified-ratio", type=float, default=0.9)
+    parser.add_argument("--password", default="Password123!")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="empty all tables first")
+    args = parser.parse_args()
+
+    max_slots = args.therapists * (args.past_days + args.future_days) * len(SLOT_HOURS)
+    if args.availability > max_slots:
+        parser.error(f"--availability exceeds the {max_slots:,} unique slots these settings allow")
+
+    conn = mysql.connector.connect(**db_config)
+    started = time.perf_counter()
+    try:
+        Generator(conn, args).run()
+    except mysql.connector.Error as err:
+        conn.rollback()
+        print(f"Generation failed: {err}")
+        return 1
+    finally:
+        conn.close()
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# migrate.py
+"""
+Apply the versioned schema migrations in database/migrations/ in order.
+
+Each file is named NNN_description.sql and is applied once; applied versions
+are recorded in SCHEMA_MIGRATIONS. Run from the backend/ folder:
+
+    python -m scripts.migrate            # apply pending migrations
+    python -m scripts.migrate --status   # list applied / pending
+
+MySQL commits every CREATE / ALTER as it runs, so a migration that fails
+partway cannot be rolled back: the statements before the failure stay
+applied. Each step is therefore idempotent. CREATE INDEX and ALTER TABLE ...
+ADD COLUMN are skipped when information_schema shows them in place (tables
+use CREATE TABLE IF NOT EXISTS), and rerunning after a fix resumes where the
+failed run stopped.
+"""
+import argparse
+import os
+import re
+import sys
+
+import mysql.connector
+
+from app import db_config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "database", "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_[\w-]+\.sql$")
+CREATE_INDEX = re.compile(r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+(\w+)\s+ON\s+(\w+)", re.IGNORECASE)
+ADD_COLUMN = re.compile(r"^ALTER\s+TABLE\s+(\w+)\s+ADD\s+(?:COLUMN\s+)?(\w+)", re.IGNORECASE)
+
+
+def list_migrations():
+    """Return [(version, path)] sorted by version."""
+    found = []
+    for name in os.listdir(MIGRATIONS_DIR):
+        m = MIGRATION_FILE.match(name)
+        if m:
+            found.append((m.group(1), os.path.join(MIGRATIONS_DIR, name)))
+    return sorted(found, key=lambda item: int(item[0]))
+
+
+def split_statements(sql):
+    """Split a migration file into statements (no stored procedures, so ';' is enough)."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+def already_applied(cursor, stmt):
+    """Whether an index or column `stmt` creates is already there (a rerun after a partial failure)."""
+    m = CREATE_INDEX.match(stmt)
+    if m:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            LIMIT 1
+        """, (m.group(2), m.group(1)))
+        return cursor.fetchone() is not None
+    m = ADD_COLUMN.match(stmt)
+    if m:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (m.group(1), m.group(2)))
+        return cursor.fetchone() is not None
+    return False
+
+
+def applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS SCHEMA_MIGRATIONS (
+          version VARCHAR(32) PRIMARY KEY,
+          applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM SCHEMA_MIGRATIONS")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(status_only=False):
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    try:
+        done = applied_versions(cursor)
+        for version, path in list_migrations():
+            name = os.path.basename(path)
+            if version in done:
+                print(f"applied  {name}")
+                continue
+            if status_only:
+                print(f"pending  {name}")
+                continue
+            with open(path) as f:
+                statements = split_statements(f.read())
+            print(f"applying {name} ({len(statements)} statements)")
+            for n, stmt in enumerate(statements, 1):
+                if already_applied(cursor, stmt):
+                    print(f"  step {n} already in place, skipped")
+                    continue
+                try:
+                    cursor.execute(stmt)
+                except mysql.connector.Error as err:
+                    # DDL has committed implicitly; nothing to roll back
+                    print(f"Migration {name} failed at step {n}: {err}")
+                    print(f"Steps 1-{n - 1} stay applied; fix the cause and rerun to resume.")
+                    return 1
+            cursor.execute("INSERT INTO SCHEMA_MIGRATIONS (version) VALUES (%s)", (version,))
+            conn.commit()
+    except mysql.connector.Error as err:
+        print(f"Migration failed: {err}")
+        return 1
+    finally:
+        cursor.close()
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--status", action="store_true", help="only list applied / pending migrations")
+    args = parser.parse_args()
+    sys.exit(migrate(status_only=args.status))
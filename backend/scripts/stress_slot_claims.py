@@ -0,0 +1,138 @@
+# stress_slot_claims.py
+"""
+Hammer one AVAILABILITY slot from many threads at once and check that exactly
+one booking wins (utils/slot_reservation.py).
+
+Needs a database with at least one therapist and one student; the slots it
+books are created on 2099-12-31 and removed again afterwards. From backend/:
+
+    python -m scripts.stress_slot_claims --threads 32 --rounds 20
+    python -m scripts.stress_slot_claims --legacy   # the old SELECT-then-UPDATE booking
+
+Each thread has its own connection and waits on a barrier, so all bookings of
+a round hit the slot together. Exits 1 if any round ends with a slot booked
+more than once (or not at all).
+"""
+import argparse
+import sys
+import threading
+from datetime import date, timedelta
+
+import mysql.connector
+
+from app import db_config
+from utils.slot_reservation import SlotUnavailable, claim_slot, insert_appointment
+
+STRESS_DATE = date(2099, 12, 31)
+
+
+def claim_and_book(cursor, slot_id, student_id):
+    slot = claim_slot(cursor, slot_id)
+    insert_appointment(cursor, slot, student_id, "virtual", "slot claim stress test")
+
+
+def legacy_book(cursor, slot_id, student_id):
+    """The pattern the booking routes used before: read, check, insert, update."""
+    cursor.execute("SELECT ID, Date, Start_Time, THERAPIST_ID, Status FROM AVAILABILITY WHERE ID = %s", (slot_id,))
+    slot = cursor.fetchone()
+    if slot["Status"] != "available":
+        raise SlotUnavailable(slot_id, slot["Status"])
+    insert_appointment(cursor, slot, student_id, "virtual", "slot claim stress test")
+    cursor.execute("UPDATE AVAILABILITY SET Status = 'not_available' WHERE ID = %s", (slot_id,))
+
+
+def cleanup(cursor, therapist_id):
+    cursor.execute("""
+        DELETE a FROM APPOINTMENTS a JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
+        WHERE av.THERAPIST_ID = %s AND av.Date = %s
+    """, (therapist_id, STRESS_DATE))
+    cursor.execute("DELETE FROM AVAILABILITY WHERE THERAPIST_ID = %s AND Date = %s", (therapist_id, STRESS_DATE))
+
+
+def run_round(book, slot_id, student_id, threads):
+    barrier = threading.Barrier(threads)
+    outcomes = []
+    lock = threading.Lock()
+    conns = [mysql.connector.connect(**db_config) for _ in range(threads)]
+
+    def worker(conn):
+        cursor = conn.cursor(dictionary=True)
+        barrier.wait()
+        try:
+            book(cursor, slot_id, student_id)
+            conn.commit()
+            outcome = "booked"
+        except SlotUnavailable:
+            conn.rollback()
+            outcome = "refused"
+        except mysql.connector.Error as err:
+            conn.rollback()
+            outcome = f"error {err.errno}"
+        finally:
+            cursor.close()
+            conn.close()
+        with lock:
+            outcomes.append(outcome)
+
+    workers = [threading.Thread(target=worker, args=(conn,)) for conn in conns]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent bookings of one slot.")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--legacy", action="store_true", help="book with the old SELECT-then-UPDATE pattern")
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT MIN(THERAPIST_ID) AS id FROM THERAPIST")
+    therapist_id = cursor.fetchone()["id"]
+    cursor.execute("SELECT MIN(STUDENT_ID) AS id FROM STUDENT")
+    student_id = cursor.fetchone()["id"]
+    if therapist_id is None or student_id is None:
+        print("Needs at least one therapist and one student (see scripts/generate_clinic_data.py)")
+        return 1
+
+    book = legacy_book if args.legacy else claim_and_book
+    failed_rounds = 0
+    try:
+        cleanup(cursor, therapist_id)
+        conn.commit()
+        for n in range(args.rounds):
+            start = timedelta(minutes=n)
+            cursor.execute("""
+                INSERT INTO AVAILABILITY (THERAPIST_ID, Date, Start_Time, End_Time, Status)
+                VALUES (%s, %s, %s, %s, 'available')
+            """, (therapist_id, STRESS_DATE, str(start), str(start + timedelta(minutes=1))))
+            slot_id = cursor.lastrowid
+            conn.commit()
+
+            outcomes = run_round(book, slot_id, student_id, args.threads)
+            cursor.execute("SELECT COUNT(*) AS n FROM APPOINTMENTS WHERE AVAILABILITY_ID = %s", (slot_id,))
+            appointments = cursor.fetchone()["n"]
+            conn.commit()
+            booked = outcomes.count("booked")
+            errors = [o for o in outcomes if o.startswith("error")]
+            ok = booked == 1 and appointments == 1
+            failed_rounds += not ok
+            print(f"round {n + 1:>3}: slot {slot_id}  booked={booked} refused={outcomes.count('refused')} "
+                  f"errors={len(errors)} appointments={appointments}  {'ok' if ok else 'DOUBLE BOOKED' if appointments > 1 else 'FAILED'}")
+    finally:
+        cleanup(cursor, therapist_id)
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    print(f"{args.rounds - failed_rounds}/{args.rounds} rounds booked exactly once "
+          f"({args.threads} threads, {'legacy' if args.legacy else 'claim_slot'})")
+    return 1 if failed_rounds else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# availability_bulk.py
+"""
+Bulk availability import for POST /therapist/availability/bulk.
+
+The whole payload is checked in memory against itself and against the
+therapist's existing AVAILABILITY rows for the dates it covers (read once,
+FOR UPDATE, so the range stays put until commit) and the open occurrences of
+their recurring rules there. The rows that pass go in
+with one executemany, which the connector sends as a multi-row INSERT. Every
+input row gets a report entry, by its index in the payload:
+
+  created    inserted; carries availabilityId
+  invalid    missing or malformed date/startTime/endTime, or end not after start
+  duplicate  same date and start as an earlier row in the payload
+  exists     an AVAILABILITY row or rule occurrence already starts then
+  overlap    overlaps an earlier payload row, an existing row or an occurrence
+  skipped    fine, but not inserted because others were rejected (allOrNothing)
+
+Existing rows of any status count, so a booked slot is never overlapped.
+A conflicting occurrence is reported by its virtual slot id.
+"""
+from datetime import datetime
+
+from utils.availability_rules import as_timedelta, open_occurrences
+
+# Most slots accepted in one request
+MAX_BULK_SLOTS = 1000
+
+
+def _parse_row(row):
+    """(date, start, end) or raises ValueError with a message for the report."""
+    if not isinstance(row, dict):
+        raise ValueError("each slot needs date, startTime and endTime")
+    for field in ("date", "startTime", "endTime"):
+        if not row.get(field):
+            raise ValueError(f"Missing required field: {field}")
+    try:
+        day = datetime.strptime(row["date"], "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError("date must be YYYY-MM-DD")
+    try:
+        start, end = as_timedelta(row["startTime"]), as_timedelta(row["endTime"])
+    except (TypeError, ValueError):
+        raise ValueError("startTime and endTime must be HH:MM")
+    if end <= start:
+        raise ValueError("endTime must be after startTime")
+    return day, start, end
+
+
+def _describe(slot):
+    return {"availabilityId": slot.get("ID"), "date": slot["Date"].isoformat(),
+            "startTime": str(slot["Start_Time"]), "endTime": str(slot["End_Time"])}
+
+
+def plan(rows, existing):
+    """
+    Check `rows` (the payload) against each other and `existing`
+    (AVAILABILITY rows: ID, Date, Start_Time, End_Time). Returns the report
+    (one dict per row, in payload order; accepted rows have status None until
+    inserted) and the accepted (index, date, start, end) tuples.
+    """
+    report = [{"index": i, "status": None} for i in range(len(rows))]
+    by_day = {}
+    for slot in existing:
+        slot = dict(slot, Start_Time=as_timedelta(slot["Start_Time"]), End_Time=as_timedelta(slot["End_Time"]))
+        by_day.setdefault(slot["Date"], []).append(slot)
+
+    accepted = []
+    starts = set()
+    for i, row in enumerate(rows):
+        try:
+            day, start, end = _parse_row(row)
+        except ValueError as err:
+            report[i].update(status="invalid", error=str(err))
+            continue
+        if (day, start) in starts:
+            report[i].update(status="duplicate", error="same date and startTime as an earlier slot")
+            continue
+        clash = next((s for s in by_day.get(day, ()) if s["Start_Time"] < end and start < s["End_Time"]), None)
+        if clash is not None:
+            if clash["Start_Time"] == start and "index" not in clash:
+                report[i].update(status="exists", error="a slot already starts at this time")
+            else:
+                report[i].update(status="overlap", error="overlaps another slot")
+            report[i]["conflictsWith"] = (
+                {"index": clash["index"]} if "index" in clash else _describe(clash)
+            )
+            continue
+        starts.add((day, start))
+        # Later rows in the payload are checked against this one too
+        by_day.setdefault(day, []).append({"index": i, "Date": day, "Start_Time": start, "End_Time": end})
+        accepted.append((i, day, start, end))
+    return report, accepted
+
+
+def _try_day(row):
+    try:
+        return datetime.strptime(row["date"], "%Y-%m-%d").date()
+    except (TypeError, ValueError, KeyError):
+        return None
+
+
+def import_slots(cursor, therapist_id, rows, all_or_nothing=False):
+    """
+    Check and insert `rows` for the therapist on `cursor` (dictionary cursor,
+    caller commits). Returns (report, created ids). With all_or_nothing,
+    nothing is inserted when any row is rejected.
+    """
+    days = sorted({day for day in (_try_day(row) for row in rows) if day is not None})
+    existing = []
+    if days:
+        # Locks the therapist's rows (and gaps) in the range, so nothing can slip in before commit
+        cursor.execute("""
+            SELECT ID, Date, Start_Time, End_Time
+            FROM AVAILABILITY
+            WHERE THERAPIST_ID = %s AND Date BETWEEN %s AND %s
+            FOR UPDATE
+        """, (therapist_id, days[0], days[-1]))
+        existing = cursor.fetchall()
+        # Rule occurrences would become rows of their own once booked
+        existing += [dict(slot, ID=slot["id"]) for slot in open_occurrences(cursor, days[0], days[-1], [therapist_id])]
+
+    report, accepted = plan(rows, existing)
+    if not accepted or (all_or_nothing and len(accepted) < len(rows)):
+        for i, *_ in accepted:
+            report[i].update(status="skipped", error="not inserted: other slots were rejected")
+        return report, []
+
+    cursor.executemany("""
+        INSERT INTO AVAILABILITY (THERAPIST_ID, Date, Start_Time, End_Time, Status)
+        VALUES (%s, %s, %s, %s, 'available')
+    """, [(therapist_id, day, str(start), str(end)) for _, day, start, end in accepted])
+
+    # Multi-row inserts need not get consecutive ids, so read them back by key
+    cursor.execute("""
+        SELECT ID, Date, Start_Time
+        FROM AVAILABILITY
+        WHERE THERAPIST_ID = %s AND Date BETWEEN %s AND %s
+    """, (therapist_id, days[0], days[-1]))
+    ids = {(row["Date"], as_timedelta(row["Start_Time"])): row["ID"] for row in cursor.fetchall()}
+    created = []
+    for i, day, start, _ in accepted:
+        report[i].update(status="created", availabilityId=ids.get((day, start)))
+        created.append(ids.get((day, start)))
+    return report, created
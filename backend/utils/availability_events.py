@@ -0,0 +1,69 @@
+# availability_events.py
+"""
+In-process notifications that open slots changed.
+
+Every route that changes AVAILABILITY (slot created, edited or deleted,
+booked or freed) calls publish() once its transaction has committed. That
+bumps the version counters cached views stamp themselves with and calls the
+subscribers.
+
+Events are local to this process. Other workers only catch up through their
+own validity windows, and booking always re-checks the database.
+"""
+import threading
+from collections import namedtuple
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+BOOKED = "booked"
+RELEASED = "released"
+
+AvailabilityEvent = namedtuple("AvailabilityEvent", "kind therapist_id slot_ids")
+
+_lock = threading.Lock()
+_version = 0            # bumped by every event
+_untargeted = 0         # _version at the last event that named no therapist
+_by_therapist = {}      # therapist_id -> _version at its last event
+_subscribers = []
+
+
+def version(therapist_id=None):
+    """
+    Stamp for a view of all open slots, or of one therapist's. It changes
+    whenever an event could have changed that view.
+    """
+    with _lock:
+        if therapist_id is None:
+            return _version
+        return max(_by_therapist.get(therapist_id, 0), _untargeted)
+
+
+def publish(kind, therapist_id=None, slot_ids=()):
+    """Record a committed change; pass therapist_id=None when it is unknown or spans therapists."""
+    global _version, _untargeted
+    with _lock:
+        _version += 1
+        if therapist_id is None:
+            _untargeted = _version
+        else:
+            _by_therapist[therapist_id] = _version
+        subscribers = list(_subscribers)
+    event = AvailabilityEvent(kind, therapist_id, tuple(slot_ids))
+    for callback in subscribers:
+        try:
+            callback(event)
+        except Exception as e:
+            print(f"Availability subscriber {getattr(callback, '__name__', callback)} failed on {event}: {e}")
+
+
+def subscribe(callback):
+    """Call callback(event) after every publish() in this process."""
+    with _lock:
+        _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
@@ -0,0 +1,273 @@
+# availability_rules.py
+"""
+Recurring weekly availability.
+
+A rule is one AVAILABILITY_RULE row: a weekday, a time range cut into
+Slot_Minutes slots, and the dates it runs between. AVAILABILITY_RULE_EXCEPTION
+takes single days (Start_Time NULL) or single slots back out.
+
+Rules are never written out as AVAILABILITY rows up front. Readers expand them
+for the window they show with open_occurrences(); occurrences come back with
+virtual ids like "r12-20300416-1500". Claiming a virtual id
+(utils/slot_reservation.py) inserts just that occurrence as an ordinary
+AVAILABILITY row. From then on the row is the slot: an occurrence that has an
+AVAILABILITY row for the same therapist, date and start time, whatever its
+status, is never listed as virtual again.
+"""
+import os
+import re
+from datetime import date, datetime, time, timedelta
+
+# Days of rule occurrences listed when the caller asks for no window
+RULE_HORIZON_DAYS = int(os.getenv("AVAILABILITY_RULE_HORIZON_DAYS", 28))
+MAX_WINDOW_DAYS = 366
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Concrete slots in a window, which rule occurrences must not duplicate
+TAKEN_SLOTS_SQL = """
+    SELECT THERAPIST_ID, Date, Start_Time
+    FROM AVAILABILITY
+    WHERE THERAPIST_ID IN ({therapists}) AND Date BETWEEN %s AND %s
+"""
+
+_VIRTUAL_ID = re.compile(r"^r(\d+)-(\d{8})-(\d{4})$")
+
+
+def as_timedelta(value):
+    """A TIME value (timedelta from the connector, a time, or 'HH:MM[:SS]') as a timedelta."""
+    if isinstance(value, timedelta):
+        return value
+    if isinstance(value, str):
+        parts = [int(part) for part in value.split(":")]
+        if len(parts) not in (2, 3):
+            raise ValueError(f"not a time: {value!r}")
+        value = time(*parts)
+    return timedelta(hours=value.hour, minutes=value.minute, seconds=value.second)
+
+
+def virtual_slot_id(rule_id, day, start):
+    minutes = int(start.total_seconds()) // 60
+    return f"r{rule_id}-{day:%Y%m%d}-{minutes // 60:02d}{minutes % 60:02d}"
+
+
+def parse_virtual_slot_id(slot_id):
+    """(rule_id, date, start timedelta) for a virtual slot id, else None."""
+    m = _VIRTUAL_ID.match(slot_id) if isinstance(slot_id, str) else None
+    if m is None:
+        return None
+    try:
+        day = datetime.strptime(m.group(2), "%Y%m%d").date()
+    except ValueError:
+        return None
+    hhmm = m.group(3)
+    return int(m.group(1)), day, timedelta(hours=int(hhmm[:2]), minutes=int(hhmm[2:]))
+
+
+def is_virtual_slot_id(slot_id):
+    return parse_virtual_slot_id(slot_id) is not None
+
+
+def occurrences(rule, start, end, exceptions=()):
+    """
+    (date, start, end) of every slot `rule` generates from `start` to `end`
+    (dates, inclusive), in order. `exceptions` holds (date, None) to skip a
+    whole day and (date, start timedelta) to skip one slot.
+    """
+    first = max(start, rule["Start_Date"])
+    last = min(end, rule["End_Date"])
+    if first > last:
+        return
+    day = first + timedelta(days=(rule["Weekday"] - first.weekday()) % 7)
+    length = timedelta(minutes=rule["Slot_Minutes"])
+    day_start, day_end = as_timedelta(rule["Start_Time"]), as_timedelta(rule["End_Time"])
+    skipped = set(exceptions)
+    while day <= last:
+        if (day, None) not in skipped:
+            slot_start = day_start
+            while slot_start + length <= day_end:
+                if (day, slot_start) not in skipped:
+                    yield day, slot_start, slot_start + length
+                slot_start += length
+        day += timedelta(days=7)
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def _exceptions(cursor, rule_ids, start, end):
+    cursor.execute(f"""
+        SELECT RULE_ID, Date, Start_Time
+        FROM AVAILABILITY_RULE_EXCEPTION
+        WHERE RULE_ID IN ({_placeholders(rule_ids)}) AND Date BETWEEN %s AND %s
+    """, list(rule_ids) + [start, end])
+    by_rule = {}
+    for row in cursor.fetchall():
+        slot_start = as_timedelta(row["Start_Time"]) if row["Start_Time"] is not None else None
+        by_rule.setdefault(row["RULE_ID"], set()).add((row["Date"], slot_start))
+    return by_rule
+
+
+def open_occurrences(cursor, start, end, therapist_ids=None):
+    """
+    Rule occurrences from `start` to `end` that have no AVAILABILITY row yet,
+    ordered by date and time, shaped like AVAILABILITY rows: id (virtual),
+    THERAPIST_ID, Date, Start_Time, End_Time, plus the therapist's FirstName
+    and LastName. At most three queries, however many rules and days.
+    """
+    if therapist_ids is not None and not therapist_ids:
+        return []
+    query = """
+        SELECT r.ID, r.THERAPIST_ID, r.Weekday, r.Start_Time, r.End_Time, r.Slot_Minutes,
+               r.Start_Date, r.End_Date, t.FirstName, t.LastName
+        FROM AVAILABILITY_RULE r
+        JOIN THERAPIST t ON r.THERAPIST_ID = t.THERAPIST_ID
+        WHERE r.Start_Date <= %s AND r.End_Date >= %s
+    """
+    params = [end, start]
+    if therapist_ids is not None:
+        query += f" AND r.THERAPIST_ID IN ({_placeholders(therapist_ids)})"
+        params += list(therapist_ids)
+    cursor.execute(query, params)
+    rules = cursor.fetchall()
+    if not rules:
+        return []
+
+    exceptions = _exceptions(cursor, [rule["ID"] for rule in rules], start, end)
+    therapists = sorted({rule["THERAPIST_ID"] for rule in rules})
+    cursor.execute(TAKEN_SLOTS_SQL.format(therapists=_placeholders(therapists)), therapists + [start, end])
+    taken = {(row["THERAPIST_ID"], row["Date"], as_timedelta(row["Start_Time"])) for row in cursor.fetchall()}
+
+    slots = {}
+    for rule in rules:
+        for day, slot_start, slot_end in occurrences(rule, start, end, exceptions.get(rule["ID"], ())):
+            key = (rule["THERAPIST_ID"], day, slot_start)
+            if key in taken or key in slots:   # overlapping rules give one slot
+                continue
+            slots[key] = {
+                "id": virtual_slot_id(rule["ID"], day, slot_start),
+                "THERAPIST_ID": rule["THERAPIST_ID"],
+                "Date": day,
+                "Start_Time": slot_start,
+                "End_Time": slot_end,
+                "FirstName": rule["FirstName"],
+                "LastName": rule["LastName"],
+            }
+    return [slots[key] for key in sorted(slots, key=lambda k: (k[1], k[2], k[0]))]
+
+
+def materialize(cursor, slot_id):
+    """
+    The AVAILABILITY id behind a virtual slot id, inserting the occurrence as
+    an 'available' row when it has none yet. None when the id names no
+    current occurrence (rule deleted, day excepted, off the rule's grid, past).
+    """
+    parsed = parse_virtual_slot_id(slot_id)
+    if parsed is None:
+        return None
+    rule_id, day, slot_start = parsed
+    if day < date.today():
+        return None
+    cursor.execute("""
+        SELECT ID, THERAPIST_ID, Weekday, Start_Time, End_Time, Slot_Minutes, Start_Date, End_Date
+        FROM AVAILABILITY_RULE
+        WHERE ID = %s
+    """, (rule_id,))
+    rule = cursor.fetchone()
+    if rule is None:
+        return None
+    exceptions = _exceptions(cursor, [rule_id], day, day).get(rule_id, ())
+    match = next((occ for occ in occurrences(rule, day, day, exceptions) if occ[1] == slot_start), None)
+    if match is None:
+        return None
+    # Two claims of the same occurrence meet on the (THERAPIST_ID, Date, Start_Time)
+    # unique key: the second waits, then gets the first one's row id back
+    cursor.execute("""
+        INSERT INTO AVAILABILITY (THERAPIST_ID, Date, Start_Time, End_Time, Status)
+        VALUES (%s, %s, %s, %s, 'available')
+        ON DUPLICATE KEY UPDATE ID = LAST_INSERT_ID(ID)
+    """, (rule["THERAPIST_ID"], day, str(slot_start), str(match[2])))
+    return cursor.lastrowid
+
+
+def parse_window(args):
+    """
+    (start, end) dates from optional ?from= and ?to= (YYYY-MM-DD) query args:
+    from today for RULE_HORIZON_DAYS by default, never before today and never
+    longer than MAX_WINDOW_DAYS. Raises ValueError on a malformed date.
+    """
+    today = date.today()
+    start = datetime.strptime(args["from"], "%Y-%m-%d").date() if args.get("from") else today
+    start = max(start, today)
+    if args.get("to"):
+        end = datetime.strptime(args["to"], "%Y-%m-%d").date()
+    else:
+        end = start + timedelta(days=RULE_HORIZON_DAYS)
+    return start, min(end, start + timedelta(days=MAX_WINDOW_DAYS))
+
+
+def default_window():
+    today = date.today()
+    return today, today + timedelta(days=RULE_HORIZON_DAYS)
+
+
+def _parse_date(value, field):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a YYYY-MM-DD date")
+
+
+def _parse_time(value, field):
+    try:
+        return as_timedelta(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an HH:MM time")
+
+
+def parse_exceptions(items):
+    """[(date, start timedelta or None)] from [{"date": ..., "startTime": ...}]; raises ValueError."""
+    if not isinstance(items, list):
+        raise ValueError("exceptions must be a list")
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("each exception needs a date")
+        day = _parse_date(item.get("date"), "exception date")
+        start = _parse_time(item["startTime"], "exception startTime") if item.get("startTime") else None
+        parsed.append((day, start))
+    return parsed
+
+
+def parse_rule(data):
+    """
+    A rule (weekday, start, end, slot minutes, start and end date) from a
+    request body: weekday as 0-6 (0 = Monday) or a day name, startTime and
+    endTime as HH:MM, slotMinutes (default 60), startDate and endDate as
+    YYYY-MM-DD. Raises ValueError with a message fit for the client.
+    """
+    weekday = data.get("weekday")
+    if isinstance(weekday, str) and weekday.strip().lower() in WEEKDAYS:
+        weekday = WEEKDAYS.index(weekday.strip().lower())
+    if not isinstance(weekday, int) or isinstance(weekday, bool) or not 0 <= weekday <= 6:
+        raise ValueError("weekday must be 0-6 (0 = Monday) or a day name")
+    start = _parse_time(data.get("startTime"), "startTime")
+    end = _parse_time(data.get("endTime"), "endTime")
+    slot_minutes = data.get("slotMinutes", 60)
+    if not isinstance(slot_minutes, int) or isinstance(slot_minutes, bool) or not 5 <= slot_minutes <= 480:
+        raise ValueError("slotMinutes must be a whole number from 5 to 480")
+    if end - start < timedelta(minutes=slot_minutes):
+        raise ValueError("endTime must leave room for at least one slot after startTime")
+    start_date = _parse_date(data.get("startDate"), "startDate")
+    end_date = _parse_date(data.get("endDate"), "endDate")
+    if end_date < start_date:
+        raise ValueError("endDate must not be before startDate")
+    return {
+        "Weekday": weekday,
+        "Start_Time": start,
+        "End_Time": end,
+        "Slot_Minutes": slot_minutes,
+        "Start_Date": start_date,
+        "End_Date": end_date,
+    }
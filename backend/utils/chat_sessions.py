@@ -0,0 +1,209 @@
+# chat_sessions.py
+"""
+Chatbot session stores.
+
+Sessions are plain JSON-able dicts, serialized compactly and kept for `ttl`
+seconds after their last save (sliding expiry). Three back ends:
+
+    MemorySessionStore   one process only; TTL plus an LRU cap on entries
+    SQLiteSessionStore   a file shared by every worker on one host
+    RedisSessionStore    shared across hosts; any Redis-protocol client works
+
+create_session_store() picks one from CHAT_SESSION_STORE (memory | sqlite | redis).
+"""
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+def dumps(session):
+    return json.dumps(session, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def loads(blob):
+    return json.loads(blob)
+
+
+class SessionStore(abc.ABC):
+    """Interface shared by all stores; a store missing get/save/delete cannot be created."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    @abc.abstractmethod
+    def get(self, session_id):
+        """The session dict, or None if unknown or expired."""
+
+    @abc.abstractmethod
+    def save(self, session_id, session):
+        """Store the session and restart its TTL."""
+
+    @abc.abstractmethod
+    def delete(self, session_id):
+        """Forget the session."""
+
+    def sweep(self):
+        """Drop expired sessions; returns how many were removed."""
+        return 0
+
+    def start_sweeper(self, interval):
+        """Run sweep() every `interval` seconds on a daemon thread."""
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    removed = self.sweep()
+                    if removed:
+                        print(f"Chat session sweeper removed {removed} expired session(s)")
+                except Exception as e:
+                    print(f"Chat session sweeper error: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="chat-session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, ttl, max_entries=10000):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # session_id -> (expires_at, blob), least recently saved first
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[session_id]
+                return None
+            return loads(entry[1])
+
+    def save(self, session_id, session):
+        blob = dumps(session)
+        with self._lock:
+            self._entries[session_id] = (time.time() + self.ttl, blob)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for sid in expired:
+                del self._entries[sid]
+        return len(expired)
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path, ttl):
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")   # readers don't block the writer across workers
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                id TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_expires ON chat_sessions (expires_at)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id):
+        row = self._conn().execute(
+            "SELECT data FROM chat_sessions WHERE id = ? AND expires_at > ?", (session_id, time.time())
+        ).fetchone()
+        return loads(row[0]) if row else None
+
+    def save(self, session_id, session):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO chat_sessions (id, data, expires_at) VALUES (?, ?, ?)",
+            (session_id, dumps(session), time.time() + self.ttl)
+        )
+        conn.commit()
+
+    def delete(self, session_id):
+        conn = self._conn()
+        conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+        conn.commit()
+
+    def sweep(self):
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM chat_sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+        conn.commit()
+        return removed
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions as `<prefix><id>` keys with a Redis TTL, so the server expires them
+    itself and sweep() has nothing to do. Pass `client` to use any
+    Redis-compatible client (e.g. fakeredis) instead of connecting to `url`.
+    """
+
+    def __init__(self, ttl, url="redis://localhost:6379/0", client=None, prefix="chat:session:"):
+        super().__init__(ttl)
+        if client is None:
+            import redis   # optional dependency, only needed for this store
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, session_id):
+        blob = self.client.get(self.prefix + session_id)
+        return loads(blob) if blob is not None else None
+
+    def save(self, session_id, session):
+        self.client.set(self.prefix + session_id, dumps(session), ex=int(self.ttl))
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+
+def create_session_store():
+    """Build the store named by CHAT_SESSION_STORE and start its sweeper."""
+    kind = os.getenv("CHAT_SESSION_STORE", "memory").lower()
+    ttl = float(os.getenv("CHAT_SESSION_TTL", 1800))
+    if kind == "sqlite":
+        store = SQLiteSessionStore(os.getenv("CHAT_SESSION_SQLITE_PATH", "chat_sessions.sqlite3"), ttl)
+    elif kind == "redis":
+        store = RedisSessionStore(ttl, url=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    elif kind == "memory":
+        store = MemorySessionStore(ttl, int(os.getenv("CHAT_SESSION_MAX", 10000)))
+    else:
+        raise ValueError(f"Unknown CHAT_SESSION_STORE: {kind}")
+    store.start_sweeper(float(os.getenv("CHAT_SESSION_SWEEP_INTERVAL", 60)))
+    print(f"Chatbot sessions: {type(store).__name__}, ttl={ttl:g}s")
+    return store
@@ -0,0 +1,105 @@
+# date_time_parser.py
+"""
+Rule-based date and time extraction for chatbot messages.
+
+The phrasings people actually type when booking are matched with two regexes,
+so they never need the spaCy model:
+
+  dates   2030-04-16, today, tonight, tomorrow, day after tomorrow, next week,
+          friday / this friday / next friday (also mon, tue(s), wed(s), thu(r)(s), fri)
+  times   3pm, 3 pm, 3:30 p.m., 10am, 15:00, 09:30, noon
+          (a 24-hour time needs both hour digits: "3:30" alone could be
+          either half of the day and is left to the fallback)
+
+Dates come back as the date specs utils.nlu caches (resolved against today on
+every lookup); times as '3:30 PM', the format AVAILABILITY start times are
+shown in. Anything else returns None and nlu falls back to spaCy's DATE and
+TIME entities.
+"""
+import re
+from datetime import date
+
+WEEKDAY_NAMES = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tues": 1, "tue": 1,
+    "wednesday": 2, "weds": 2, "wed": 2,
+    "thursday": 3, "thurs": 3, "thur": 3, "thu": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5,
+    "sunday": 6,
+}
+# "sat" and "sun" are left out: both are ordinary words
+
+_RELATIVE_DAYS = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}
+
+DATE_PATTERN = re.compile(
+    r"(?<![\w-])(?:"
+    r"(?P<iso>\d{4}-\d{1,2}-\d{1,2})"
+    r"|(?P<relative>day after tomorrow|tomorrow|today|tonight)"
+    r"|(?P<next_week>next week)"
+    r"|(?:(?P<modifier>next|this|coming|this coming)\s+)?(?P<weekday>"
+    + "|".join(sorted(WEEKDAY_NAMES, key=len, reverse=True)) +
+    r")\.?"
+    r")(?![\w-])"
+)
+
+TIME_PATTERN = re.compile(
+    r"(?<![\w:.])(?:"
+    r"(?P<hour12>1[0-2]|0?[1-9])(?::(?P<minute12>[0-5]\d))?\s*(?P<meridiem>[ap])\.?m\.?"
+    r"|(?P<hour24>[01]\d|2[0-3]):(?P<minute24>[0-5]\d)"
+    r"|(?P<noon>noon|midday)"
+    r")(?![\w:])"
+)
+
+
+def parse_date_spec(text_lower):
+    """
+    Date spec of the first date in `text_lower` the rules understand, or None:
+      ("days", n)          today + n days
+      ("weeks", 1)         next week
+      ("absolute", iso)    an ISO date
+      ("weekday", n)       the next weekday n (0 = Monday), today included
+      ("next_weekday", n)  "next <day>": the next weekday n after today
+    """
+    for m in DATE_PATTERN.finditer(text_lower):
+        if m.group("iso"):
+            try:
+                year, month, day = (int(part) for part in m.group("iso").split("-"))
+                return ("absolute", date(year, month, day).strftime("%Y-%m-%d"))
+            except ValueError:
+                continue  # 2030-02-31 and the like: not a date, keep looking
+        if m.group("relative"):
+            return ("days", _RELATIVE_DAYS[m.group("relative")])
+        if m.group("next_week"):
+            return ("weeks", 1)
+        weekday = WEEKDAY_NAMES[m.group("weekday")]
+        return ("next_weekday" if m.group("modifier") == "next" else "weekday", weekday)
+    return None
+
+
+def resolve_weekday(weekday, today, skip_today=False):
+    """The date of the next `weekday` on or after `today` (strictly after with skip_today)."""
+    ahead = (weekday - today.weekday()) % 7
+    if ahead == 0 and skip_today:
+        ahead = 7
+    return date.fromordinal(today.toordinal() + ahead)
+
+
+def parse_time(text_lower):
+    """The first time in `text_lower` as '3:30 PM', or None."""
+    m = TIME_PATTERN.search(text_lower)
+    if m is None:
+        return None
+    if m.group("noon"):
+        return "12:00 PM"
+    if m.group("meridiem"):
+        hour = int(m.group("hour12")) % 12 + (12 if m.group("meridiem") == "p" else 0)
+        minute = int(m.group("minute12") or 0)
+    else:
+        hour, minute = int(m.group("hour24")), int(m.group("minute24"))
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def strip_date_time(text_lower):
+    """`text_lower` without the dates and times the rules understand."""
+    return TIME_PATTERN.sub(" ", DATE_PATTERN.sub(" ", text_lower))
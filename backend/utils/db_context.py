@@ -0,0 +1,132 @@
+# db_context.py
+import time
+
+from flask import g, has_request_context, request
+
+from utils.sql_metrics import QueryStats, record_request
+
+
+class RequestConnection:
+    """
+    One pooled connection per HTTP request, stored on flask.g.
+
+    Auth helpers (verify_student, is_admin, ...) and the handler body all get
+    this same object from get_db_connection(). close() is a no-op here; the
+    connection goes back to the pool once, in request teardown.
+    Cursors are buffered so a helper that only fetchone()s cannot leave an
+    unread result behind for the next statement on the shared connection.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.round_trips = 0
+        self.dirty = False  # uncommitted writes pending
+        self.stats = QueryStats()
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault("buffered", True)
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self)
+
+    def commit(self):
+        self.round_trips += 1
+        self._conn.commit()
+        self.dirty = False
+
+    def rollback(self):
+        self.round_trips += 1
+        self._conn.rollback()
+        self.dirty = False
+
+    def close(self):
+        pass
+
+    def release(self):
+        """Really close: hand the connection back to the pool."""
+        self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class InstrumentedCursor:
+    """
+    Cursor proxy that records every statement on the owning RequestConnection:
+    round trips, time spent in the database and rows fetched.
+    """
+
+    def __init__(self, cursor, owner):
+        self._cursor = cursor
+        self._owner = owner
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        is_select = operation.lstrip()[:6].upper() == "SELECT"
+        if not is_select:
+            self._owner.dirty = True
+        return self._timed(self._cursor.execute, operation, params, is_select, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._owner.dirty = True
+        return self._timed(self._cursor.executemany, operation, seq_params, False, *args, **kwargs)
+
+    def _timed(self, run, operation, params, is_select, *args, **kwargs):
+        self._owner.round_trips += 1
+        started = time.perf_counter()
+        try:
+            return run(operation, params, *args, **kwargs)
+        finally:
+            # buffered cursors have fetched the whole result set by now
+            rows = max(self._cursor.rowcount, 0) if is_select else 0
+            self._owner.stats.record(operation, time.perf_counter() - started, rows)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def init_request_db(app, connect):
+    """
+    Install per-request connection handling on the app and return the
+    get_db_connection callable handed to every register_routes().
+
+    • inside a request: lazily opens one connection, reused for the whole request
+    • outside a request (scripts, workers): plain pooled connection from connect()
+    • teardown: commits pending writes if the request succeeded (no exception,
+      status < 400), otherwise rolls back, then returns the connection to the pool
+    • every response carries X-DB-Round-Trips with the statement count, and the
+      request's statements are folded into the per-route SQL metrics
+    """
+
+    def get_db_connection():
+        if not has_request_context():
+            return connect()
+        if "db" not in g:
+            g.db = RequestConnection(connect())
+        return g.db
+
+    @app.after_request
+    def _report_round_trips(response):
+        db = g.get("db")
+        g.db_response_status = response.status_code
+        response.headers["X-DB-Round-Trips"] = str(db.round_trips if db else 0)
+        return response
+
+    @app.teardown_request
+    def _release_request_db(exc):
+        db = g.pop("db", None)
+        if db is None:
+            return
+        record_request(request.endpoint or request.path, db.stats)
+        try:
+            if db.dirty:
+                if exc is None and g.get("db_response_status", 500) < 400:
+                    db.commit()
+                else:
+                    db.rollback()
+        except Exception as e:
+            print(f"Error finishing request transaction: {e}")
+        finally:
+            db.release()
+
+    return get_db_connection
@@ -0,0 +1,87 @@
+# db_pool.py
+import threading
+
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+
+
+class PoolTimeoutError(PoolError):
+    """Raised when no pooled connection frees up within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Thin layer over mysql-connector's MySQLConnectionPool.
+
+    • pool_size        – number of connections kept open (mysql-connector caps this at 32)
+    • checkout_timeout – seconds a caller waits for a free connection before PoolTimeoutError
+    • reset_session    – reset session state (variables, temp tables, open transaction)
+                         when a connection goes back to the pool
+
+    The underlying pool pings every connection on checkout and reconnects it
+    if the server dropped it, so callers always receive a live connection.
+    The pool itself is created lazily on first checkout, so importing the app
+    does not require a reachable database.
+    """
+
+    def __init__(self, db_config, pool_size=10, checkout_timeout=5.0,
+                 reset_session=True, pool_name="therapy_clinic"):
+        self.db_config = dict(db_config)
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.reset_session = reset_session
+        self.pool_name = pool_name
+        self._pool = None
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=self.pool_name,
+                        pool_size=self.pool_size,
+                        pool_reset_session=self.reset_session,
+                        **self.db_config
+                    )
+        return self._pool
+
+    def get_connection(self):
+        """
+        Check a connection out of the pool, waiting up to checkout_timeout seconds.
+        Calling close() on the returned connection hands it back to the pool.
+        """
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolTimeoutError(
+                f"No database connection available after {self.checkout_timeout}s "
+                f"(pool_size={self.pool_size})"
+            )
+        try:
+            conn = self._get_pool().get_connection()
+        except Exception:
+            self._slots.release()
+            raise
+        return _PooledConnection(conn, self._slots.release)
+
+
+class _PooledConnection:
+    """Proxy that releases the checkout slot exactly once when the connection is closed."""
+
+    def __init__(self, conn, release):
+        self._conn = conn
+        self._release = release
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            conn.close()  # resets the session and returns it to the pool
+        finally:
+            self._release()
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise PoolError("Connection has already been returned to the pool")
+        return getattr(self._conn, name)
@@ -0,0 +1,57 @@
+# email_templates.py
+import os
+import threading
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "email")
+PARTS = ("subject", "html", "txt")
+
+
+class EmailTemplates:
+    """
+    Jinja templates for outgoing e-mail, compiled once when the module is imported.
+
+    Each message has three parts: <name>.subject, <name>.html and <name>.txt.
+    For appointment mail the name is looked up by status and recipient role,
+    most specific first:
+
+        appointment_<status>_<role>  →  appointment_<status>  →  appointment_<role>  →  appointment
+
+    Every part falls back on its own, so an override may supply only a subject.
+    """
+
+    def __init__(self, directory=TEMPLATE_DIR):
+        self.env = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=select_autoescape(enabled_extensions=("html",), default_for_string=False),
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        self.templates = {name: self.env.get_template(name) for name in self.env.list_templates()}
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, kind, status=None, role=None):
+        """Template names for each part, e.g. ('appointment.subject', 'appointment_cancelled.html', ...)."""
+        key = (kind, status, role)
+        names = self._resolved.get(key)
+        if names is None:
+            candidates = [f"{kind}_{status}_{role}", f"{kind}_{status}", f"{kind}_{role}", kind]
+            names = tuple(
+                next((f"{c}.{part}" for c in candidates if f"{c}.{part}" in self.templates), None)
+                for part in PARTS
+            )
+            if names[0] is None or names[1] is None:
+                raise LookupError(f"No {kind} e-mail template in {TEMPLATE_DIR}")
+            with self._lock:
+                self._resolved[key] = names
+        return names
+
+    def render(self, names, **context):
+        """Render resolved parts -> (subject, html, text); text is None if no .txt template exists."""
+        subject, html, text = (self.templates[n].render(**context) if n else None for n in names)
+        return " ".join(subject.split()), html, text
+
+
+email_templates = EmailTemplates()
@@ -1,8 +1,71 @@
 # emailer.py  (or utils/emailer.py)
+import smtplib
+from contextlib import ExitStack
+
 from flask_mail import Message
 from flask import current_app as app
 
-def send_appt_email(mail, to_email, status, appt):
+from utils.email_templates import email_templates
+
+class MailBatch:
+    """
+    Send many messages over one SMTP session instead of one session per
+    mail.send() (connect + STARTTLS + login each time).
+    • reconnects once and retries if the server drops the connection
+    • starts a fresh session after max_per_connection messages; left as None,
+      Flask-Mail already does this itself every MAIL_MAX_EMAILS messages
+
+        with MailBatch(mail) as batch:
+            batch.send(msg1)
+            batch.send(msg2)
+    """
+
+    def __init__(self, mail, max_per_connection=None):
+        self.mail = mail
+        self.max_per_connection = max_per_connection
+        self.connections = 0
+        self.sent = 0
+        self._stack = None
+        self._conn = None
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _connect(self):
+        self._stack = ExitStack()
+        self._conn = self._stack.enter_context(self.mail.connect())
+        self._count = 0
+        self.connections += 1
+
+    def close(self):
+        if self._stack is not None:
+            try:
+                self._stack.close()   # QUIT; the server may already be gone
+            except (smtplib.SMTPException, OSError) as e:
+                print(f"SMTP close error (ignored): {e}")
+        self._stack = self._conn = None
+
+    def send(self, message):
+        if self._conn is not None and self.max_per_connection and self._count >= self.max_per_connection:
+            self.close()
+        if self._conn is None:
+            self._connect()
+        try:
+            self._conn.send(message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+            print(f"SMTP connection lost ({e}), reconnecting")
+            self._stack = None    # nothing left to QUIT
+            self._conn = None
+            self._connect()
+            self._conn.send(message)
+        self._count += 1
+        self.sent += 1
+
+def render_appt_email(status, appt, role=None, names=None):
     """
     appt = {
         'child': 'John Doe',
@@ -12,24 +75,29 @@ def send_appt_email(mail, to_email, status, appt):
         'meeting_link': 'https://therapy-clinic.com/meeting/abc123'  # Optional
     }
     status = 'booked' | 'rescheduled' | 'cancelled' | 'updated' | 'link_updated'
+    Returns (subject, html, text) from templates/email (see utils/email_templates.py).
     """
-    subj = f"Appointment {status.capitalize()} – {appt['child']}"
-    html = f"""
-    <h2>Appointment {status.capitalize()}</h2>
-    <p>Appointment for <b>{appt['child']}</b> has been {status}.</p>
-    <ul>
-      <li><b>Therapist:</b> {appt['therapist']}</li>
-      <li><b>Date & Time:</b> {appt['time']}</li>
-      <li><b>Type:</b> {appt['type']}</li>
-    """
-    if appt.get('meeting_link') and appt['type'] == 'Online':
-        html += f"""
-      <li><b>Meeting Link:</b> <a href="{appt['meeting_link']}">{appt['meeting_link']}</a></li>
-        """
-    html += "</ul>"
-    print(f"Attempting to send email to {to_email} with subject: {subj}")
+    if names is None:
+        names = email_templates.resolve("appointment", status, role)
+    return email_templates.render(names, status=status, status_label=status.capitalize(), **appt)
+
+def build_appt_message(to_email, status, appt, role=None, rendered=None):
+    """Message for one recipient; pass `rendered` to reuse a body already rendered for another one."""
+    subj, html, text = rendered or render_appt_email(status, appt, role)
+    return Message(subject=subj, recipients=[to_email], html=html, body=text)
+
+def send_appt_email(mail, to_email, status, appt, batch=None, role=None, rendered=None):
+    """
+    Send one appointment e-mail (see render_appt_email for `appt`).
+    Pass `batch` to reuse an open MailBatch session.
+    """
+    msg = build_appt_message(to_email, status, appt, role, rendered)
+    print(f"Attempting to send email to {to_email} with subject: {msg.subject}")
     try:
-        mail.send(Message(subject=subj, recipients=[to_email], html=html))
+        if batch is not None:
+            batch.send(msg)
+        else:
+            mail.send(msg)
         app.logger.info("E-mail sent to %s (%s)", to_email, status)
         print(f"Email sent successfully to {to_email} for status {status}")
     except Exception as e:
@@ -37,208 +105,131 @@ def send_appt_email(mail, to_email, status, appt):
         print(f"SMTP error sending email to {to_email}: {str(e)}")
         raise
 
-def notify_parent_for_appt(cursor, mail, appointment_id, status):
+RECIPIENT_ROLES = ("student", "parent", "therapist")
+
+def fetch_appt_recipients(cursor, appointment_id):
     """
-    Send email to the parent (if linked via GUARDIAN) for the appointment.
-    • status = 'booked' | 'cancelled' | 'rescheduled' | 'updated' | 'link_updated'
+    Resolve every recipient address and the appointment details in one query.
+    Returns (details, {role: email}) or (None, {}) if the appointment is gone.
+    A student may have several guardians; the first one found is notified.
     """
-    print(f"Notify parent for appointment_id={appointment_id}, status={status}")
-    cursor.execute("""
-        SELECT p.USER_ID, u.username AS parent_email
-        FROM APPOINTMENTS a
-        JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
-        JOIN GUARDIAN g ON s.STUDENT_ID = g.STUDENT_ID
-        JOIN PARENT p ON g.PARENT_ID = p.PARENT_ID
-        JOIN USERS u ON p.USER_ID = u.USER_ID
-        WHERE a.Appointment_ID = %s
-    """, (appointment_id,))
-    rec = cursor.fetchone()
-    print(f"Parent query result: {rec}")
-    if not rec:
-        print(f"No parent found for appointment_id={appointment_id}")
-        return
-    parent_email = rec["parent_email"]
-    if not parent_email:
-        print(f"No valid parent email found for appointment_id={appointment_id}")
-        return
-
     cursor.execute("""
         SELECT CONCAT(s.FirstName,' ',s.LastName) AS child,
                CONCAT(t.FirstName,' ',t.LastName) AS therapist,
                a.Appointment_time AS atime,
                a.Appointment_type AS atype,
-               a.Meeting_link AS meeting_link
+               a.Meeting_link AS meeting_link,
+               su.username AS student_email,
+               tu.username AS therapist_email,
+               pu.username AS parent_email
         FROM APPOINTMENTS a
         JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
         JOIN AVAILABILITY v ON a.AVAILABILITY_ID = v.ID
         JOIN THERAPIST t ON v.THERAPIST_ID = t.THERAPIST_ID
+        LEFT JOIN USERS su ON s.USER_ID = su.USER_ID
+        LEFT JOIN USERS tu ON t.USER_ID = tu.USER_ID
+        LEFT JOIN GUARDIAN g ON s.STUDENT_ID = g.STUDENT_ID
+        LEFT JOIN PARENT p ON g.PARENT_ID = p.PARENT_ID
+        LEFT JOIN USERS pu ON p.USER_ID = pu.USER_ID
         WHERE a.Appointment_ID = %s
     """, (appointment_id,))
-    info = cursor.fetchone()
-    print(f"Appointment details query result: {info}")
-    if not info:
+    rows = cursor.fetchall()
+    if not rows:
+        return None, {}
+    info = rows[0]
+    parent_email = next((r["parent_email"] for r in rows if r["parent_email"]), None)
+    emails = {
+        "student": info["student_email"],
+        "parent": parent_email,
+        "therapist": info["therapist_email"],
+    }
+    details = {
+        "child": info["child"],
+        "therapist": info["therapist"],
+        "time": info["atime"].strftime("%Y-%m-%d %I:%M %p"),
+        "type": "Online" if info["atype"] == "virtual" else "In-Person",
+        "meeting_link": info["meeting_link"]
+    }
+    return details, {role: email for role, email in emails.items() if email}
+
+def notify_appt_recipients(cursor, mail, appointment_id, status, roles=RECIPIENT_ROLES, batch=None):
+    """
+    Send the appointment e-mail to each of `roles` that has an address.
+    • status = 'booked' | 'cancelled' | 'rescheduled' | 'updated' | 'link_updated'
+    Returns {role: exception} for the sends that failed; roles without a
+    recipient are skipped, as the single-recipient helpers always did.
+    All messages go over `batch`, or over one new SMTP session if none is given.
+    """
+    print(f"Notify {', '.join(roles)} for appointment_id={appointment_id}, status={status}")
+    details, emails = fetch_appt_recipients(cursor, appointment_id)
+    if not details:
         print(f"No appointment details found for appointment_id={appointment_id}")
-        return
+        return {}
+    return send_appt_emails(mail, appointment_id, status, details, emails, roles, batch)
 
-    try:
-        send_appt_email(
-            mail,
-            parent_email,
-            status,
-            {
-                "child": info["child"],
-                "therapist": info["therapist"],
-                "time": info["atime"].strftime("%Y-%m-%d %I:%M %p"),
-                "type": "Online" if info["atype"] == "virtual" else "In-Person",
-                "meeting_link": info["meeting_link"]
-            }
-        )
-    except Exception as e:
-        print(f"Failed to send parent email for appointment_id={appointment_id}: {str(e)}")
-        raise
+def send_appt_emails(mail, appointment_id, status, details, emails, roles=RECIPIENT_ROLES, batch=None):
+    """
+    notify_appt_recipients() for details and addresses already in hand, such as
+    the snapshot an outbox row was queued with. Returns {role: exception}.
+    """
+    failures = {}
+    rendered = {}   # recipients whose role resolves to the same templates share one render
+    with ExitStack() as stack:
+        if batch is None:
+            batch = stack.enter_context(MailBatch(mail))
+        for role in roles:
+            to_email = emails.get(role)
+            if not to_email:
+                print(f"No valid {role} email found for appointment_id={appointment_id}")
+                continue
+            try:
+                names = email_templates.resolve("appointment", status, role)
+                if names not in rendered:
+                    rendered[names] = render_appt_email(status, details, role, names)
+                send_appt_email(mail, to_email, status, details, batch, role, rendered[names])
+            except Exception as e:
+                print(f"Failed to send {role} email for appointment_id={appointment_id}: {str(e)}")
+                failures[role] = e
+    return failures
+
+def _notify_one(cursor, mail, appointment_id, status, role):
+    failures = notify_appt_recipients(cursor, mail, appointment_id, status, (role,))
+    if role in failures:
+        raise failures[role]
+
+def notify_parent_for_appt(cursor, mail, appointment_id, status):
+    """
+    Send email to the parent (if linked via GUARDIAN) for the appointment.
+    • status = 'booked' | 'cancelled' | 'rescheduled' | 'updated' | 'link_updated'
+    """
+    _notify_one(cursor, mail, appointment_id, status, "parent")
 
 def notify_student_for_appt(cursor, mail, appointment_id, status):
     """
     Send email to the student for the appointment.
     • status = 'booked' | 'cancelled' | 'rescheduled' | 'updated' | 'link_updated'
     """
-    print(f"START: Notify student for appointment_id={appointment_id}, status={status}")
-    cursor.execute("""
-        SELECT a.STUDENT_ID, s.USER_ID, u.username AS student_email
-        FROM APPOINTMENTS a
-        JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
-        LEFT JOIN USERS u ON s.USER_ID = u.USER_ID
-        WHERE a.Appointment_ID = %s
-    """, (appointment_id,))
-    rec = cursor.fetchone()
-    print(f"Student query result: {rec}")
-    if not rec:
-        print(f"END: No student record found for appointment_id={appointment_id}")
-        return
-    if not rec["USER_ID"]:
-        print(f"END: No USER_ID for student_id={rec['STUDENT_ID']} for appointment_id={appointment_id}")
-        return
-    if not rec["student_email"]:
-        print(f"END: No valid student email found for student_id={rec['STUDENT_ID']}, user_id={rec['USER_ID']} for appointment_id={appointment_id}")
-        return
-    student_email = rec["student_email"]
-
-    cursor.execute("""
-        SELECT CONCAT(s.FirstName,' ',s.LastName) AS child,
-               CONCAT(t.FirstName,' ',t.LastName) AS therapist,
-               a.Appointment_time AS atime,
-               a.Appointment_type AS atype,
-               a.Meeting_link AS meeting_link
-        FROM APPOINTMENTS a
-        JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
-        JOIN AVAILABILITY v ON a.AVAILABILITY_ID = v.ID
-        JOIN THERAPIST t ON v.THERAPIST_ID = t.THERAPIST_ID
-        WHERE a.Appointment_ID = %s
-    """, (appointment_id,))
-    info = cursor.fetchone()
-    print(f"Appointment details query result: {info}")
-    if not info:
-        print(f"END: No appointment details found for appointment_id={appointment_id}")
-        return
-
-    try:
-        send_appt_email(
-            mail,
-            student_email,
-            status,
-            {
-                "child": info["child"],
-                "therapist": info["therapist"],
-                "time": info["atime"].strftime("%Y-%m-%d %I:%M %p"),
-                "type": "Online" if info["atype"] == "virtual" else "In-Person",
-                "meeting_link": info["meeting_link"]
-            }
-        )
-        print(f"END: Successfully notified student for appointment_id={appointment_id}")
-    except Exception as e:
-        print(f"END: Failed to send student email for appointment_id={appointment_id}: {str(e)}")
-        raise
+    _notify_one(cursor, mail, appointment_id, status, "student")
 
 def notify_therapist_for_appt(cursor, mail, appointment_id, status):
     """
     Send email to the therapist for the appointment.
     • status = 'booked' | 'cancelled' | 'rescheduled' | 'updated' | 'link_updated'
     """
-    print(f"START: Notify therapist for appointment_id={appointment_id}, status={status}")
-    cursor.execute("""
-        SELECT t.THERAPIST_ID, u.username AS therapist_email
-        FROM APPOINTMENTS a
-        JOIN AVAILABILITY v ON a.AVAILABILITY_ID = v.ID
-        JOIN THERAPIST t ON v.THERAPIST_ID = t.THERAPIST_ID
-        JOIN USERS u ON t.USER_ID = u.USER_ID
-        WHERE a.Appointment_ID = %s
-    """, (appointment_id,))
-    rec = cursor.fetchone()
-    print(f"Therapist query result: {rec}")
-    if not rec:
-        print(f"END: No therapist record found for appointment_id={appointment_id}")
-        return
-    if not rec["therapist_email"]:
-        print(f"END: No valid therapist email found for therapist_id={rec['THERAPIST_ID']} for appointment_id={appointment_id}")
-        return
-    therapist_email = rec["therapist_email"]
-
-    cursor.execute("""
-        SELECT CONCAT(s.FirstName,' ',s.LastName) AS child,
-               CONCAT(t.FirstName,' ',t.LastName) AS therapist,
-               a.Appointment_time AS atime,
-               a.Appointment_type AS atype,
-               a.Meeting_link AS meeting_link
-        FROM APPOINTMENTS a
-        JOIN STUDENT s ON a.STUDENT_ID = s.STUDENT_ID
-        JOIN AVAILABILITY v ON a.AVAILABILITY_ID = v.ID
-        JOIN THERAPIST t ON v.THERAPIST_ID = t.THERAPIST_ID
-        WHERE a.Appointment_ID = %s
-    """, (appointment_id,))
-    info = cursor.fetchone()
-    print(f"Appointment details query result: {info}")
-    if not info:
-        print(f"END: No appointment details found for appointment_id={appointment_id}")
-        return
-
-    try:
-        send_appt_email(
-            mail,
-            therapist_email,
-            status,
-            {
-                "child": info["child"],
-                "therapist": info["therapist"],
-                "time": info["atime"].strftime("%Y-%m-%d %I:%M %p"),
-                "type": "Online" if info["atype"] == "virtual" else "In-Person",
-                "meeting_link": info["meeting_link"]
-            }
-        )
-        print(f"END: Successfully notified therapist for appointment_id={appointment_id}")
-    except Exception as e:
-        print(f"END: Failed to send therapist email for appointment_id={appointment_id}: {str(e)}")
-        raise
+    _notify_one(cursor, mail, appointment_id, status, "therapist")
 
 def send_reset_code_email(mail, to_email, reset_code):
     """
     Send a password reset code to the specified email.
     reset_code: 6-digit code (string)
     """
-    subj = "Password Reset Code"
-    html = f"""
-    <h2>Password Reset</h2>
-    <p>You requested a password reset for your account.</p>
-    <p>Your reset code is: <b>{reset_code}</b></p>
-    <p>Enter this code on the reset password page to set a new password. It expires in 5 minutes.</p>
-    <p>If you didn't request this, please ignore this email.</p>
-    <p>Regards,<br>YourApp Team</p>
-    """
+    subj, html, text = email_templates.render(email_templates.resolve("reset_code"), reset_code=reset_code)
     print(f"Attempting to send reset code email to {to_email}")
     try:
-        mail.send(Message(subject=subj, recipients=[to_email], html=html))
+        mail.send(Message(subject=subj, recipients=[to_email], html=html, body=text))
         app.logger.info("Reset code email sent to %s", to_email)
         print(f"Reset code email sent successfully to {to_email}")
     except Exception as e:
         app.logger.exception("SMTP error: %s", e)
         print(f"SMTP error sending reset code email to {to_email}: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,381 @@
+# nlu.py
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, date
+
+from dateutil.parser import parse as parse_date
+from dateutil.relativedelta import relativedelta
+
+from utils.date_time_parser import WEEKDAY_NAMES, parse_date_spec, parse_time, resolve_weekday, strip_date_time
+
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+
+# Only doc.ents is read, so everything but NER is left out of the pipeline.
+# The small English models give NER its own embedding layer, so the shared
+# tok2vec (used by tagger/parser) can go too.
+EXCLUDED_PIPES = ["tok2vec", "tagger", "parser", "senter", "attribute_ruler", "lemmatizer"]
+
+# NER in this many worker processes instead of request threads (0: in-process);
+# see utils/nlu_pool.py
+NLU_WORKERS = int(os.getenv("NLU_WORKERS", 0))
+NLU_BATCH_SIZE = int(os.getenv("NLU_BATCH_SIZE", 16))
+NLU_BATCH_WINDOW_MS = float(os.getenv("NLU_BATCH_WINDOW_MS", 5))
+NLU_TIMEOUT = float(os.getenv("NLU_TIMEOUT", 2))
+
+_nlp = None
+_nlp_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_nlp():
+    """
+    The spaCy pipeline, loaded on first use rather than at import, so processes
+    that never serve chat (admin workers, scripts, the outbox worker) skip the
+    multi-second, several-hundred-MB model load.
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+                print(f"Loading spaCy model {SPACY_MODEL} (excluding {', '.join(EXCLUDED_PIPES)})")
+                _nlp = spacy.load(SPACY_MODEL, exclude=EXCLUDED_PIPES)
+    return _nlp
+
+
+def warm_up_nlp():
+    """Load the model (in every worker, with a pool) so the first chat request pays nothing."""
+    pool = get_worker_pool()
+    if pool is not None:
+        pool.warm_up()
+        return
+    get_nlp()("book with dr smith tomorrow at 10am")
+
+
+def get_worker_pool():
+    """The NLU worker pool, started on first use; None when NLU_WORKERS is 0."""
+    global _pool
+    if _pool is None and NLU_WORKERS > 0:
+        with _pool_lock:
+            if _pool is None:
+                from utils.nlu_pool import NLUWorkerPool
+                print(f"Starting {NLU_WORKERS} NLU worker process(es)")
+                _pool = NLUWorkerPool(NLU_WORKERS, NLU_BATCH_SIZE, NLU_BATCH_WINDOW_MS / 1000, NLU_TIMEOUT)
+    return _pool
+
+
+def worker_pool_stats():
+    return _pool.stats() if _pool is not None else None
+
+
+def shutdown_worker_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def extract_entities(text):
+    """Named entities of `text` as (text, label) tuples."""
+    return [(ent.text, ent.label_) for ent in get_nlp()(text).ents]
+
+
+# Intent keywords, highest priority first. Each keyword must start a word
+# ("reschedule" no longer matches "schedule"); greetings must also end one
+# ("hi" does not match "this").
+INTENT_KEYWORDS = [
+    ("schedule", ["book", "schedule", "make an appointment"]),
+    ("reschedule", ["reschedule", "change", "modify"]),
+    ("cancel", ["cancel", "delete", "remove"]),
+    ("view_appointments", ["view appointments", "show appointments", "see appointments", "list appointments"]),
+    ("show_therapists", ["show therapists", "list therapists", "available therapists", "therapist availability"]),
+    ("greet", ["hello", "hi", "hey", "greetings"]),
+]
+_WHOLE_WORD_INTENTS = {"greet"}
+
+INTENT_PATTERN = re.compile("|".join(
+    rf"\b(?P<i{rank}>{'|'.join(re.escape(k) for k in keywords)})" + (r"\b" if intent in _WHOLE_WORD_INTENTS else "")
+    for rank, (intent, keywords) in enumerate(INTENT_KEYWORDS)
+))
+
+# Utterances made only of these words (or bare numbers, i.e. list picks),
+# once the dates and times utils.date_time_parser understands are taken out,
+# cannot contain a PERSON, DATE or TIME, so the spaCy pipeline is skipped.
+COMMAND_VOCABULARY = {
+    word for _, keywords in INTENT_KEYWORDS for k in keywords for word in k.split()
+} | {
+    "a", "an", "the", "my", "me", "i", "i'd", "i'm", "to", "please", "can", "could", "you", "want",
+    "would", "like", "need", "let's", "lets", "and", "or", "all", "of", "for", "your", "what", "are",
+    "is", "it", "this", "that", "there", "any", "some", "do", "have", "yes", "no", "ok", "okay", "thanks", "thank",
+    "appointment", "appointments", "therapist", "therapists", "session", "sessions", "booking",
+    "show", "list", "see", "view", "available", "availability", "upcoming", "new", "help", "more", "next",
+    "virtual", "online", "video", "remote", "in", "person", "at", "on",
+}
+_TOKEN = re.compile(r"[\w']+")
+
+# Appointment type words; matched with a regex, so they never need spaCy
+APPOINTMENT_TYPE_PATTERN = re.compile(
+    r"\b(?:(?P<virtual>virtual|online|video|remote|zoom)|(?P<in_person>in[ _-]person|face to face|at the office))\b"
+)
+_TITLE = re.compile(r"^(?:dr|doctor|mr|mrs|ms|miss|prof)\b\.?\s*")
+# Words that end a therapist name ("with dr lee tomorrow") or a reason ("for anxiety on friday")
+_SLOT_STOP_WORDS = {
+    "tomorrow", "today", "tonight", "at", "on", "for", "next", "this", "via", "in", "with",
+    "virtual", "online", "video", "remote", "zoom", "in-person", "in_person",
+} | set(WEEKDAY_NAMES)
+_FILLER_REASONS = {"a", "an", "the", "my", "me", "session", "appointment", "a session", "an appointment", "me please", "please"}
+_TIME_LIKE = re.compile(r"^\d{1,2}(?::\d{2})?\s*(?:am|pm)?$")
+
+
+def detect_intent(text_lower):
+    """Highest-priority intent whose keyword occurs in the (lower-cased) text, in one regex pass."""
+    best = None
+    for m in INTENT_PATTERN.finditer(text_lower):
+        rank = int(m.lastgroup[1:])
+        if best is None or rank < best:
+            best = rank
+    return INTENT_KEYWORDS[best][0] if best is not None else None
+
+
+def needs_ner(text_lower):
+    """False when every token outside the rule-parsed dates and times is command vocabulary or a bare number."""
+    return any(tok not in COMMAND_VOCABULARY and not tok.isdigit()
+               for tok in _TOKEN.findall(strip_date_time(text_lower)))
+
+
+class NLUCache:
+    """
+    Bounded LRU of analysed utterances with hit/miss counters.
+    Values must not depend on the current date (see date specs below).
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+nlu_cache = NLUCache(int(os.getenv("NLU_CACHE_SIZE", 2048)))
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_utterance(text):
+    return _SPACES.sub(" ", text.lower()).strip()
+
+
+# Dates are cached as specs and resolved against today on every lookup, so a
+# cached "tomorrow" is still right after midnight:
+#   ("days", n)      today + n days
+#   ("weeks", n)     today + n weeks
+#   ("absolute", d)  an ISO date that does not depend on today
+#   ("weekday", n), ("next_weekday", n)   see utils.date_time_parser
+#   ("parse", text)  relative to today in some other way: re-parsed
+def date_spec(ent_text):
+    """Spec of a spaCy DATE entity the rule-based parser did not understand."""
+    if "tomorrow" in ent_text:
+        return ("days", 1)
+    if "today" in ent_text:
+        return ("days", 0)
+    if "next week" in ent_text:
+        return ("weeks", 1)
+    # parse against two different defaults: equal results mean the text fixes the date itself
+    first = parse_date(ent_text, fuzzy=True, default=datetime(2001, 1, 1))
+    second = parse_date(ent_text, fuzzy=True, default=datetime(2002, 2, 2))
+    if first.date() == second.date():
+        return ("absolute", first.strftime("%Y-%m-%d"))
+    return ("parse", ent_text)
+
+
+def resolve_date(spec, today=None):
+    if spec is None:
+        return None
+    today = today or date.today()
+    kind, value = spec
+    if kind == "days":
+        return (today + timedelta(days=value)).strftime("%Y-%m-%d")
+    if kind == "weeks":
+        return (today + relativedelta(weeks=value)).strftime("%Y-%m-%d")
+    if kind == "absolute":
+        return value
+    if kind in ("weekday", "next_weekday"):
+        return resolve_weekday(value, today, skip_today=kind == "next_weekday").strftime("%Y-%m-%d")
+    return parse_date(value, fuzzy=True, default=datetime.combine(today, datetime.min.time())).strftime("%Y-%m-%d")
+
+
+def time_from_entity(ent_text):
+    """'3:00 PM' from a spaCy TIME entity the rule-based parser did not understand, else None."""
+    time_str = ent_text.replace(" ", "").replace(".", "")
+    for fmt in ("%I:%M%p", "%I%p"):
+        try:
+            return datetime.strptime(time_str, fmt).strftime("%I:%M %p").lstrip("0")
+        except ValueError:
+            pass
+    return None
+
+
+def analyze(text_lower, ents=None):
+    """
+    Intent and entities of a normalized utterance; the date is left as a spec.
+    `ents` are the utterance's (text, label) entities when already known.
+    """
+    if ents is None:
+        ents = extract_entities(text_lower) if needs_ner(text_lower) else []
+
+    intent = detect_intent(text_lower)
+    therapist = None
+
+    # Extract therapist name (robust matching)
+    words = text_lower.split()
+    therapist_start = None
+    for i, word in enumerate(words):
+        if word == "with" and i + 1 < len(words):
+            therapist_start = i + 1
+            break
+
+    if therapist_start is not None:
+        # Extract everything after "with" until a date, time, type or reason word
+        remaining_words = words[therapist_start:]
+        therapist_name_parts = []
+        for word in remaining_words:
+            if word.strip(",.") in _SLOT_STOP_WORDS:
+                break
+            therapist_name_parts.append(word)
+        therapist_name = _TITLE.sub("", " ".join(therapist_name_parts).strip(" ,."))
+        if therapist_name:
+            therapist = therapist_name
+
+    # Fallback to spaCy's PERSON entity if no "with" is found
+    if not therapist:
+        for ent_text, label in ents:
+            if label == "PERSON":
+                therapist = _TITLE.sub("", ent_text)
+                break
+
+    # Dates and times: the rule-based parser first, spaCy's entities for anything it missed
+    date_value = parse_date_spec(text_lower)
+    if date_value is None:
+        for ent_text, label in ents:
+            if label == "DATE":
+                try:
+                    date_value = date_spec(ent_text)
+                except (ValueError, OverflowError):
+                    pass
+
+    time_value = parse_time(text_lower)
+    if time_value is None:
+        for ent_text, label in ents:
+            if label == "TIME":
+                time_value = time_from_entity(ent_text) or time_value
+
+    return intent, therapist, date_value, time_value, appointment_type(text_lower), extract_reason(words)
+
+
+def appointment_type(text_lower):
+    """'virtual' or 'in_person' when the utterance says which, else None."""
+    m = APPOINTMENT_TYPE_PATTERN.search(text_lower)
+    if m is None:
+        return None
+    return "virtual" if m.group("virtual") else "in_person"
+
+
+def extract_reason(words):
+    """
+    The reason in "... for anxiety", up to the next date, time, type or name
+    word. None when "for" only introduces a date, time or filler ("for a session").
+    """
+    for i, word in enumerate(words):
+        if word != "for":
+            continue
+        parts = []
+        for following in words[i + 1:]:
+            if following.strip(",.") in _SLOT_STOP_WORDS:
+                break
+            parts.append(following)
+        reason = " ".join(parts).strip(" ,.")
+        if reason and reason not in _FILLER_REASONS and not _TIME_LIKE.match(reason):
+            return reason
+    return None
+
+
+def _analyze_uncached(text_lower):
+    """
+    analyze() in the worker pool when one is configured and NER is needed.
+    Returns (result, complete); on a pool timeout or failure the rule-based
+    analysis without NER is returned as incomplete, so it is not cached.
+    """
+    pool = get_worker_pool()
+    if pool is None or not needs_ner(text_lower):
+        return analyze(text_lower), True
+    try:
+        return pool.analyze(text_lower), True
+    except Exception as e:
+        print(f"NLU worker unavailable ({type(e).__name__}: {e}); continuing without NER")
+        return analyze(text_lower, ents=[]), False
+
+
+def extract_intent_and_entities(text):
+    key = normalize_utterance(text)
+    result = nlu_cache.get(key)
+    if result is None:
+        result, complete = _analyze_uncached(key)
+        if complete:
+            nlu_cache.put(key, result)
+    intent, therapist, spec, time_value, appt_type, reason = result
+
+    try:
+        resolved_date = resolve_date(spec)
+    except (ValueError, OverflowError):
+        resolved_date = None
+    entities = {
+        "therapist": therapist,
+        "date": resolved_date,
+        "time": time_value,
+        "appointment_type": appt_type,
+        "reason": reason
+    }
+
+    # Debug: Log the extracted intent and entities
+    print(f"NLU Debug - Input: {text}, Intent: {intent}, Entities: {entities}")
+
+    return intent, entities
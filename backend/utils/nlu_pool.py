@@ -0,0 +1,156 @@
+# nlu_pool.py
+"""
+spaCy analysis in worker processes.
+
+NER and fuzzy date parsing are CPU-bound and hold the GIL, so in the threaded
+Flask server a burst of chat messages used to stall every other endpoint.
+With NLU_WORKERS > 0 the model is loaded once per worker process instead and
+utils.nlu sends utterances that need NER here:
+
+  • callers enqueue their utterance and wait on a Future, at most `timeout`
+    seconds (utils.nlu falls back to the rule-based analysis without NER)
+  • a batcher thread gathers what arrives within `batch_window` seconds (up to
+    `batch_size` utterances) and ships it as one task, so messages from
+    concurrent sessions go through a single nlp.pipe() call
+"""
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import nlu
+
+
+def _init_worker():
+    nlu.NLU_WORKERS = 0   # a worker analyses in-process; it must not start a pool of its own
+    nlu.warm_up_nlp()
+
+
+def _analyze_batch(texts):
+    """Worker side: one nlp.pipe() pass over the batch, then the rule-based rest of analyze()."""
+    docs = nlu.get_nlp().pipe(texts)
+    return [nlu.analyze(text, [(ent.text, ent.label_) for ent in doc.ents]) for text, doc in zip(texts, docs)]
+
+
+class NLUWorkerPool:
+    def __init__(self, workers, batch_size=16, batch_window=0.005, timeout=2.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self._executor = self._new_executor()
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.messages = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._batcher = threading.Thread(target=self._collect, name="nlu-batcher", daemon=True)
+        self._batcher.start()
+
+    def _new_executor(self):
+        # spawn, not fork: forking a multi-threaded server process is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def analyze(self, text_lower):
+        """analyze() result from a worker; raises on timeout or worker failure."""
+        future = Future()
+        self._pending.put((text_lower, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:   # not the builtin TimeoutError before Python 3.11
+            with self._lock:
+                self.timeouts += 1
+            raise
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def warm_up(self):
+        """Start every worker and wait until each has loaded the model."""
+        tasks = [self._executor.submit(_analyze_batch, ["hello"]) for _ in range(self.workers)]
+        for task in tasks:
+            task.result()
+
+    # ── batching ─────────────────────────────────────────────
+
+    def _collect(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._submit(batch)
+
+    def _submit(self, batch):
+        with self._lock:
+            self.batches += 1
+            self.messages += len(batch)
+        executor = self._executor
+        try:
+            task = executor.submit(_analyze_batch, [text for text, _ in batch])
+        except Exception as e:
+            self._fail(batch, e, executor)
+            return
+        task.add_done_callback(lambda done: self._deliver(batch, done, executor))
+
+    def _deliver(self, batch, done, executor):
+        error = done.exception()
+        if error is not None:
+            self._fail(batch, error, executor)
+            return
+        for (_, future), result in zip(batch, done.result()):
+            if not future.cancelled():    # shutdown() cancels waiting callers
+                future.set_result(result)
+
+    def _fail(self, batch, error, executor):
+        if isinstance(error, BrokenProcessPool):
+            with self._lock:
+                # Every batch on a dead pool fails; only the first replaces it
+                replace = self._executor is executor
+                if replace:
+                    self._executor = self._new_executor()
+            if replace:
+                # a worker died (e.g. OOM-killed); later batches get a fresh pool
+                print(f"NLU worker pool broken, restarting: {error}")
+                executor.shutdown(wait=False)
+        for _, future in batch:
+            if not future.cancelled():
+                future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "batch_size": self.batch_size,
+                "batch_window_ms": self.batch_window * 1000,
+                "timeout_s": self.timeout,
+                "batches": self.batches,
+                "messages": self.messages,
+                "avg_batch": round(self.messages / self.batches, 2) if self.batches else 0.0,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+            }
+
+    def shutdown(self):
+        # Callers still waiting for a batch are released; cancel_futures= needs Python 3.9
+        while True:
+            try:
+                _, future = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,322 @@
+# open_slot_index.py
+"""
+Open slots held in memory for /students/available-appointments and
+/parents/available-appointments.
+
+Per therapist, the index keeps the future 'available' AVAILABILITY rows and
+the open rule occurrences of the default window (utils/availability_rules.py),
+each sorted by date and start time, plus the merged listing the endpoints
+return. A request reads those lists as they are; it only touches the
+database when something changed since the last read.
+
+Staying current:
+  * availability_events: a booked or deleted slot is dropped in place; any
+    other change marks its therapist dirty, and the next read re-queries just
+    the dirty therapists. An event naming no therapist forces a full reload.
+  * A reconciler thread (start()) rebuilds the whole index from the database
+    every RECONCILE_SECONDS, catching changes made by other worker processes,
+    new therapists, and the day rolling over. Without it, reads reload when
+    the index gets that old.
+
+Booking still claims the slot in the database, so a listing that is a moment
+behind costs at most a "slot no longer available" answer.
+"""
+import bisect
+import heapq
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import availability_events, availability_rules, pagination
+
+RECONCILE_SECONDS = float(os.getenv("OPEN_SLOT_INDEX_RECONCILE", 60))
+
+# Future open AVAILABILITY rows; {only} narrows them to some therapists (scripts/explain_check.py runs both)
+OPEN_SLOTS_SQL = """
+    SELECT ID, THERAPIST_ID, Date, Start_Time, End_Time
+    FROM AVAILABILITY
+    WHERE Status = 'available' AND Date >= CURDATE(){only}
+    ORDER BY THERAPIST_ID, Date, Start_Time
+"""
+
+
+def _entry(slot_id, day, start, end):
+    """(sort key, slot as the endpoints return it)."""
+    return (day, start), {
+        "id": slot_id,
+        "date": day.strftime("%Y-%m-%d"),
+        "start_time": str(start),
+        "end_time": str(end),
+    }
+
+
+def _merge(*lists):
+    return [slot for _, slot in heapq.merge(*lists, key=lambda entry: entry[0])]
+
+
+@contextmanager
+def _cursor(connect):
+    conn = connect()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class OpenSlotIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loader = threading.Lock()   # one thread loads or refreshes at a time
+        self._names = {}         # therapist_id -> (FirstName, LastName), every therapist
+        self._concrete = {}      # therapist_id -> [(key, slot)] open AVAILABILITY rows
+        self._occurrences = {}   # therapist_id -> [(key, slot)] open rule occurrences, default window
+        self._listings = {}      # therapist_id -> both merged, as returned
+        self._therapist_of = {}  # AVAILABILITY id -> therapist_id, for in-place removal
+        self._window = None      # the default window the occurrences were expanded for
+        self._loaded_at = None
+        self._dirty = set()
+        self._stale = 0          # generation of an event that named no therapist, 0 if none pending
+        self._generation = 0     # bumped by every event
+        self._touched = {}       # therapist_id -> generation of its last event
+        self._reconciler = None
+        self._stop = threading.Event()
+
+    # ── loading ──────────────────────────────────────────────
+
+    def _query(self, cursor, window, therapist_ids=None):
+        """Names, open slots and rule occurrences, for everyone or just `therapist_ids`."""
+        only, params = "", []
+        if therapist_ids is not None:
+            only = f"THERAPIST_ID IN ({', '.join(['%s'] * len(therapist_ids))})"
+            params = list(therapist_ids)
+        cursor.execute("SELECT THERAPIST_ID, FirstName, LastName FROM THERAPIST"
+                       + (" WHERE " + only if only else ""), params)
+        names = {row["THERAPIST_ID"]: (row["FirstName"], row["LastName"]) for row in cursor.fetchall()}
+        cursor.execute(OPEN_SLOTS_SQL.format(only=" AND " + only if only else ""), params)
+        concrete = {}
+        for row in cursor.fetchall():
+            concrete.setdefault(row["THERAPIST_ID"], []).append(
+                _entry(row["ID"], row["Date"], row["Start_Time"], row["End_Time"]))
+        occurrences = {}
+        for occ in availability_rules.open_occurrences(cursor, *window, therapist_ids):
+            occurrences.setdefault(occ["THERAPIST_ID"], []).append(
+                _entry(occ["id"], occ["Date"], occ["Start_Time"], occ["End_Time"]))
+        return names, concrete, occurrences
+
+    def _install(self, tid, names, concrete, occurrences):
+        """Replace one therapist's lists (caller holds the lock)."""
+        for _, slot in self._concrete.pop(tid, ()):
+            self._therapist_of.pop(slot["id"], None)
+        self._occurrences.pop(tid, None)
+        self._listings.pop(tid, None)
+        if tid not in names:
+            self._names.pop(tid, None)    # therapist deleted
+            return
+        self._names[tid] = names[tid]
+        if concrete.get(tid):
+            self._concrete[tid] = concrete[tid]
+            for _, slot in concrete[tid]:
+                self._therapist_of[slot["id"]] = tid
+        if occurrences.get(tid):
+            self._occurrences[tid] = occurrences[tid]
+        if tid in self._concrete or tid in self._occurrences:
+            self._listings[tid] = _merge(self._concrete.get(tid, ()), self._occurrences.get(tid, ()))
+
+    def load(self, cursor):
+        """Rebuild everything from the database; returns how many slots differ from before."""
+        with self._lock:
+            started_at = self._generation
+        window = availability_rules.default_window()
+        names, concrete, occurrences = self._query(cursor, window)
+        with self._lock:
+            before = set(self._therapist_of)
+            self._names, self._concrete, self._occurrences = {}, {}, {}
+            self._listings, self._therapist_of = {}, {}
+            for tid in names:
+                self._install(tid, names, concrete, occurrences)
+            self._window = window
+            self._loaded_at = time.monotonic()
+            if self._stale <= started_at:
+                self._stale = 0
+            # Changes committed while we were reading may be missing; look again
+            self._dirty = {tid for tid, gen in self._touched.items() if gen > started_at}
+            drift = len(before ^ set(self._therapist_of)) if before else 0
+        return drift
+
+    def _refresh(self, cursor):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            started_at = self._generation
+        if not dirty:
+            return
+        ids = sorted(dirty)
+        names, concrete, occurrences = self._query(cursor, self._window, ids)
+        with self._lock:
+            for tid in ids:
+                self._install(tid, names, concrete, occurrences)
+                if self._touched.get(tid, 0) > started_at:
+                    self._dirty.add(tid)
+
+    def ensure_current(self, connect):
+        """
+        Load or catch up as needed. `connect` (get_db_connection) is only
+        called when there is something to read, so a current index costs no
+        connection checkout at all. One thread reads at a time: concurrent
+        requests wait for a reload rather than each running their own, and
+        skip a refresh another thread is already doing.
+        """
+        reload = self._needs_reload()
+        if not reload and not self._dirty:
+            return
+        if reload:
+            self._loader.acquire()    # nothing current to serve: wait for whoever is loading
+        elif not self._loader.acquire(blocking=False):
+            return                    # another thread is catching up; serve the current lists meanwhile
+        try:
+            # Whoever held the lock may have done the work already
+            reload = self._needs_reload()
+            if not reload and not self._dirty:
+                return
+            with _cursor(connect) as cursor:
+                if reload:
+                    self.load(cursor)
+                self._refresh(cursor)
+        finally:
+            self._loader.release()
+
+    def _needs_reload(self):
+        return (self._loaded_at is None or self._stale or self._window != availability_rules.default_window()
+                or (self._reconciler is None and time.monotonic() - self._loaded_at > RECONCILE_SECONDS))
+
+    # ── keeping current ──────────────────────────────────────
+
+    def on_event(self, event):
+        """availability_events subscriber."""
+        with self._lock:
+            self._generation += 1
+            if event.therapist_id is None:
+                self._stale = self._generation
+                return
+            tid = event.therapist_id
+            self._touched[tid] = self._generation
+            if self._loaded_at is None:
+                return
+            gone = set(event.slot_ids)
+            known = event.kind in (availability_events.BOOKED, availability_events.DELETED) and gone and all(
+                self._therapist_of.get(slot_id) == tid for slot_id in gone)
+            if not known:
+                self._dirty.add(tid)
+                return
+            # Copy on write: readers may be serializing the old lists
+            for slot_id in gone:
+                del self._therapist_of[slot_id]
+            self._concrete[tid] = [e for e in self._concrete[tid] if e[1]["id"] not in gone]
+            self._listings[tid] = [slot for slot in self._listings[tid] if slot["id"] not in gone]
+            if not self._concrete[tid]:
+                del self._concrete[tid]
+            if not self._listings[tid]:
+                del self._listings[tid]
+
+    def start(self, connect, interval=RECONCILE_SECONDS):
+        """Subscribe to availability events and reconcile with the database every `interval` seconds."""
+        if self._reconciler is not None:
+            return
+        availability_events.subscribe(self.on_event)
+
+        def run():
+            while not self._stop.wait(interval):
+                if self._loaded_at is None:
+                    continue          # nobody has asked yet; the first read loads
+                try:
+                    with self._loader, _cursor(connect) as cursor:
+                        drift = self.load(cursor)
+                    if drift:
+                        print(f"Open slot index reconciled: {drift} slot(s) had drifted")
+                except Exception as e:
+                    print(f"Open slot index reconcile error: {e}")
+
+        self._reconciler = threading.Thread(target=run, name="open-slot-reconciler", daemon=True)
+        self._reconciler.start()
+
+    def stop(self):
+        availability_events.unsubscribe(self.on_event)
+        self._stop.set()
+
+    # ── querying ─────────────────────────────────────────────
+
+    def _slots_by_therapist(self, connect, window):
+        """Names and therapist_id -> open slots; the default window comes straight from memory."""
+        self.ensure_current(connect)
+        if window is None or window == self._window:
+            with self._lock:
+                return dict(self._names), dict(self._listings)
+        # Another window: the indexed slots plus that window's rule occurrences
+        occurrences = {}
+        with _cursor(connect) as cursor:
+            rule_rows = availability_rules.open_occurrences(cursor, *window)
+        for occ in rule_rows:
+            occurrences.setdefault(occ["THERAPIST_ID"], []).append(
+                _entry(occ["id"], occ["Date"], occ["Start_Time"], occ["End_Time"]))
+        with self._lock:
+            names, concrete = dict(self._names), dict(self._concrete)
+        listings = {tid: _merge(concrete.get(tid, ()), occurrences.get(tid, ()))
+                    for tid in set(concrete) | set(occurrences) if tid in names}
+        return names, listings
+
+    @staticmethod
+    def _listing(names, listings, order):
+        return [
+            {"therapist_id": tid, "therapist_name": f"{names[tid][0]} {names[tid][1]}",
+             "appointments": listings.get(tid, [])}
+            for tid in order
+        ]
+
+    @classmethod
+    def _page(cls, names, listings, order, key, page):
+        """One utils.pagination page of `order` (sorted by `key`): (listing, nextCursor)."""
+        keys = [key(tid) for tid in order]
+        start = bisect.bisect_right(keys, page.after) if page.after else 0
+        rows = cls._listing(names, listings, order[start:start + page.limit + 1])
+        return pagination.split_page(rows, page, lambda row: key(row["therapist_id"]))
+
+    def student_listing(self, connect, window=None):
+        """Every therapist, by id, with their open slots (possibly none)."""
+        names, listings = self._slots_by_therapist(connect, window)
+        return self._listing(names, listings, sorted(names))
+
+    def student_page(self, connect, page, window=None):
+        """student_listing one page at a time; the cursor is the therapist id."""
+        names, listings = self._slots_by_therapist(connect, window)
+        return self._page(names, listings, sorted(names), lambda tid: (tid,), page)
+
+    def _parent_order(self, names, listings):
+        key = lambda tid: (names[tid][0], names[tid][1], tid)
+        return sorted(listings, key=key), key
+
+    def parent_listing(self, connect, window=None):
+        """Therapists with open slots, by name."""
+        names, listings = self._slots_by_therapist(connect, window)
+        order, _ = self._parent_order(names, listings)
+        return self._listing(names, listings, order)
+
+    def parent_page(self, connect, page, window=None):
+        """parent_listing one page at a time; the cursor is (first name, last name, id)."""
+        names, listings = self._slots_by_therapist(connect, window)
+        order, key = self._parent_order(names, listings)
+        return self._page(names, listings, order, key, page)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "therapists": len(self._names),
+                "slots": len(self._therapist_of),
+                "rule_occurrences": sum(len(v) for v in self._occurrences.values()),
+                "dirty": len(self._dirty),
+                "age_s": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            }
+
+
+open_slot_index = OpenSlotIndex()
@@ -0,0 +1,153 @@
+# outbox.py
+import json
+
+from utils.emailer import MailBatch, fetch_appt_recipients, send_appt_emails
+
+MAX_ATTEMPTS = 5
+LEASE_SECONDS = 300          # a 'sending' row is retried if its worker died mid-delivery
+
+
+def enqueue_appt_notifications(cursor, appointment_id, status, recipients):
+    """
+    Queue appointment e-mails in NOTIFICATION_OUTBOX.
+    Call it with the handler's (dictionary) cursor *before* commit so the
+    notification is stored atomically with the appointment change, and before
+    the appointment is deleted: each row keeps a snapshot of its recipient's
+    address and the appointment details as of this change, which is what the
+    worker sends.
+    • recipients = iterable of 'student' | 'parent' | 'therapist'
+    """
+    details, emails = fetch_appt_recipients(cursor, appointment_id)
+    if not details:
+        print(f"No appointment details found for appointment_id={appointment_id}; nothing queued")
+        return
+    rows = [
+        (appointment_id, recipient, status, json.dumps({"to": emails[recipient], "details": details}))
+        for recipient in recipients if emails.get(recipient)
+    ]
+    if rows:
+        cursor.executemany(
+            "INSERT INTO NOTIFICATION_OUTBOX (Appointment_ID, Recipient, Event, Payload) VALUES (%s, %s, %s, %s)",
+            rows
+        )
+    print(f"Queued {len(rows)} notification(s) for appointment_id={appointment_id}, status={status}")
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 30s, 1m, 2m, 4m, ... capped at 1h."""
+    return min(30 * 2 ** (attempts - 1), 3600)
+
+
+def claim_batch(conn, limit=50):
+    """
+    Lease up to `limit` due rows to this worker and return them.
+    SKIP LOCKED lets several workers poll the table without blocking each other;
+    rows whose lease expired (worker crashed while sending) become due again.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT ID, Appointment_ID, Recipient, Event, Attempts, Payload
+            FROM NOTIFICATION_OUTBOX
+            WHERE State IN ('pending', 'sending') AND Next_attempt_at <= NOW()
+            ORDER BY ID
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (limit,))
+        rows = cursor.fetchall()
+        if rows:
+            placeholders = ", ".join(["%s"] * len(rows))
+            cursor.execute(f"""
+                UPDATE NOTIFICATION_OUTBOX
+                SET State = 'sending', Attempts = Attempts + 1,
+                    Next_attempt_at = NOW() + INTERVAL %s SECOND
+                WHERE ID IN ({placeholders})
+            """, (LEASE_SECONDS, *[row["ID"] for row in rows]))
+        conn.commit()
+        for row in rows:
+            row["Attempts"] += 1
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _group_key(row):
+    """Rows with the same appointment, event and snapshot share one render."""
+    if row["Payload"] is None:
+        return row["Appointment_ID"], row["Event"], None
+    return row["Appointment_ID"], row["Event"], json.dumps(json.loads(row["Payload"])["details"], sort_keys=True)
+
+
+def _recipients(cursor, appointment_id, group):
+    """(details, {role: email}) for a group: its snapshot, or a lookup for rows queued without one."""
+    if group[0]["Payload"] is None:
+        return fetch_appt_recipients(cursor, appointment_id)
+    payloads = {row["Recipient"]: json.loads(row["Payload"]) for row in group}
+    details = next(iter(payloads.values()))["details"]
+    return details, {role: payload["to"] for role, payload in payloads.items()}
+
+
+def deliver(conn, mail, rows):
+    """
+    Send the claimed rows from the snapshot each was queued with, one render
+    per (appointment, event, details) and one SMTP session for the whole
+    batch; mark each row sent, or reschedule / fail it on error. Returns
+    (sent, failed).
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(_group_key(row), []).append(row)
+
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    sent = failed = 0
+    try:
+        with MailBatch(mail) as batch:
+            for (appointment_id, event, _), group in groups.items():
+                roles = [row["Recipient"] for row in group]
+                try:
+                    details, emails = _recipients(cursor, appointment_id, group)
+                    if not details:
+                        # Queued without a snapshot and the appointment is gone: nothing to render
+                        raise LookupError(f"appointment {appointment_id} not found")
+                    failures = send_appt_emails(mail, appointment_id, event, details, emails, roles, batch)
+                except Exception as e:
+                    failures = {role: e for role in roles}
+                for row in group:
+                    error = failures.get(row["Recipient"])
+                    if error is None:
+                        sent += 1
+                        mark_sent(cursor, row)
+                    else:
+                        failed += 1
+                        mark_failed(cursor, row, str(error)[:500])
+                conn.commit()
+    finally:
+        cursor.close()
+    return sent, failed
+
+
+def mark_sent(cursor, row):
+    cursor.execute(
+        "UPDATE NOTIFICATION_OUTBOX SET State = 'sent', sent_at = NOW(), Last_error = NULL WHERE ID = %s",
+        (row["ID"],)
+    )
+
+
+def mark_failed(cursor, row, error):
+    if row["Attempts"] >= MAX_ATTEMPTS:
+        print(f"Outbox row {row['ID']} failed permanently after {row['Attempts']} attempts: {error}")
+        cursor.execute(
+            "UPDATE NOTIFICATION_OUTBOX SET State = 'failed', Last_error = %s WHERE ID = %s",
+            (error, row["ID"])
+        )
+    else:
+        delay = retry_delay(row["Attempts"])
+        print(f"Outbox row {row['ID']} failed (attempt {row['Attempts']}), retrying in {delay}s: {error}")
+        cursor.execute("""
+            UPDATE NOTIFICATION_OUTBOX
+            SET State = 'pending', Last_error = %s, Next_attempt_at = NOW() + INTERVAL %s SECOND
+            WHERE ID = %s
+        """, (error, delay, row["ID"]))
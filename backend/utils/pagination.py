@@ -0,0 +1,107 @@
+# pagination.py
+"""
+Keyset pagination for list endpoints.
+
+Pagination is opt-in: a request with ?limit= or ?cursor= gets one page and a
+"nextCursor" to pass back (null on the last page); without either, endpoints
+return everything as before. A cursor is the sort key of the last row served,
+so the next page is `WHERE key < cursor ORDER BY key DESC LIMIT n`, a range
+scan on the matching index, however deep the page.
+
+Cursors are opaque to clients (url-safe base64 of JSON) and carry the name of
+the listing they belong to, so one endpoint's cursor is rejected by another.
+"""
+import base64
+import binascii
+import json
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE_DEFAULT", 50))
+MAX_PAGE_SIZE = int(os.getenv("PAGE_SIZE_MAX", 200))
+
+
+# One requested page: at most `limit` rows after the sort key `after` (None: from the top)
+Page = namedtuple("Page", "listing limit after")
+
+
+class InvalidPage(ValueError):
+    """A malformed ?limit= or ?cursor=; the message is fit for the client."""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"td": value.total_seconds()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and len(value) == 1:
+        kind, raw = next(iter(value.items()))
+        if kind == "dt":
+            return datetime.fromisoformat(raw)
+        if kind == "d":
+            return date.fromisoformat(raw)
+        if kind == "td":
+            return timedelta(seconds=raw)
+    if isinstance(value, (int, str)) or value is None:
+        return value
+    raise ValueError(f"unexpected cursor value {value!r}")
+
+
+def encode_cursor(listing, key):
+    """Opaque token for the sort key (a tuple) of the last row on a page."""
+    payload = json.dumps([listing] + [_encode_value(v) for v in key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(listing, token, size):
+    """The sort key in `token`; raises InvalidPage unless it is a `size`-part key of `listing`."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        parts = json.loads(raw)
+        if not isinstance(parts, list) or parts[0] != listing or len(parts) != size + 1:
+            raise ValueError("cursor for another listing")
+        return tuple(_decode_value(v) for v in parts[1:])
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, IndexError):
+        raise InvalidPage("cursor is not valid for this listing")
+
+
+def page_request(args, listing, key_size):
+    """
+    The Page asked for by ?limit= and ?cursor=, or None when the request
+    asks for neither. limit defaults to PAGE_SIZE and is capped at
+    MAX_PAGE_SIZE; raises InvalidPage.
+    """
+    if "limit" not in args and "cursor" not in args:
+        return None
+    raw_limit = args.get("limit")
+    if raw_limit in (None, ""):
+        limit = PAGE_SIZE
+    else:
+        try:
+            limit = int(raw_limit)
+        except ValueError:
+            raise InvalidPage("limit must be a whole number")
+        if limit < 1:
+            raise InvalidPage("limit must be at least 1")
+        limit = min(limit, MAX_PAGE_SIZE)
+    token = args.get("cursor")
+    after = decode_cursor(listing, token, key_size) if token else None
+    return Page(listing, limit, after)
+
+
+def split_page(rows, page, key):
+    """
+    Rows fetched with LIMIT page.limit + 1 -> (the page's rows, nextCursor or
+    None). `key(row)` gives a row's sort key.
+    """
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[:page.limit]
+    return rows, encode_cursor(page.listing, key(rows[-1]))
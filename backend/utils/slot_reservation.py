@@ -0,0 +1,104 @@
+# slot_reservation.py
+"""
+Claiming AVAILABILITY slots for appointments.
+
+Every booking path (student and parent booking and rescheduling, the chatbot)
+claims its slot here, with one conditional UPDATE instead of SELECT, check,
+UPDATE. InnoDB serializes concurrent claims on the row, so exactly one of them
+sees rowcount 1 and the rest get SlotUnavailable.
+
+The appointment is written on the same cursor right after the claim, and the
+caller commits both together; a rollback (or a failed check in between)
+leaves the slot open again. Cursors are expected to be dictionary cursors.
+
+Slot ids may also be the virtual ids of recurring-rule occurrences
+(utils/availability_rules.py); claiming one first inserts that occurrence as
+an AVAILABILITY row in the same transaction.
+"""
+from datetime import datetime, timedelta
+
+from utils import availability_rules
+
+# Live appointments of a student with a therapist on one date
+SAME_DAY_APPOINTMENT_SQL = """
+    SELECT COUNT(*) AS count
+    FROM APPOINTMENTS a
+    JOIN AVAILABILITY av ON a.AVAILABILITY_ID = av.ID
+    WHERE a.STUDENT_ID = %s
+      AND av.THERAPIST_ID = %s
+      AND DATE(a.Appointment_time) = %s
+      AND a.Status != 'cancelled'
+"""
+
+
+class SlotUnavailable(Exception):
+    """The slot does not exist (status None) or was no longer available."""
+
+    def __init__(self, slot_id, status=None):
+        super().__init__(f"slot {slot_id} is {'missing' if status is None else status}")
+        self.slot_id = slot_id
+        self.status = status
+
+
+def claim_slot(cursor, slot_id):
+    """Take an open slot; returns its row (ID, Date, Start_Time, THERAPIST_ID, Status) or raises SlotUnavailable."""
+    if availability_rules.is_virtual_slot_id(slot_id):
+        concrete_id = availability_rules.materialize(cursor, slot_id)
+        if concrete_id is None:
+            raise SlotUnavailable(slot_id)
+        slot_id = concrete_id
+    cursor.execute(
+        "UPDATE AVAILABILITY SET Status = 'not_available' WHERE ID = %s AND Status = 'available'",
+        (slot_id,)
+    )
+    claimed = cursor.rowcount == 1
+    # After a successful claim the row is locked by this transaction, so this read is stable
+    cursor.execute("SELECT ID, Date, Start_Time, THERAPIST_ID, Status FROM AVAILABILITY WHERE ID = %s", (slot_id,))
+    slot = cursor.fetchone()
+    if not claimed:
+        raise SlotUnavailable(slot_id, slot["Status"] if slot else None)
+    return slot
+
+
+def release_slot(cursor, slot_id):
+    cursor.execute("UPDATE AVAILABILITY SET Status = 'available' WHERE ID = %s", (slot_id,))
+
+
+def appointment_time(slot):
+    """The slot's Date and Start_Time (a timedelta from the connector) as one datetime."""
+    start = slot["Start_Time"]
+    if isinstance(start, timedelta):
+        start = (datetime.min + start).time()
+    return datetime.combine(slot["Date"], start)
+
+
+def has_same_day_appointment(cursor, student_id, slot, exclude_appointment_id=None):
+    """Whether the student already has a live appointment with the slot's therapist that day."""
+    slot_date = slot["Date"].strftime('%Y-%m-%d') if isinstance(slot["Date"], datetime) else slot["Date"]
+    query = SAME_DAY_APPOINTMENT_SQL
+    params = [student_id, slot["THERAPIST_ID"], slot_date]
+    if exclude_appointment_id is not None:
+        query += "  AND a.Appointment_ID != %s"
+        params.append(exclude_appointment_id)
+    cursor.execute(query, params)
+    return cursor.fetchone()["count"] > 0
+
+
+def insert_appointment(cursor, slot, student_id, appointment_type, reason, parent_user_id=None):
+    """A pending appointment on a claimed slot; returns its id. parent_user_id is the booking parent's USER_ID."""
+    cursor.execute("""
+        INSERT INTO APPOINTMENTS
+        (STUDENT_ID, AVAILABILITY_ID, Appointment_time, Status, Appointment_type, Meeting_link, Reason_for_meeting, PARENTID)
+        VALUES (%s, %s, %s, 'pending', %s, NULL, %s, (SELECT PARENT_ID FROM PARENT WHERE USER_ID = %s))
+    """, (student_id, slot["ID"], appointment_time(slot), appointment_type, reason, parent_user_id))
+    return cursor.lastrowid
+
+
+def move_appointment(cursor, appointment_id, old_slot_id, slot):
+    """Point an appointment at a claimed slot (pending again) and reopen the slot it had."""
+    cursor.execute("""
+        UPDATE APPOINTMENTS
+        SET AVAILABILITY_ID = %s, Appointment_time = %s, Status = 'pending'
+        WHERE Appointment_ID = %s
+    """, (slot["ID"], appointment_time(slot), appointment_id))
+    release_slot(cursor, old_slot_id)
@@ -0,0 +1,105 @@
+# sql_metrics.py
+import os
+import re
+import threading
+from collections import Counter
+
+# A route running the same normalized statement more than this many times in
+# one request is flagged as a likely N+1 query pattern.
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(sql):
+    """
+    Reduce a statement to its shape so repeats can be counted:
+    literals and %s placeholders become ?, IN-lists collapse, whitespace is squashed.
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("(?)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryStats:
+    """Statements issued during one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.statements = Counter()
+
+    def record(self, sql, elapsed, rows):
+        self.queries += 1
+        self.db_time += elapsed
+        self.rows += rows
+        self.statements[normalize_statement(sql)] += 1
+
+    def repeated_statements(self, threshold=None):
+        """Statements run more than `threshold` times, most repeated first."""
+        limit = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n > limit]
+
+
+_lock = threading.Lock()
+_routes = {}
+
+
+def record_request(route, stats):
+    """Fold one request's QueryStats into the per-route aggregates."""
+    repeats = stats.repeated_statements()
+    with _lock:
+        agg = _routes.setdefault(route, {
+            "requests": 0,
+            "queries": 0,
+            "db_time_ms": 0.0,
+            "rows": 0,
+            "max_queries": 0,
+            "n_plus_one": {},
+        })
+        agg["requests"] += 1
+        agg["queries"] += stats.queries
+        agg["db_time_ms"] += stats.db_time * 1000
+        agg["rows"] += stats.rows
+        agg["max_queries"] = max(agg["max_queries"], stats.queries)
+        for stmt, n in repeats:
+            flag = agg["n_plus_one"].setdefault(stmt, {"requests": 0, "max_repeats": 0})
+            flag["requests"] += 1
+            flag["max_repeats"] = max(flag["max_repeats"], n)
+    for stmt, n in repeats:
+        print(f"N+1 suspected in {route}: {n}x {stmt[:120]}")
+
+
+def snapshot():
+    """Per-route aggregates with averages, heaviest routes (by DB time) first."""
+    with _lock:
+        routes = []
+        for route, agg in _routes.items():
+            n = agg["requests"] or 1
+            routes.append({
+                "route": route,
+                "requests": agg["requests"],
+                "queries": agg["queries"],
+                "avg_queries": round(agg["queries"] / n, 2),
+                "max_queries": agg["max_queries"],
+                "db_time_ms": round(agg["db_time_ms"], 3),
+                "avg_db_time_ms": round(agg["db_time_ms"] / n, 3),
+                "rows": agg["rows"],
+                "avg_rows": round(agg["rows"] / n, 2),
+                "n_plus_one": [
+                    {"statement": stmt, **flag} for stmt, flag in agg["n_plus_one"].items()
+                ],
+            })
+    routes.sort(key=lambda r: r["db_time_ms"], reverse=True)
+    return {"n_plus_one_threshold": N_PLUS_ONE_THRESHOLD, "routes": routes}
+
+
+def reset():
+    with _lock:
+        _routes.clear()
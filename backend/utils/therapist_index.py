@@ -0,0 +1,155 @@
+# therapist_index.py
+import bisect
+import os
+import re
+import threading
+import time
+
+# Rebuild from the database at most this often, so changes made through
+# another worker process show up here too.
+REFRESH_SECONDS = float(os.getenv("THERAPIST_INDEX_REFRESH", 300))
+
+_NON_NAME = re.compile(r"[^a-z' -]")
+_TITLES = {"dr", "doctor", "mr", "mrs", "ms", "miss", "prof"}
+
+
+def name_tokens(text):
+    """Lower-cased name words with titles ("Dr.") and punctuation dropped."""
+    words = _NON_NAME.sub(" ", text.lower().replace("-", " ")).split()
+    return [w for w in words if w not in _TITLES]
+
+
+def edit_distance(a, b, limit):
+    """
+    Edit distance counting a swap of adjacent letters as one edit ("smtih"),
+    or limit + 1 as soon as it must exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class TherapistNameIndex:
+    """
+    Verified therapists by name, for the chatbot's "book with <name>".
+
+    lookup() matches each query word against the indexed name words:
+    exact (3 points), prefix (2) or a typo away (1: edit distance 1, or 2 for
+    words over five letters, same first letter), and ranks
+    therapists by total points. Every query word has to match something.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = {}          # therapist_id -> display name
+        self._tokens = {}         # therapist_id -> name words
+        self._postings = {}       # word -> set of therapist ids
+        self._vocabulary = []     # sorted words, for prefix search
+        self._loaded_at = None
+
+    # ── building ─────────────────────────────────────────────
+
+    def load(self, cursor):
+        cursor.execute("""
+            SELECT THERAPIST_ID, FirstName, LastName
+            FROM THERAPIST
+            WHERE ADMIN_ID IS NOT NULL
+        """)
+        rows = cursor.fetchall()
+        with self._lock:
+            self._names, self._tokens, self._postings = {}, {}, {}
+            for row in rows:
+                self._add(row["THERAPIST_ID"], row["FirstName"], row["LastName"])
+            self._vocabulary = sorted(self._postings)
+            self._loaded_at = time.monotonic()
+        print(f"Therapist name index loaded: {len(rows)} verified therapists")
+
+    def ensure_loaded(self, cursor):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > REFRESH_SECONDS:
+            self.load(cursor)
+
+    def _add(self, therapist_id, first_name, last_name):
+        name = f"{first_name or ''} {last_name or ''}".strip()
+        tokens = name_tokens(name)
+        self._names[therapist_id] = name
+        self._tokens[therapist_id] = tokens
+        for token in tokens:
+            self._postings.setdefault(token, set()).add(therapist_id)
+
+    def _remove(self, therapist_id):
+        self._names.pop(therapist_id, None)
+        for token in self._tokens.pop(therapist_id, []):
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(therapist_id)
+                if not ids:
+                    del self._postings[token]
+
+    def upsert(self, therapist_id, first_name, last_name):
+        """A therapist was verified or renamed."""
+        with self._lock:
+            if self._loaded_at is None:
+                return            # nothing built yet; the first lookup loads everything
+            self._remove(therapist_id)
+            self._add(therapist_id, first_name, last_name)
+            self._vocabulary = sorted(self._postings)
+
+    def remove(self, therapist_id):
+        """A therapist was unverified."""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._remove(therapist_id)
+            self._vocabulary = sorted(self._postings)
+
+    # ── querying ─────────────────────────────────────────────
+
+    def _matches(self, word):
+        """{therapist_id: points} for one query word."""
+        points = {}
+        for tid in self._postings.get(word, ()):
+            points[tid] = 3
+        i = bisect.bisect_left(self._vocabulary, word)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(word):
+            for tid in self._postings[self._vocabulary[i]]:
+                points.setdefault(tid, 2)
+            i += 1
+        limit = 1 if len(word) <= 5 else 2
+        if len(word) >= 3:
+            for token, ids in self._postings.items():
+                if token[0] == word[0] and edit_distance(word, token, limit) <= limit:
+                    for tid in ids:
+                        points.setdefault(tid, 1)
+        return points
+
+    def lookup(self, query, limit=5):
+        """Best-matching verified therapists as [{"id", "name", "score"}], best first."""
+        words = name_tokens(query)
+        if not words:
+            return []
+        with self._lock:
+            totals = None
+            for word in words:
+                points = self._matches(word)
+                if totals is None:
+                    totals = points
+                else:
+                    totals = {tid: totals[tid] + p for tid, p in points.items() if tid in totals}
+                if not totals:
+                    return []
+            ranked = sorted(totals.items(), key=lambda item: (-item[1], self._names[item[0]]))
+            return [{"id": tid, "name": self._names[tid], "score": score} for tid, score in ranked[:limit]]
+
+
+therapist_index = TherapistNameIndex()
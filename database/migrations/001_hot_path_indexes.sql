@@ -0,0 +1,18 @@
+-- 001: Indexes for the hottest read paths
+-- Apply with: cd backend && python -m scripts.migrate
+
+-- Open slots across all therapists (parent/student available-appointments, chatbot therapist lists):
+--   WHERE Status = 'available' AND Date >= CURDATE()
+-- Covers THERAPIST_ID/Start_Time/End_Time so the slot list is served from the index.
+CREATE INDEX idx_availability_status_date
+  ON AVAILABILITY (Status, Date, Start_Time, THERAPIST_ID, End_Time);
+
+-- Open slots for one therapist (next slot, open dates, slots on a date):
+--   WHERE THERAPIST_ID = ? AND Status = 'available' AND Date >= CURDATE() ORDER BY Date, Start_Time
+CREATE INDEX idx_availability_therapist_status_date
+  ON AVAILABILITY (THERAPIST_ID, Status, Date, Start_Time, End_Time);
+
+-- A student's appointments by status and time (chatbot view/reschedule/cancel lists):
+--   WHERE STUDENT_ID = ? AND Status = 'pending' AND Appointment_time >= NOW() ORDER BY Appointment_time
+CREATE INDEX idx_appointments_student_status_time
+  ON APPOINTMENTS (STUDENT_ID, Status, Appointment_time);
@@ -0,0 +1,17 @@
+-- 002: Transactional outbox for appointment notifications
+-- Rows are written in the same transaction as the appointment change and
+-- delivered by backend/notification_worker.py.
+
+CREATE TABLE IF NOT EXISTS NOTIFICATION_OUTBOX (
+  ID BIGINT AUTO_INCREMENT PRIMARY KEY,
+  Appointment_ID INT NOT NULL,                 -- no FK: therapists may delete the appointment
+  Recipient ENUM('student', 'parent', 'therapist') NOT NULL,
+  Event VARCHAR(20) NOT NULL,                  -- 'pending' | 'booked' | 'confirmed' | 'cancelled' | ...
+  State ENUM('pending', 'sending', 'sent', 'failed') NOT NULL DEFAULT 'pending',
+  Attempts INT NOT NULL DEFAULT 0,
+  Next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  Last_error VARCHAR(500),
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  sent_at DATETIME NULL,
+  INDEX idx_outbox_due (State, Next_attempt_at)
+);
@@ -0,0 +1,29 @@
+-- 003: Recurring weekly availability
+-- A rule is expanded into slots only for the window being read (see
+-- backend/utils/availability_rules.py); booking an occurrence inserts that one
+-- slot into AVAILABILITY.
+
+CREATE TABLE IF NOT EXISTS AVAILABILITY_RULE (
+  ID INT AUTO_INCREMENT PRIMARY KEY,
+  THERAPIST_ID INT NOT NULL,
+  Weekday TINYINT NOT NULL,                    -- 0 = Monday ... 6 = Sunday
+  Start_Time TIME NOT NULL,                    -- first slot starts here
+  End_Time TIME NOT NULL,                      -- last slot ends by here
+  Slot_Minutes SMALLINT NOT NULL,
+  Start_Date DATE NOT NULL,
+  End_Date DATE NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (THERAPIST_ID) REFERENCES THERAPIST(THERAPIST_ID) ON DELETE CASCADE,
+  INDEX idx_rule_therapist_dates (THERAPIST_ID, End_Date, Start_Date),
+  INDEX idx_rule_dates (End_Date, Start_Date)
+);
+
+-- Days (Start_Time NULL) or single slots a rule skips
+CREATE TABLE IF NOT EXISTS AVAILABILITY_RULE_EXCEPTION (
+  ID INT AUTO_INCREMENT PRIMARY KEY,
+  RULE_ID INT NOT NULL,
+  Date DATE NOT NULL,
+  Start_Time TIME NULL,
+  FOREIGN KEY (RULE_ID) REFERENCES AVAILABILITY_RULE(ID) ON DELETE CASCADE,
+  INDEX idx_rule_exception_date (RULE_ID, Date)
+);
@@ -0,0 +1,21 @@
+-- 004: Indexes for keyset-paginated lists (?limit=&cursor=, see backend/utils/pagination.py)
+-- Apply with: cd backend && python -m scripts.migrate
+--
+-- Each page reads forward from the last key served instead of skipping OFFSET rows,
+-- so it needs an index in the list's sort order. InnoDB secondary indexes end with
+-- the primary key, which makes the id tie-breaker part of the range for free.
+
+-- A student's appointments, and each child's range in a parent's list:
+--   WHERE STUDENT_ID = ? AND (Appointment_time, Appointment_ID) < (?, ?)
+--   ORDER BY Appointment_time DESC, Appointment_ID DESC LIMIT ?
+CREATE INDEX idx_appointments_student_time
+  ON APPOINTMENTS (STUDENT_ID, Appointment_time);
+
+-- Admin user list:
+--   WHERE (created_at, USER_ID) < (?, ?) ORDER BY created_at DESC, USER_ID DESC LIMIT ?
+CREATE INDEX idx_users_created_at
+  ON USERS (created_at);
+
+-- A therapist's appointments page over booked slots, which the existing
+-- UNIQUE (THERAPIST_ID, Date, Start_Time) on AVAILABILITY already orders; the
+-- "has an appointment" check uses the APPOINTMENTS.AVAILABILITY_ID foreign key index.
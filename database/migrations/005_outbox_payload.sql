@@ -0,0 +1,10 @@
+-- 005: Snapshot of each notification in NOTIFICATION_OUTBOX
+-- Apply with: cd backend && python -m scripts.migrate
+--
+-- The recipient's address and the appointment details are captured when the row
+-- is queued, in the same transaction as the change, so a cancelled-then-deleted
+-- appointment still gets its e-mail and a later reschedule does not rewrite an
+-- earlier notice. Rows queued before this migration (Payload NULL) are still
+-- delivered from a lookup at send time.
+
+ALTER TABLE NOTIFICATION_OUTBOX ADD COLUMN Payload TEXT NULL;